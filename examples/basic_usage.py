@@ -58,14 +58,16 @@ def main():
     plaintext = b"This is a secret message protected by quantum cryptography!"
     print(f"   Plaintext: {plaintext.decode()}")
     
+    # Derive the AES key once and reuse the handle for every message
     qe = QuantumEncryption()
-    ciphertext, iv, tag = qe.encrypt(plaintext, result.final_key)
+    handle = qe.handle(result.final_key)
+    ciphertext, iv, tag = handle.encrypt(plaintext)
     print(f"✅ Data encrypted!")
     print(f"   Ciphertext length: {len(ciphertext)} bytes")
     
     # Step 4: Decrypt data
     print("\n4. Decrypting data...")
-    decrypted = qe.decrypt(ciphertext, iv, tag, result.final_key)
+    decrypted = handle.decrypt(ciphertext, iv, tag)
     print(f"✅ Data decrypted!")
     print(f"   Decrypted text: {decrypted.decode()}")
     
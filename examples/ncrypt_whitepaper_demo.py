@@ -39,7 +39,7 @@ def demo_quantum_resistant_encryption():
     message = b"NCRYPT: Quantum-resistant blockchain platform"
     print(f"\n🔒 Encrypting message: '{message.decode()}'")
     encrypted = lattice.encrypt_message(public_key, message)
-    print(f"✅ Message encrypted with {len(encrypted['ciphertexts'])} ciphertexts")
+    print(f"✅ Message encrypted with {encrypted['algorithm']}")
     
     # Decrypt the message
     print("\n🔓 Decrypting message...")
@@ -149,6 +149,10 @@ def demo_multi_tier_privacy():
     print(f"   Tracking key: {accountable_tx.tracking_key}")
     print(f"   Value commitment: {accountable_tx.outputs[0].commitment[:8].hex()}...")
     
+    # Batch commitment over all three transactions
+    batch_hash = dapoa.hash_batch([transparent_tx, private_tx, accountable_tx])
+    print(f"\n📦 Batch hash (3 transactions): {batch_hash[:16]}...")
+    
     # Auditor revelation
     print("\n👨‍⚖️ AUDITOR DISCLOSURE")
     print("   Authorized auditor can reveal transaction details...")
@@ -15,9 +15,13 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+import ncrypt
 from ncrypt.core.qkd import BB84Protocol
 from ncrypt.core.encryption import QuantumEncryption
 
+# Encrypt/decrypt take microseconds, so time many calls and report the mean
+TIMING_ROUNDS = 1000
+
 
 def print_section(title):
     """Print a section header."""
@@ -49,9 +53,9 @@ def demo_quantum_key_generation():
     print("   Quantum measurement COLLAPSES the superposition")
     
     print("\n⚛️  Step 4: Running complete BB84 protocol...")
-    start_time = time.time()
+    start_ns = time.perf_counter_ns()
     result = protocol.run_protocol(n_bits=2000, noise_level=0.02)
-    quantum_time = time.time() - start_time
+    quantum_time = (time.perf_counter_ns() - start_ns) / 1e9
     
     if result:
         print(f"\n✅ Quantum key generated successfully!")
@@ -79,8 +83,9 @@ def demo_classical_encryption(quantum_key):
     print("   • This is FAST and FREE")
     print("   • Same encryption as banks, messaging apps use\n")
     
-    # Create encryption instance
+    # Create encryption instance and derive the AES key once
     qe = QuantumEncryption()
+    handle = qe.handle(quantum_key)
     
     # Test message
     plaintext = b"Hello from the quantum world! This message is encrypted with a quantum-generated key, but the encryption itself is classical AES-256."
@@ -90,25 +95,27 @@ def demo_classical_encryption(quantum_key):
     
     # Encrypt
     print("\n🔒 Encrypting with AES-256-GCM (CLASSICAL)...")
-    start_time = time.time()
-    ciphertext, iv, tag = qe.encrypt(plaintext, quantum_key)
-    encrypt_time = time.time() - start_time
+    start_ns = time.perf_counter_ns()
+    for _ in range(TIMING_ROUNDS):
+        ciphertext, iv, tag = handle.encrypt(plaintext)
+    encrypt_time = (time.perf_counter_ns() - start_ns) / TIMING_ROUNDS / 1e9
     
     print(f"\n✅ Encrypted successfully!")
     print(f"   • Algorithm: AES-256-GCM (classical, not quantum)")
     print(f"   • Ciphertext: {ciphertext[:40].hex()}... ({len(ciphertext)} bytes)")
-    print(f"   • Time: {encrypt_time:.6f} seconds")
+    print(f"   • Time: {encrypt_time * 1e6:.1f} µs per call (mean of {TIMING_ROUNDS})")
     print(f"   • Cost: FREE (runs on your CPU)")
     
     # Decrypt
     print("\n🔓 Decrypting (also CLASSICAL)...")
-    start_time = time.time()
-    decrypted = qe.decrypt(ciphertext, iv, tag, quantum_key)
-    decrypt_time = time.time() - start_time
+    start_ns = time.perf_counter_ns()
+    for _ in range(TIMING_ROUNDS):
+        decrypted = handle.decrypt(ciphertext, iv, tag)
+    decrypt_time = (time.perf_counter_ns() - start_ns) / TIMING_ROUNDS / 1e9
     
     print(f"\n✅ Decrypted successfully!")
     print(f'   "{decrypted.decode()}"')
-    print(f"   • Time: {decrypt_time:.6f} seconds")
+    print(f"   • Time: {decrypt_time * 1e6:.1f} µs per call (mean of {TIMING_ROUNDS})")
     print(f"   • Matches original: {decrypted == plaintext}")
     
     return encrypt_time, decrypt_time
@@ -205,6 +212,9 @@ def main():
     print("   2. Understand that classical is used for ENCRYPTION")
     print("   3. See the hybrid approach in action")
     
+    # Keep one-time import/initialization costs out of the timings below
+    ncrypt.warmup()
+    
     # Part 1: Quantum key generation
     quantum_key = demo_quantum_key_generation()
     
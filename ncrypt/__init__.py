@@ -5,48 +5,78 @@ A comprehensive SDK demonstrating the NCRYPT whitepaper concepts:
 - Multi-tier privacy (Transparent, Private, Accountable)
 - DAPOA framework (Decentralized Anonymous Payment with Optional Accountability)
 - Quantum key distribution (BB84)
+
+Public classes are resolved lazily on first attribute access (PEP 562), so
+``import ncrypt`` does not pull in NumPy or the lattice code until they are
+actually used.
 """
 
+import importlib
+
 __version__ = "1.0.0"
 __author__ = "nCrypt Team"
 
-# Core quantum cryptography
-from .core.qkd import BB84Protocol
-from .core.encryption import QuantumEncryption
-
-# Post-quantum lattice-based cryptography
-from .lattice.post_quantum import ModuleLWE, ModuleSIS, LatticeCrypto
-
-# Multi-tier privacy transactions
-from .transactions.privacy_modes import (
-    DAPOAFramework, PrivacyMode, Transaction,
-    TransparentTransaction, PrivateTransaction, AccountableTransaction
-)
-
-# Simulators and utilities
-from .simulator.quantum_simulator import QuantumSimulator
-from .utils.key_manager import KeyManager
-
-__all__ = [
+# Public name -> (module, attribute), resolved on first access
+_LAZY = {
     # Quantum cryptography
-    "BB84Protocol",
-    "QuantumEncryption",
+    "BB84Protocol": ("ncrypt.core.qkd", "BB84Protocol"),
+    "QuantumEncryption": ("ncrypt.core.encryption", "QuantumEncryption"),
     
     # Post-quantum cryptography
-    "ModuleLWE",
-    "ModuleSIS",
-    "LatticeCrypto",
+    "ModuleLWE": ("ncrypt.lattice.post_quantum", "ModuleLWE"),
+    "ModuleSIS": ("ncrypt.lattice.post_quantum", "ModuleSIS"),
+    "LatticeCrypto": ("ncrypt.lattice.post_quantum", "LatticeCrypto"),
     
     # Privacy framework
-    "DAPOAFramework",
-    "PrivacyMode",
-    "Transaction",
-    "TransparentTransaction",
-    "PrivateTransaction",
-    "AccountableTransaction",
+    "DAPOAFramework": ("ncrypt.transactions.privacy_modes", "DAPOAFramework"),
+    "PrivacyMode": ("ncrypt.transactions.privacy_modes", "PrivacyMode"),
+    "Transaction": ("ncrypt.transactions.privacy_modes", "Transaction"),
+    "TransparentTransaction": ("ncrypt.transactions.privacy_modes", "TransparentTransaction"),
+    "PrivateTransaction": ("ncrypt.transactions.privacy_modes", "PrivateTransaction"),
+    "AccountableTransaction": ("ncrypt.transactions.privacy_modes", "AccountableTransaction"),
     
     # Utilities
-    "QuantumSimulator",
-    "KeyManager",
-]
+    "QuantumSimulator": ("ncrypt.simulator.quantum_simulator", "QuantumSimulator"),
+    "KeyManager": ("ncrypt.utils.key_manager", "KeyManager"),
+}
+
+__all__ = list(_LAZY) + ["warmup"]
 
+
+def __getattr__(name):
+    """Import public classes on first access."""
+    try:
+        module_name, attr = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    
+    value = getattr(importlib.import_module(module_name), attr)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
+
+
+def warmup():
+    """
+    Pay one-time start-up costs ahead of timed code.
+    
+    Resolves every lazy export and runs a tiny BB84 session plus one
+    encrypt/decrypt round-trip, so module imports, NumPy and OpenSSL
+    initialization are not charged to the first real call. Benchmark
+    scripts should call this before starting their timers.
+    """
+    for name in _LAZY:
+        __getattr__(name)
+    
+    from ncrypt.core.qkd import BB84Protocol
+    from ncrypt.core.encryption import QuantumEncryption
+    
+    protocol = BB84Protocol()
+    protocol.run_protocol(n_bits=64, noise_level=0.0)
+    
+    qe = QuantumEncryption()
+    ciphertext, iv, tag = qe.encrypt(b"warmup", [0, 1] * 128)
+    qe.decrypt(ciphertext, iv, tag, [0, 1] * 128)
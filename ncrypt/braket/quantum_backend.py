@@ -3,22 +3,163 @@ AWS Braket Quantum Backend
 Integration with AWS Braket for running on real quantum devices.
 """
 
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 import logging
+import math
+import secrets
+
+import numpy as np
 
 try:
-    from braket.circuits import Circuit
+    from braket.circuits import Circuit, FreeParameter
     from braket.devices import LocalSimulator
     from braket.aws import AwsDevice
+    from braket.jobs import hybrid_job
     BRAKET_AVAILABLE = True
 except ImportError:
     BRAKET_AVAILABLE = False
     Circuit = None
+    FreeParameter = None
     LocalSimulator = None
     AwsDevice = None
+    hybrid_job = None
+
+from ncrypt.core.qkd import _popcount
+from ncrypt.simulator.quantum_simulator import QuantumSimulator
 
 logger = logging.getLogger(__name__)
 
+# Default GetQuantumTask polling interval; the SDK default is far shorter and
+# exhausts the API rate limit when thousands of tasks are polled at once
+DEFAULT_POLL_INTERVAL_SECONDS = 2.0
+
+# AWS Braket pricing as (cost_per_task, cost_per_shot), approximate as of
+# 2024 - this varies by device, check current AWS pricing
+_PRICING_TABLE: Dict[str, Tuple[float, float]] = {
+    "ionq": (0.30, 0.01),
+    "rigetti": (0.30, 0.00035),
+}
+_DEFAULT_PRICING = (0.30, 0.001)
+
+# Single parametric BB84 circuit: RY(prep) prepares |0>, |1>, |+> or |->,
+# RY(meas) rotates the diagonal basis onto the computational one. Braket
+# compiles it once per device and only rebinds the two angles per task.
+if BRAKET_AVAILABLE:
+    _PARAMETRIC_BB84 = (
+        Circuit()
+        .ry(0, FreeParameter("prep"))
+        .ry(0, FreeParameter("meas"))
+        .measure(0)
+    )
+else:
+    _PARAMETRIC_BB84 = None
+
+
+def _build_bb84_circuit(bit: int, basis: int, measure_basis: int) -> Circuit:
+    """Build a new BB84 circuit (uncached)."""
+    circuit = Circuit()
+    
+    # Prepare qubit based on bit and basis
+    if basis == 0:  # Rectilinear basis
+        if bit == 1:
+            circuit.x(0)  # Apply X gate for |1⟩
+    else:  # Diagonal basis
+        circuit.h(0)  # Apply Hadamard for |+⟩ or |-⟩
+        if bit == 1:
+            circuit.z(0)  # Apply Z gate for |-⟩
+    
+    # Measure in chosen basis
+    if measure_basis == 1:  # Diagonal basis measurement
+        circuit.h(0)  # Apply Hadamard before measurement
+    
+    # Perform measurement
+    circuit.measure(0)
+    
+    return circuit
+
+
+def _init_bb84_circuits() -> List[Circuit]:
+    """Build all 8 BB84 circuits, indexed by (bit << 2) | (basis << 1) | measure_basis."""
+    return [
+        _build_bb84_circuit((index >> 2) & 1, (index >> 1) & 1, index & 1)
+        for index in range(8)
+    ]
+
+
+# Only 8 distinct BB84 circuits exist; build them once at import so every
+# exchange reuses the same Circuit objects
+_BB84_CIRCUITS = _init_bb84_circuits() if BRAKET_AVAILABLE else [None] * 8
+
+
+def _sample_qber(sifted_alice: np.ndarray, sifted_bob: np.ndarray, sample_size: int) -> float:
+    """
+    Error rate over the first sample_size sifted bits.
+    
+    Both samples are bit-packed first, so the comparison and the error
+    count run over sample_size / 8 bytes instead of one element per bit.
+    """
+    if sample_size == 0:
+        return 0.0
+    
+    mismatches = np.bitwise_xor(
+        np.packbits(sifted_alice[:sample_size]),
+        np.packbits(sifted_bob[:sample_size])
+    )
+    return _popcount(mismatches.tobytes()) / sample_size
+
+
+def _arn_vendor(device_arn: Optional[str]) -> str:
+    """
+    Extract the provider from a Braket device ARN.
+    
+    Args:
+        device_arn: ARN such as 'arn:aws:braket:us-east-1::device/qpu/ionq/Forte-1'
+    
+    Returns:
+        Lower-case provider name ('ionq', 'rigetti', ...) or 'default'
+    """
+    if not device_arn:
+        return "default"
+    
+    parts = device_arn.split('/')
+    return parts[2].lower() if len(parts) >= 4 else "default"
+
+
+def unpack_key(packed_key: bytes, key_length: int) -> List[int]:
+    """
+    Expand a packed key from BraketQKD.run_bb84 back into a list of bits.
+    
+    Args:
+        packed_key: Key bits packed MSB-first (np.packbits layout)
+        key_length: Number of valid bits in packed_key
+    
+    Returns:
+        List of key bits, as accepted by KeyManager and QuantumEncryption
+    """
+    bits = np.unpackbits(np.frombuffer(packed_key, dtype=np.uint8))
+    return bits[:key_length].tolist()
+
+
+def bb84_parameters(bit: int, basis: int, measure_basis: int) -> Dict[str, float]:
+    """
+    Rotation angles binding the parametric BB84 circuit to one exchange.
+    
+    Args:
+        bit: Bit to encode (0 or 1)
+        basis: Encoding basis (0=rectilinear, 1=diagonal)
+        measure_basis: Measurement basis
+    
+    Returns:
+        Parameter values for _PARAMETRIC_BB84
+    """
+    if basis == 0:
+        prep = math.pi * bit
+    else:
+        prep = -math.pi / 2 if bit else math.pi / 2
+    
+    meas = -math.pi / 2 if measure_basis == 1 else 0.0
+    return {"prep": prep, "meas": meas}
+
 
 class BraketBackend:
     """
@@ -50,7 +191,10 @@ class BraketBackend:
         self,
         device_arn: Optional[str] = None,
         use_local_simulator: bool = True,
-        aws_session: Optional[object] = None
+        aws_session: Optional[object] = None,
+        use_parametric_circuit: bool = True,
+        poll_interval_seconds: Optional[float] = None,
+        poll_timeout_seconds: Optional[float] = None
     ):
         """
         Initialize Braket backend.
@@ -61,6 +205,12 @@ class BraketBackend:
                 - Rigetti Ankaa-3: 'arn:aws:braket:us-west-1::device/qpu/rigetti/Ankaa-3'
             use_local_simulator: Use local Braket simulator if True (not quantum-secure)
             aws_session: Optional AWS session for device access
+            use_parametric_circuit: Submit one parametric circuit with bound
+                angles instead of a freshly built circuit per bit
+            poll_interval_seconds: Interval between task status polls on AWS
+                devices (default: DEFAULT_POLL_INTERVAL_SECONDS)
+            poll_timeout_seconds: Maximum time to wait for task results on
+                AWS devices (default: SDK default)
             
         References:
             Device documentation:
@@ -76,6 +226,14 @@ class BraketBackend:
         self.device_arn = device_arn
         self.use_local_simulator = use_local_simulator
         self.aws_session = aws_session
+        self.use_parametric_circuit = use_parametric_circuit
+        self.poll_interval = poll_interval_seconds or DEFAULT_POLL_INTERVAL_SECONDS
+        self.poll_timeout = poll_timeout_seconds
+        
+        vendor = _arn_vendor(device_arn)
+        if device_arn and vendor not in _PRICING_TABLE:
+            logger.warning(f"No pricing for device {device_arn}; cost estimates use default rates")
+        self._pricing = _PRICING_TABLE.get(vendor, _DEFAULT_PRICING)
         
         if use_local_simulator:
             self.device = LocalSimulator()
@@ -95,6 +253,9 @@ class BraketBackend:
         """
         Create BB84 protocol circuit.
         
+        All 8 circuits are prebuilt at import, so the same Circuit object
+        is returned for repeated inputs and must not be modified by callers.
+        
         Args:
             bit: Bit to encode (0 or 1)
             basis: Encoding basis (0=rectilinear, 1=diagonal)
@@ -103,64 +264,200 @@ class BraketBackend:
         Returns:
             Braket Circuit
         """
-        circuit = Circuit()
+        return _BB84_CIRCUITS[(int(bit) << 2) | (int(basis) << 1) | int(measure_basis)]
+    
+    def submit_batch(
+        self,
+        circuits: List[Circuit],
+        shots: int = 1,
+        max_parallel: int = 50,
+        inputs: Optional[List[Dict[str, float]]] = None
+    ):
+        """
+        Submit a list of single-qubit circuits as one Braket task batch.
         
-        # Prepare qubit based on bit and basis
-        if basis == 0:  # Rectilinear basis
-            if bit == 1:
-                circuit.x(0)  # Apply X gate for |1⟩
-        else:  # Diagonal basis
-            circuit.h(0)  # Apply Hadamard for |+⟩ or |-⟩
-            if bit == 1:
-                circuit.z(0)  # Apply Z gate for |-⟩
+        Returns as soon as the tasks are submitted; pass the returned batch
+        to collect_batch() once the results are actually needed, so other
+        work can overlap with device execution and result polling.
         
-        # Measure in chosen basis
-        if measure_basis == 1:  # Diagonal basis measurement
-            circuit.h(0)  # Apply Hadamard before measurement
+        Args:
+            circuits: Circuits to run (each measuring qubit 0)
+            shots: Number of shots per circuit
+            max_parallel: Maximum number of tasks running concurrently
+            inputs: Optional free-parameter values, one dict per circuit
+        
+        Returns:
+            Braket task batch
+        """
+        logger.info(f"Submitting batch of {len(circuits)} circuits (max_parallel={max_parallel})")
         
-        # Perform measurement
-        circuit.measure(0)
+        kwargs = {"shots": shots, "max_parallel": max_parallel}
+        if inputs is not None:
+            kwargs["inputs"] = inputs
         
-        return circuit
+        # Polling options only apply to AWS devices, not the local simulator
+        if not self.use_local_simulator:
+            kwargs["poll_interval_seconds"] = self.poll_interval
+            if self.poll_timeout is not None:
+                kwargs["poll_timeout_seconds"] = self.poll_timeout
+        
+        return self.device.run_batch(circuits, **kwargs)
     
-    def run_qkd_exchange(
+    def collect_batch(
+        self,
+        batch,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> np.ndarray:
+        """
+        Wait for a submitted batch and extract the measured bits.
+        
+        Args:
+            batch: Task batch returned by submit_batch()
+            progress_callback: Optional callable invoked as
+                progress_callback(completed, total) as task results arrive.
+                Results are then read task by task, in submission order,
+                instead of through batch.results().
+        
+        Returns:
+            First measured bit of each circuit as a uint8 array, in submission order
+        
+        Raises:
+            RuntimeError: If a task failed or was cancelled (no measurements);
+                the message names the task ARN
+        """
+        if progress_callback is None:
+            task_results = batch.results()
+        else:
+            task_results = self._iter_task_results(batch.tasks, progress_callback)
+        
+        results = np.fromiter(
+            (self._measured_bit(batch, index, result) for index, result in enumerate(task_results)),
+            dtype=np.uint8
+        )
+        
+        logger.info(f"Completed batch of {len(results)} circuits")
+        return results
+    
+    @staticmethod
+    def _measured_bit(batch, index: int, result) -> int:
+        """First measured bit of one task result; raises if the task produced none."""
+        measurements = getattr(result, "measurements", None)
+        if measurements is None or len(measurements) == 0 or len(measurements[0]) == 0:
+            tasks = getattr(batch, "tasks", None) or []
+            task_id = getattr(tasks[index], "id", None) if index < len(tasks) else None
+            raise RuntimeError(
+                f"Braket task {task_id or f'#{index}'} returned no measurements "
+                f"(failed or cancelled); the batch cannot be used"
+            )
+        return int(measurements[0][0])
+    
+    @staticmethod
+    def _iter_task_results(tasks, progress_callback: Callable[[int, int], None]):
+        """Yield each task's result in order, reporting progress after each."""
+        total = len(tasks)
+        for completed, task in enumerate(tasks, start=1):
+            yield task.result()
+            progress_callback(completed, total)
+    
+    def run_batch(
+        self,
+        circuits: List[Circuit],
+        shots: int = 1,
+        max_parallel: int = 50,
+        inputs: Optional[List[Dict[str, float]]] = None
+    ) -> np.ndarray:
+        """
+        Run a list of single-qubit circuits as one Braket task batch.
+        
+        Uses ``device.run_batch`` so the local simulator can spread the
+        circuits over CPU cores and cloud devices pipeline the submissions
+        instead of paying one round-trip per circuit.
+        
+        Args:
+            circuits: Circuits to run (each measuring qubit 0)
+            shots: Number of shots per circuit
+            max_parallel: Maximum number of tasks running concurrently
+            inputs: Optional free-parameter values, one dict per circuit
+        
+        Returns:
+            First measured bit of each circuit as a uint8 array, in submission order
+        """
+        batch = self.submit_batch(circuits, shots, max_parallel, inputs)
+        return self.collect_batch(batch)
+    
+    def submit_qkd_exchange(
         self,
         alice_bits: List[int],
         alice_bases: List[int],
         bob_bases: List[int],
-        shots: int = 1
-    ) -> List[int]:
+        shots: int = 1,
+        max_parallel: int = 50
+    ):
         """
-        Run QKD exchange on Braket device.
+        Submit a QKD exchange without waiting for the results.
         
         Args:
             alice_bits: Alice's random bits
             alice_bases: Alice's random bases
             bob_bases: Bob's random bases
             shots: Number of shots per circuit (usually 1 for QKD)
+            max_parallel: Maximum number of tasks running concurrently
         
         Returns:
-            Bob's measurement results
+            Braket task batch; pass it to collect_batch() for Bob's results
         """
-        results = []
-        
         logger.info(f"Running {len(alice_bits)} QKD exchanges on Braket device")
         
-        for bit, alice_basis, bob_basis in zip(alice_bits, alice_bases, bob_bases):
-            # Create circuit
-            circuit = self.create_bb84_circuit(bit, alice_basis, bob_basis)
-            
-            # Run on device
-            task = self.device.run(circuit, shots=shots)
-            result = task.result()
-            
-            # Get measurement result
-            measurements = result.measurements
-            measured_bit = int(measurements[0][0])
-            results.append(measured_bit)
+        if self.use_parametric_circuit:
+            inputs = [
+                bb84_parameters(bit, alice_basis, bob_basis)
+                for bit, alice_basis, bob_basis in zip(alice_bits, alice_bases, bob_bases)
+            ]
+            circuits = [_PARAMETRIC_BB84] * len(inputs)
+            return self.submit_batch(
+                circuits, shots=shots, max_parallel=max_parallel, inputs=inputs
+            )
         
-        logger.info(f"Completed {len(results)} QKD exchanges")
-        return results
+        circuits = [
+            self.create_bb84_circuit(bit, alice_basis, bob_basis)
+            for bit, alice_basis, bob_basis in zip(alice_bits, alice_bases, bob_bases)
+        ]
+        return self.submit_batch(circuits, shots=shots, max_parallel=max_parallel)
+    
+    def run_qkd_exchange(
+        self,
+        alice_bits: List[int],
+        alice_bases: List[int],
+        bob_bases: List[int],
+        shots: int = 1,
+        max_parallel: int = 50
+    ) -> np.ndarray:
+        """
+        Run QKD exchange on Braket device.
+        
+        All circuits are built up front and submitted as one task batch.
+        On the local simulator the outcomes are computed analytically
+        instead: BB84 has a closed form (Bob reads Alice's bit when the
+        bases match, a fair coin otherwise), so simulating one circuit per
+        bit gives the same distribution at far higher cost.
+        
+        Args:
+            alice_bits: Alice's random bits
+            alice_bases: Alice's random bases
+            bob_bases: Bob's random bases
+            shots: Number of shots per circuit (usually 1 for QKD)
+            max_parallel: Maximum number of tasks running concurrently
+        
+        Returns:
+            Bob's measurement results as a uint8 array
+        """
+        if self.use_local_simulator:
+            return QuantumSimulator().simulate_bb84_batch(alice_bits, alice_bases, bob_bases)
+        
+        batch = self.submit_qkd_exchange(
+            alice_bits, alice_bases, bob_bases, shots, max_parallel
+        )
+        return self.collect_batch(batch)
     
     def run_batch_qkd(
         self,
@@ -168,7 +465,7 @@ class BraketBackend:
         alice_bases: List[int],
         bob_bases: List[int],
         batch_size: int = 100
-    ) -> List[int]:
+    ) -> np.ndarray:
         """
         Run QKD in batches to optimize device usage.
         
@@ -179,27 +476,14 @@ class BraketBackend:
             batch_size: Number of circuits to run in parallel
         
         Returns:
-            Bob's measurement results
+            Bob's measurement results as a uint8 array
         """
-        all_results = []
-        n_bits = len(alice_bits)
-        
-        for i in range(0, n_bits, batch_size):
-            end_idx = min(i + batch_size, n_bits)
-            batch_bits = alice_bits[i:end_idx]
-            batch_alice_bases = alice_bases[i:end_idx]
-            batch_bob_bases = bob_bases[i:end_idx]
-            
-            batch_results = self.run_qkd_exchange(
-                batch_bits,
-                batch_alice_bases,
-                batch_bob_bases
-            )
-            all_results.extend(batch_results)
-            
-            logger.debug(f"Batch {i//batch_size + 1}: {len(batch_results)} exchanges")
-        
-        return all_results
+        return self.run_qkd_exchange(
+            alice_bits,
+            alice_bases,
+            bob_bases,
+            max_parallel=batch_size
+        )
     
     def get_device_info(self) -> Dict:
         """
@@ -241,18 +525,7 @@ class BraketBackend:
                 "note": "Local simulator is free"
             }
         
-        # AWS Braket pricing (approximate, as of 2024)
-        # This varies by device - check current AWS pricing
-        if "ionq" in self.device_arn.lower():
-            cost_per_task = 0.30
-            cost_per_shot = 0.01
-        elif "rigetti" in self.device_arn.lower():
-            cost_per_task = 0.30
-            cost_per_shot = 0.00035
-        else:
-            cost_per_task = 0.30
-            cost_per_shot = 0.001
-        
+        cost_per_task, cost_per_shot = self._pricing
         total_cost = (cost_per_task + cost_per_shot) * n_circuits
         
         return {
@@ -285,68 +558,127 @@ class BraketQKD:
     def run_bb84(
         self,
         n_bits: int = 1000,
-        error_threshold: float = 0.11
+        error_threshold: float = 0.11,
+        max_parallel: int = 50,
+        progress_callback: Optional[Callable[[int, int], None]] = None
     ) -> Optional[Dict]:
         """
         Run BB84 protocol on Braket device.
         
+        Alice's and Bob's bases are both drawn locally, so the exchange is
+        sifted before transmission and only matching-basis qubits (~50%) are
+        run on the device. This halves the device cost but departs from the
+        textbook protocol: mismatched-basis qubits never cross the channel,
+        so the QBER sample and any eavesdropper-detection statistics only
+        cover the transmitted (sifted) qubits.
+        
         Args:
             n_bits: Number of qubits to exchange
             error_threshold: Maximum acceptable error rate
+            max_parallel: Maximum number of quantum tasks in flight at once
+                on AWS devices
+            progress_callback: Optional callable invoked as
+                progress_callback(completed, total) while AWS device tasks
+                finish (not called on the local simulator)
         
         Returns:
-            Dictionary with QKD results or None if failed
+            Dictionary with QKD results or None if failed. "final_key" holds
+            the key bits packed MSB-first into bytes and "key_length" the
+            number of bits; use unpack_key() to get a list of bits.
         """
-        import numpy as np
-        
         logger.info(f"Starting BB84 protocol on Braket with {n_bits} qubits")
         
-        # Generate random bits and bases
-        alice_bits = np.random.randint(0, 2, n_bits).tolist()
-        alice_bases = np.random.randint(0, 2, n_bits).tolist()
-        bob_bases = np.random.randint(0, 2, n_bits).tolist()
-        
-        # Run quantum exchange
-        bob_bits = self.backend.run_batch_qkd(alice_bits, alice_bases, bob_bases)
+        # Generate random bits and bases from one OS-entropy draw
+        n_random = 3 * n_bits
+        packed = np.frombuffer(secrets.token_bytes((n_random + 7) // 8), dtype=np.uint8)
+        alice_bits, alice_bases, bob_bases = np.unpackbits(packed)[:n_random].reshape(3, n_bits)
         
-        # Sift keys (keep only matching bases)
-        sifted_alice = []
-        sifted_bob = []
-        for a_bit, a_basis, b_bit, b_basis in zip(
-            alice_bits, alice_bases, bob_bits, bob_bases
-        ):
-            if a_basis == b_basis:
-                sifted_alice.append(a_bit)
-                sifted_bob.append(b_bit)
+        # Sift before transmitting: both bases are chosen locally, so only
+        # qubits whose bases match are worth running on the device
+        matches = alice_bases == bob_bases
+        sifted_alice = alice_bits[matches]
+        sifted_bases = alice_bases[matches]
         
         if len(sifted_alice) == 0:
             logger.error("No matching bases found")
             return None
         
+        logger.info(f"Transmitting {len(sifted_alice)} of {n_bits} qubits (matching bases)")
+        
+        if self.backend.use_local_simulator:
+            # Evaluated analytically by the backend, no circuits involved
+            sifted_bob = self.backend.run_qkd_exchange(sifted_alice, sifted_bases, sifted_bases)
+            device_name = self.backend.get_device_info()["name"]
+        else:
+            # Submit first; fetch device info while the tasks run
+            batch = self.backend.submit_qkd_exchange(
+                sifted_alice, sifted_bases, sifted_bases, max_parallel=max_parallel
+            )
+            device_name = self.backend.get_device_info()["name"]
+            sifted_bob = self.backend.collect_batch(batch, progress_callback)
+        
         # Estimate error rate
         sample_size = len(sifted_alice) // 2
-        errors = sum(
-            1 for i in range(sample_size)
-            if sifted_alice[i] != sifted_bob[i]
-        )
-        error_rate = errors / sample_size
+        error_rate = _sample_qber(sifted_alice, sifted_bob, sample_size)
         
         if error_rate > error_threshold:
             logger.warning(f"Error rate {error_rate:.4f} exceeds threshold")
             return None
         
         # Use remaining bits as key
-        final_key = sifted_alice[sample_size:]
+        final_key_bits = sifted_alice[sample_size:]
+        final_key = np.packbits(final_key_bits).tobytes()
         
         result = {
             "final_key": final_key,
-            "key_length": len(final_key),
+            "key_length": int(final_key_bits.size),
             "error_rate": error_rate,
             "sifted_bits": len(sifted_alice),
             "raw_bits": n_bits,
-            "device": self.backend.get_device_info()["name"]
+            "device": device_name
         }
         
-        logger.info(f"BB84 completed. Key length: {len(final_key)}, QBER: {error_rate:.4f}")
+        logger.info(f"BB84 completed. Key length: {final_key_bits.size}, QBER: {error_rate:.4f}")
         return result
 
+
+def run_bb84_hybrid_job(
+    device_arn: str,
+    n_bits: int = 1000,
+    error_threshold: float = 0.11
+) -> Optional[Dict]:
+    """
+    Run the whole BB84 exchange inside a single Braket Hybrid Job.
+    
+    The job container gets priority access to the QPU and submits the
+    parametric circuit batch from there, instead of every task going
+    through the CreateQuantumTask rate limit and the shared queue from
+    the client. Blocks until the job finishes.
+    
+    Args:
+        device_arn: ARN of the AWS quantum device
+        n_bits: Number of qubits to exchange
+        error_threshold: Maximum acceptable error rate
+    
+    Returns:
+        Dictionary with QKD results (as from BraketQKD.run_bb84) or None if failed
+    """
+    if not BRAKET_AVAILABLE:
+        raise ImportError(
+            "AWS Braket SDK not installed. "
+            "Install with: pip install amazon-braket-sdk"
+        )
+    
+    @hybrid_job(device=device_arn, include_modules="ncrypt")
+    def _run_qkd_on_device(n_bits: int, error_threshold: float):
+        from braket.jobs import get_job_device_arn
+        
+        backend = BraketBackend(device_arn=get_job_device_arn(), use_local_simulator=False)
+        return BraketQKD(backend).run_bb84(n_bits=n_bits, error_threshold=error_threshold)
+    
+    logger.info(f"Submitting BB84 hybrid job with {n_bits} qubits on {device_arn}")
+    job = _run_qkd_on_device(n_bits, error_threshold)
+    
+    result = job.result()
+    logger.info(f"Hybrid job {job.arn} finished")
+    return result
@@ -4,17 +4,22 @@ Command-line interface for quantum cryptography operations.
 """
 
 import click
-import yaml
+import functools
+import hashlib
+import json
 import logging
+import os
 import sys
+import tempfile
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 
-from ncrypt.core.qkd import BB84Protocol
-from ncrypt.core.encryption import QuantumEncryption
-from ncrypt.simulator.quantum_simulator import QuantumSimulator
-from ncrypt.utils.key_manager import KeyManager
-from ncrypt.utils.aws_pricing import BraketPricing
+# ncrypt modules, NumPy and yaml are imported inside the commands that use
+# them, so --help and unrelated commands do not pay for them at start-up
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
 
 # Configure logging
 logging.basicConfig(
@@ -23,29 +28,293 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Expected BB84 yield per raw qubit: ~50% survive basis sifting, ~17.5%
+# survive error checking and privacy amplification
+SIFTED_FRACTION = 0.5
+FINAL_KEY_FRACTION = 0.175
+
+# Estimated Braket charge above which key generation asks for confirmation
+HIGH_COST_THRESHOLD_USD = 100
+
+# Parsed YAML configs, cached per config path across CLI invocations
+CONFIG_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ncrypt", "config")
+
+# Multi-line report blocks, filled with a single % substitution each
+PRICING_ENTRY_TEMPLATE = (
+    "\n%s\n"
+    "  Task cost: $%s\n"
+    "  Shot cost: $%s\n"
+    "  Source: %s\n"
+    "  Example: %d circuits = $%.2f"
+)
+SIMULATED_RESULTS_TEMPLATE = (
+    "\n📊 Simulated Results (%d run%s):\n"
+    "   Average sifted key: %.0f bits\n"
+    "   Average final key: %.0f bits\n"
+    "   Final key range: %d-%d bits\n"
+    "   Average error rate: %.4f"
+)
+PLAN_COST_TEMPLATE = (
+    "\n   Task costs: $%s × %d = $%.2f\n"
+    "   Shot costs: $%s × %d = $%.2f\n"
+    "   " + "─" * 50 + "\n"
+    "   TOTAL COST: $%.2f"
+)
+ESTIMATE_COST_TEMPLATE = (
+    "\n📊 %s\n"
+    "   Task cost: $%s × %d = $%.2f\n"
+    "   Shot cost: $%s × %d = $%.2f\n"
+    "   " + "─" * 40 + "\n"
+    "   Total: $%.2f"
+)
+
+
+def _yaml_load(stream):
+    """Parse YAML with libyaml's C loader when available."""
+    import yaml
+    
+    return yaml.load(stream, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+def _yaml_dump(data, stream) -> None:
+    """Write YAML with libyaml's C dumper when available."""
+    import yaml
+    
+    yaml.dump(data, stream, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper),
+              default_flow_style=False)
+
+
+def _read_sidecar(metadata_file: str) -> dict:
+    """
+    Read a legacy YAML .meta sidecar (iv, tag, key_id).
+    
+    Encrypted files now carry this in their header; sidecars were written
+    by older versions.
+    
+    Args:
+        metadata_file: Path to the .meta file
+    
+    Returns:
+        Metadata dictionary
+    """
+    # Bytes go straight to libyaml, which decodes UTF-8 itself, so no str
+    # copy of the file is made
+    with open(metadata_file, 'rb') as f:
+        return _yaml_load(f.read())
+
+
+def _simulate_run(args: Tuple[int, float]) -> Optional[Tuple[int, int, float]]:
+    """
+    Run one simulated BB84 exchange for plan-execution.
+    
+    Module-level so it can be sent to ProcessPoolExecutor workers.
+    
+    Args:
+        args: (n_bits, noise_level)
+    
+    Returns:
+        (sifted_length, final_key_length, error_rate), or None if the run
+        was rejected by the QBER check
+    """
+    from ncrypt.core.qkd import BB84Protocol
+    
+    n_bits, noise_level = args
+    result = BB84Protocol().run_protocol(n_bits=n_bits, noise_level=noise_level)
+    if result is None:
+        return None
+    return len(result.sifted_key), result.key_length, result.error_rate
+
+
+class _EchoBuffer:
+    """Collect report lines and write them to stdout in one call.
+    
+    Long reports otherwise pay for a terminal write per line.
+    """
+    
+    def __init__(self):
+        self.lines = []
+    
+    def echo(self, message: str = "") -> None:
+        self.lines.append(message)
+    
+    def flush(self) -> None:
+        if self.lines:
+            click.echo("\n".join(self.lines))
+            self.lines = []
+
+
+def _braket_circuits(bits: int) -> int:
+    """Circuits run on a Braket device for a key exchange of `bits` qubits.
+    
+    Only qubits with matching bases (~50%) are run on the device.
+    """
+    return int(bits * SIFTED_FRACTION)
+
+
+@functools.lru_cache(maxsize=64)
+def _device_type(device_arn: str) -> str:
+    """Map a Braket device ARN to a BraketPricing device type."""
+    return 'ionq' if 'ionq' in device_arn.lower() else 'rigetti'
+
+
+@functools.lru_cache(maxsize=4)
+def _key_manager(storage_dir: Path):
+    """Return a KeyManager for storage_dir, shared within the process."""
+    from ncrypt.utils.key_manager import KeyManager
+    
+    return KeyManager(storage_dir)
+
 
 def load_config(config_path: str) -> dict:
-    """Load configuration from YAML file."""
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
+    """
+    Load configuration from a TOML, JSON or YAML file.
+    
+    The format is chosen from the file extension; anything that is not
+    .toml or .json is parsed as YAML so existing config.yaml files keep
+    working. PyYAML is only imported for YAML configs, and the parsed
+    YAML is cached under CONFIG_CACHE_DIR (see _load_yaml_config).
+    
+    Args:
+        config_path: Path to the configuration file
+    
+    Returns:
+        Configuration dictionary
+    """
+    suffix = Path(config_path).suffix.lower()
+    
+    if suffix == '.toml':
+        if tomllib is None:
+            raise click.UsageError("TOML configs require Python 3.11+; use config.yaml or config.json")
+        with open(config_path, 'rb') as f:
+            return tomllib.load(f)
+    
+    if suffix == '.json':
+        with open(config_path, 'r') as f:
+            return json.load(f) or {}
+    
+    return _load_yaml_config(os.fspath(config_path))
+
+
+def _load_yaml_config(config_path: str) -> dict:
+    """
+    Load a YAML config through a JSON cache keyed on the file's mtime and size.
+    
+    The cache lives in CONFIG_CACHE_DIR, named after the config's absolute
+    path, and stores the (mtime_ns, size) stamp next to the parsed data.
+    Configs that do not survive a JSON round trip unchanged (dates, non-str
+    keys, ...) are never cached. A stale, unreadable or malformed cache
+    falls back to parsing the YAML; cache write failures are ignored.
+    
+    Args:
+        config_path: Path to the YAML configuration file
+    
+    Returns:
+        Configuration dictionary
+    """
+    st = os.stat(config_path)
+    stamp = [st.st_mtime_ns, st.st_size]
+    name = hashlib.sha256(os.path.abspath(config_path).encode()).hexdigest()[:32]
+    cache_path = os.path.join(CONFIG_CACHE_DIR, f"{name}.json")
+    
+    try:
+        with open(cache_path, 'r') as f:
+            cached = json.load(f)
+        if cached["stamp"] == stamp and isinstance(cached["config"], dict):
+            return cached["config"]
+    except (OSError, ValueError, TypeError, KeyError, RecursionError):
+        pass
+    
+    with open(config_path, 'rb') as f:
+        config = _yaml_load(f) or {}
+    
+    try:
+        encoded = json.dumps({"stamp": stamp, "config": config})
+        if json.loads(encoded)["config"] != config:
+            return config
+    except (TypeError, ValueError, RecursionError):
+        return config
+    
+    tmp_path = None
+    try:
+        os.makedirs(CONFIG_CACHE_DIR, mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CONFIG_CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(encoded)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.debug(f"Could not write config cache {cache_path}: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    
     return config
 
 
+def _toml_value(value) -> str:
+    """Format a scalar config value as a TOML literal."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return json.dumps(str(value))
+
+
+def dump_toml(config: dict) -> str:
+    """
+    Serialize a config dictionary (scalars plus one level of tables) as TOML.
+    
+    None values have no TOML representation and are written as comments.
+    
+    Args:
+        config: Configuration dictionary
+    
+    Returns:
+        TOML document
+    """
+    lines = []
+    tables = []
+    
+    for key, value in config.items():
+        if isinstance(value, dict):
+            tables.append((key, value))
+        elif value is None:
+            lines.append(f"# {key} =")
+        else:
+            lines.append(f"{key} = {_toml_value(value)}")
+    
+    for name, table in tables:
+        lines.append("")
+        lines.append(f"[{name}]")
+        for key, value in table.items():
+            if value is None:
+                lines.append(f"# {key} =")
+            else:
+                lines.append(f"{key} = {_toml_value(value)}")
+    
+    return "\n".join(lines) + "\n"
+
+
 @click.group()
-@click.option('--config', '-c', type=click.Path(exists=True), help='Path to config.yaml')
+@click.option('--config', '-c', type=click.Path(exists=True), help='Path to config.toml, config.json or config.yaml')
 @click.option('--verbose', '-v', is_flag=True, help='Enable verbose output')
 @click.pass_context
 def cli(ctx, config, verbose):
     """nCrypt: Quantum Cryptography SDK"""
     ctx.ensure_object(dict)
+    ctx.obj.setdefault('key_manager_factory', _key_manager)
     
     if verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
-    if config:
+    # init-config writes a fresh config and shell completion only parses
+    # arguments, so neither needs the existing config (--help never gets here)
+    if config and ctx.invoked_subcommand != 'init-config' and not ctx.resilient_parsing:
         ctx.obj['config'] = load_config(config)
     else:
         ctx.obj['config'] = {}
+    
+    # Resolve the key directory once; commands and the KeyManager cache
+    # share the same canonical path
+    ctx.obj['storage_dir'] = Path(ctx.obj['config'].get('key_storage', './keys')).resolve()
 
 
 @cli.command()
@@ -55,8 +324,12 @@ def cli(ctx, config, verbose):
 @click.option('--backend', '-b', type=click.Choice(['simulator', 'braket']), default='simulator')
 @click.option('--device-arn', help='AWS Braket device ARN (for braket backend)')
 @click.option('--dry-run', is_flag=True, help='Show what would be executed without running')
+@click.option('--daemon-socket', type=click.Path(), help='Generate via a running ncrypt-daemon (simulator backend)')
+@click.option('--hybrid-job', is_flag=True, help='Run the whole exchange as one Braket Hybrid Job (requires --device-arn)')
+@click.option('--refresh-pricing', is_flag=True, help='Ignore cached AWS pricing and query the Pricing API again')
+@click.option('--max-parallel', default=50, show_default=True, help='Maximum Braket tasks in flight at once (braket backend)')
 @click.pass_context
-def generate_key(ctx, bits, noise, key_id, backend, device_arn, dry_run):
+def generate_key(ctx, bits, noise, key_id, backend, device_arn, dry_run, daemon_socket, hybrid_job, refresh_pricing, max_parallel):
     """Generate quantum key using BB84 protocol."""
     
     if dry_run:
@@ -68,20 +341,22 @@ def generate_key(ctx, bits, noise, key_id, backend, device_arn, dry_run):
     # Calculate exact resource usage
     click.echo(f"\n📊 Resource Calculation:")
     click.echo(f"   Raw qubits to exchange: {bits}")
-    click.echo(f"   Expected sifted key: ~{bits // 2} bits (50% basis matching)")
-    click.echo(f"   Expected final key: ~{int(bits * 0.175)} bits (after error check & amplification)")
+    click.echo(f"   Expected sifted key: ~{int(bits * SIFTED_FRACTION)} bits (50% basis matching)")
+    click.echo(f"   Expected final key: ~{int(bits * FINAL_KEY_FRACTION)} bits (after error check & amplification)")
     
     if backend == 'braket' and device_arn:
         # Calculate exact AWS costs using real-time pricing
         click.echo(f"\n💰 AWS Braket Resource Usage:")
-        click.echo(f"   Number of circuits: {bits}")
+        n_circuits = _braket_circuits(bits)
+        click.echo(f"   Number of circuits: ~{n_circuits} (matching-basis qubits only)")
         click.echo(f"   Shots per circuit: 1")
-        click.echo(f"   Total quantum tasks: {bits}")
+        click.echo(f"   Total quantum tasks: ~{n_circuits}")
         
         # Get real-time pricing from AWS
-        pricer = BraketPricing()
-        device_type = 'ionq' if 'ionq' in device_arn.lower() else 'rigetti'
-        cost_info = pricer.calculate_cost(bits, device_type, shots_per_circuit=1)
+        from ncrypt.utils.aws_pricing import BraketPricing
+        pricer = BraketPricing(refresh=refresh_pricing)
+        device_type = _device_type(device_arn)
+        cost_info = pricer.calculate_cost(n_circuits, device_type, shots_per_circuit=1)
         
         click.echo(f"   Estimated cost: ${cost_info['total_cost']:.2f}")
         if cost_info['pricing_source'] == 'AWS Pricing API':
@@ -89,7 +364,7 @@ def generate_key(ctx, bits, noise, key_id, backend, device_arn, dry_run):
         else:
             click.echo(f"   (Fallback pricing - AWS API unavailable)")
         
-        if cost_info['total_cost'] > 100:
+        if cost_info['total_cost'] > HIGH_COST_THRESHOLD_USD:
             click.echo(f"\n⚠️  HIGH COST WARNING: ${cost_info['total_cost']:.2f}")
             click.echo(f"   Consider reducing --bits or using simulator")
             if not dry_run:
@@ -108,8 +383,29 @@ def generate_key(ctx, bits, noise, key_id, backend, device_arn, dry_run):
         click.echo(f"   Recommended: at least 2000 qubits for 256-bit keys")
     
     try:
-        if backend == 'simulator':
+        if backend == 'simulator' and daemon_socket:
+            # Use the long-running daemon's warmed-up simulator
+            from ncrypt.daemon import request_key
+            
+            response = request_key(n_bits=bits, noise_level=noise, socket_path=daemon_socket)
+            
+            if response is None:
+                click.echo("❌ Key generation failed: error rate too high", err=True)
+                sys.exit(1)
+            
+            key = response["key"]
+            metadata = {
+                "protocol": "BB84",
+                "backend": "simulator",
+                "noise_level": noise,
+                "error_rate": response["error_rate"],
+                "raw_bits": bits
+            }
+        
+        elif backend == 'simulator':
             # Use simulator
+            from ncrypt.core.qkd import BB84Protocol
+            
             protocol = BB84Protocol()
             result = protocol.run_protocol(n_bits=bits, noise_level=noise)
             
@@ -129,25 +425,43 @@ def generate_key(ctx, bits, noise, key_id, backend, device_arn, dry_run):
         elif backend == 'braket':
             # Use AWS Braket
             try:
-                from ncrypt.braket.quantum_backend import BraketBackend, BraketQKD
+                from ncrypt.braket.quantum_backend import (
+                    BraketBackend, BraketQKD, run_bb84_hybrid_job, unpack_key
+                )
             except ImportError:
                 click.echo("❌ AWS Braket SDK not installed", err=True)
                 click.echo("Install with: pip install amazon-braket-sdk", err=True)
                 sys.exit(1)
             
-            if device_arn:
-                braket_backend = BraketBackend(device_arn=device_arn, use_local_simulator=False)
+            if hybrid_job:
+                if not device_arn:
+                    click.echo("❌ --hybrid-job requires --device-arn", err=True)
+                    sys.exit(1)
+                click.echo(f"Submitting Braket Hybrid Job on {device_arn}...")
+                result = run_bb84_hybrid_job(device_arn, n_bits=bits)
             else:
-                braket_backend = BraketBackend(use_local_simulator=True)
-            
-            qkd = BraketQKD(braket_backend)
-            result = qkd.run_bb84(n_bits=bits)
+                if device_arn:
+                    braket_backend = BraketBackend(device_arn=device_arn, use_local_simulator=False)
+                else:
+                    braket_backend = BraketBackend(use_local_simulator=True)
+                
+                def report_progress(completed, total):
+                    click.echo(f"\r   Quantum tasks completed: {completed}/{total}", nl=False)
+                    if completed == total:
+                        click.echo()
+                
+                qkd = BraketQKD(braket_backend)
+                result = qkd.run_bb84(
+                    n_bits=bits,
+                    max_parallel=max_parallel,
+                    progress_callback=report_progress if device_arn else None
+                )
             
             if result is None:
                 click.echo("❌ Key generation failed", err=True)
                 sys.exit(1)
             
-            key = result["final_key"]
+            key = unpack_key(result["final_key"], result["key_length"])
             metadata = {
                 "protocol": "BB84",
                 "backend": "braket",
@@ -157,9 +471,7 @@ def generate_key(ctx, bits, noise, key_id, backend, device_arn, dry_run):
             }
         
         # Save key
-        config = ctx.obj.get('config', {})
-        storage_dir = config.get('key_storage', './keys')
-        key_manager = KeyManager(storage_dir)
+        key_manager = ctx.obj['key_manager_factory'](ctx.obj['storage_dir'])
         key_manager.save_key(key, key_id, metadata)
         
         click.echo(f"✅ Key generated successfully!")
@@ -186,9 +498,7 @@ def generate_key(ctx, bits, noise, key_id, backend, device_arn, dry_run):
 def show_key(ctx, key_id):
     """Show key information."""
     try:
-        config = ctx.obj.get('config', {})
-        storage_dir = config.get('key_storage', './keys')
-        key_manager = KeyManager(storage_dir)
+        key_manager = ctx.obj['key_manager_factory'](ctx.obj['storage_dir'])
         
         info = key_manager.get_key_info(key_id)
         
@@ -214,9 +524,7 @@ def show_key(ctx, key_id):
 def list_keys(ctx):
     """List all stored keys."""
     try:
-        config = ctx.obj.get('config', {})
-        storage_dir = config.get('key_storage', './keys')
-        key_manager = KeyManager(storage_dir)
+        key_manager = ctx.obj['key_manager_factory'](ctx.obj['storage_dir'])
         
         keys = key_manager.list_keys()
         
@@ -227,8 +535,12 @@ def list_keys(ctx):
         click.echo(f"\nStored Keys ({len(keys)}):")
         click.echo("-" * 80)
         
-        for key_info in keys:
-            click.echo(f"  {key_info['key_id']:20s} | {key_info['key_length']:6d} bits | {key_info['timestamp'][:19]}")
+        # One write for the whole listing instead of a flush per key
+        lines = [
+            f"  {key_info['key_id']:20s} | {key_info['key_length']:6d} bits | {key_info['timestamp'][:19]}"
+            for key_info in keys
+        ]
+        click.echo("\n".join(lines))
         
     except Exception as e:
         click.echo(f"❌ Error: {e}", err=True)
@@ -239,35 +551,27 @@ def list_keys(ctx):
 @click.option('--key-id', '-k', required=True, help='Key identifier')
 @click.option('--input', '-i', required=True, type=click.Path(exists=True), help='Input file')
 @click.option('--output', '-o', required=True, type=click.Path(), help='Output file')
+@click.option('--chunk-size', default=1024 * 1024, show_default=True, help='Bytes read per streaming step')
 @click.pass_context
-def encrypt(ctx, key_id, input, output):
+def encrypt(ctx, key_id, input, output, chunk_size):
     """Encrypt file using quantum key."""
     try:
-        config = ctx.obj.get('config', {})
-        storage_dir = config.get('key_storage', './keys')
-        key_manager = KeyManager(storage_dir)
+        key_manager = ctx.obj['key_manager_factory'](ctx.obj['storage_dir'])
         
         # Load key
         key_data = key_manager.load_key(key_id)
         quantum_key = key_data["key"]
         
-        # Encrypt
-        qe = QuantumEncryption()
-        iv, tag = qe.encrypt_file(input, output, quantum_key)
+        # Encrypt (IV, tag and key ID go into the file header)
+        from ncrypt.core.encryption import QuantumEncryption
         
-        # Save IV and tag
-        metadata_file = f"{output}.meta"
-        with open(metadata_file, 'w') as f:
-            yaml.dump({
-                'iv': iv.hex(),
-                'tag': tag.hex(),
-                'key_id': key_id
-            }, f)
+        qe = QuantumEncryption()
+        qe.encrypt_file(input, output, quantum_key, key_id=key_id, chunk_size=chunk_size)
         
         click.echo(f"✅ File encrypted successfully!")
         click.echo(f"   Input: {input}")
         click.echo(f"   Output: {output}")
-        click.echo(f"   Metadata: {metadata_file}")
+        click.echo(f"   Metadata: stored in file header")
         
     except Exception as e:
         click.echo(f"❌ Error: {e}", err=True)
@@ -278,29 +582,33 @@ def encrypt(ctx, key_id, input, output):
 @click.option('--key-id', '-k', help='Key identifier (or read from metadata)')
 @click.option('--input', '-i', required=True, type=click.Path(exists=True), help='Encrypted file')
 @click.option('--output', '-o', required=True, type=click.Path(), help='Output file')
-@click.option('--metadata', '-m', type=click.Path(exists=True), help='Metadata file')
+@click.option('--metadata', '-m', type=click.Path(exists=True), help='Legacy .meta file (for files without a header)')
+@click.option('--chunk-size', default=1024 * 1024, show_default=True, help='Bytes read per streaming step')
 @click.pass_context
-def decrypt(ctx, key_id, input, output, metadata):
+def decrypt(ctx, key_id, input, output, metadata, chunk_size):
     """Decrypt file using quantum key."""
     try:
-        config = ctx.obj.get('config', {})
-        storage_dir = config.get('key_storage', './keys')
-        key_manager = KeyManager(storage_dir)
+        key_manager = ctx.obj['key_manager_factory'](ctx.obj['storage_dir'])
         
-        # Load metadata
-        if metadata:
-            metadata_file = metadata
-        else:
-            metadata_file = f"{input}.meta"
+        from ncrypt.core.encryption import QuantumEncryption
         
-        with open(metadata_file, 'r') as f:
-            meta = yaml.safe_load(f)
+        qe = QuantumEncryption()
         
-        iv = bytes.fromhex(meta['iv'])
-        tag = bytes.fromhex(meta['tag'])
+        # Load metadata: binary file header, or a legacy YAML .meta sidecar
+        header = None if metadata else qe.read_header(input)
+        
+        if header is not None:
+            iv, tag, meta_key_id = header["iv"], header["tag"], header["key_id"]
+            offset = header["header_length"]
+        else:
+            meta = _read_sidecar(metadata or f"{input}.meta")
+            iv = bytes.fromhex(meta['iv'])
+            tag = bytes.fromhex(meta['tag'])
+            meta_key_id = meta.get('key_id')
+            offset = 0
         
         if not key_id:
-            key_id = meta.get('key_id')
+            key_id = meta_key_id
             if not key_id:
                 raise ValueError("Key ID not specified and not found in metadata")
         
@@ -309,8 +617,7 @@ def decrypt(ctx, key_id, input, output, metadata):
         quantum_key = key_data["key"]
         
         # Decrypt
-        qe = QuantumEncryption()
-        qe.decrypt_file(input, output, iv, tag, quantum_key)
+        qe.decrypt_file(input, output, iv, tag, quantum_key, offset=offset, chunk_size=chunk_size)
         
         click.echo(f"✅ File decrypted successfully!")
         click.echo(f"   Input: {input}")
@@ -329,6 +636,8 @@ def test_channel(bits, noise):
     click.echo(f"Testing quantum channel...")
     
     try:
+        from ncrypt.simulator.quantum_simulator import QuantumSimulator
+        
         simulator = QuantumSimulator()
         stats = simulator.estimate_channel_quality(n_test_qubits=bits, noise_level=noise)
         
@@ -350,7 +659,8 @@ def test_channel(bits, noise):
 
 @cli.command()
 @click.option('--profile', '-p', default='default', help='AWS profile')
-def show_pricing(profile):
+@click.option('--refresh-pricing', is_flag=True, help='Ignore cached AWS pricing and query the Pricing API again')
+def show_pricing(profile, refresh_pricing):
     """
     Show current AWS Braket pricing (fetches from AWS Pricing API).
     
@@ -360,40 +670,47 @@ def show_pricing(profile):
     """
     click.echo("💰 AWS Braket Pricing Information\n")
     
-    pricer = BraketPricing(aws_profile=profile)
+    from ncrypt.utils.aws_pricing import BraketPricing
+    pricer = BraketPricing(aws_profile=profile, refresh=refresh_pricing)
     
     # Try to fetch pricing for all devices
     click.echo("Fetching pricing from AWS Pricing API...\n")
     
     all_pricing = pricer.get_all_pricing()
     
-    click.echo("=" * 60)
+    out = _EchoBuffer()
+    out.echo("=" * 60)
     for device_type, pricing in all_pricing.items():
-        click.echo(f"\n{pricing['name'].upper()}")
-        click.echo(f"  Task cost: ${pricing['task']}")
-        click.echo(f"  Shot cost: ${pricing['shot']}")
-        
         if pricing.get('source') == 'AWS Pricing API':
-            click.echo(f"  Source: 📡 AWS Pricing API (real-time)")
+            source = "📡 AWS Pricing API (real-time)"
         else:
-            click.echo(f"  Source: ℹ️  Fallback (updated late 2024)")
+            source = "ℹ️  Fallback (updated late 2024)"
         
         # Example costs
         example_circuits = 100
         example_cost = (pricing['task'] + pricing['shot']) * example_circuits
-        click.echo(f"  Example: {example_circuits} circuits = ${example_cost:.2f}")
+        out.echo(PRICING_ENTRY_TEMPLATE % (
+            pricing['name'].upper(), pricing['task'], pricing['shot'],
+            source, example_circuits, example_cost
+        ))
     
-    click.echo("\n" + "=" * 60)
-    click.echo("\n💡 Tips:")
-    click.echo("  - Rigetti is ~28x cheaper per shot than IonQ")
-    click.echo("  - Simulator is always FREE")
-    click.echo("  - Pricing updates automatically from AWS when available")
-    click.echo("\n  To check costs: ncrypt estimate-cost --bits <N> --device <TYPE>")
+    out.echo("\n" + "=" * 60)
+    out.echo("\n💡 Tips:")
+    out.echo("  - Rigetti is ~28x cheaper per shot than IonQ")
+    out.echo("  - Simulator is always FREE")
+    out.echo("  - Pricing updates automatically from AWS when available")
+    out.echo("\n  To check costs: ncrypt estimate-cost --bits <N> --device <TYPE>")
+    out.flush()
 
 
 @cli.command()
-def init_config():
-    """Initialize config.yaml file."""
+@click.option('--format', 'fmt', type=click.Choice(['toml', 'json', 'yaml']), default=None,
+              help='Config file format (default: toml on Python 3.11+, otherwise yaml)')
+def init_config(fmt):
+    """Initialize a config file (config.toml by default)."""
+    if fmt is None:
+        fmt = 'toml' if tomllib is not None else 'yaml'
+    
     config = {
         'key_storage': './keys',
         'bb84': {
@@ -402,7 +719,7 @@ def init_config():
             'error_threshold': 0.11
         },
         'encryption': {
-            'algorithm': 'AES-256-CBC'
+            'algorithm': 'AES-256-GCM'
         },
         'braket': {
             'use_local_simulator': True,
@@ -411,14 +728,19 @@ def init_config():
         }
     }
     
-    config_path = Path('./config.yaml')
+    config_path = Path(f'./config.{fmt}')
     if config_path.exists():
-        click.confirm('config.yaml already exists. Overwrite?', abort=True)
+        click.confirm(f'{config_path.name} already exists. Overwrite?', abort=True)
     
     with open(config_path, 'w') as f:
-        yaml.dump(config, f, default_flow_style=False)
+        if fmt == 'toml':
+            f.write(dump_toml(config))
+        elif fmt == 'json':
+            json.dump(config, f, indent=2)
+        else:
+            _yaml_dump(config, f)
     
-    click.echo(f"✅ Created config.yaml")
+    click.echo(f"✅ Created {config_path.name}")
 
 
 @cli.command()
@@ -427,12 +749,18 @@ def init_config():
 @click.option('--region', '-r', default='us-east-1', help='AWS region')
 def check_aws_costs(month, profile, region):
     """Check AWS Braket costs using real AWS billing data."""
-    import subprocess
-    import json
-    from datetime import datetime, timedelta
+    import importlib.util
+    from datetime import datetime
     
     click.echo("💰 Checking AWS Braket costs...\n")
     
+    # boto3 ships with amazon-braket-sdk; probe for it before doing any work
+    if importlib.util.find_spec('boto3') is None:
+        click.echo("❌ boto3 not installed!", err=True)
+        click.echo("   Install: pip install boto3 (included with amazon-braket-sdk)", err=True)
+        click.echo("   Configure: aws configure", err=True)
+        sys.exit(1)
+    
     # Determine time period
     if month:
         try:
@@ -459,93 +787,61 @@ def check_aws_costs(month, profile, region):
     
     click.echo(f"📅 Period: {start_str} to {end_str}")
     
-    # Check if AWS CLI is installed
-    try:
-        subprocess.run(['aws', '--version'], capture_output=True, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        click.echo("❌ AWS CLI not installed!", err=True)
-        click.echo("   Install: pip install awscli", err=True)
-        click.echo("   Configure: aws configure", err=True)
-        sys.exit(1)
+    # Calling boto3 in-process avoids starting a separate aws CLI
+    # interpreter per request
+    import boto3
+    from botocore.exceptions import BotoCoreError, ClientError
     
     # Check AWS credentials
     try:
-        result = subprocess.run(
-            ['aws', 'sts', 'get-caller-identity', '--profile', profile],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        identity = json.loads(result.stdout)
+        session = boto3.Session(profile_name=profile, region_name=region)
+        identity = session.client('sts').get_caller_identity()
         click.echo(f"✅ AWS Account: {identity['Account']}")
         click.echo(f"   User/Role: {identity['Arn'].split('/')[-1]}\n")
-    except subprocess.CalledProcessError as e:
+    except (BotoCoreError, ClientError) as e:
         click.echo("❌ AWS credentials not configured or invalid!", err=True)
-        click.echo(f"   Error: {e.stderr}", err=True)
+        click.echo(f"   Error: {e}", err=True)
         click.echo("\n   Run: aws configure --profile " + profile, err=True)
         sys.exit(1)
     
-    # Get Braket costs
+    # Get Braket and total costs from one query grouped by service
     try:
-        # Query specifically for Amazon Braket service
-        cmd_braket = [
-            'aws', 'ce', 'get-cost-and-usage',
-            '--time-period', f'Start={start_str},End={end_str}',
-            '--granularity', 'MONTHLY',
-            '--metrics', 'BlendedCost',
-            '--filter', json.dumps({"Dimensions": {"Key": "SERVICE", "Values": ["Amazon Braket"]}}),
-            '--profile', profile
-        ]
-        
-        result = subprocess.run(cmd_braket, capture_output=True, text=True, check=True)
-        data = json.loads(result.stdout)
+        data = session.client('ce').get_cost_and_usage(
+            TimePeriod={'Start': start_str, 'End': end_str},
+            Granularity='MONTHLY',
+            Metrics=['BlendedCost'],
+            GroupBy=[{'Type': 'DIMENSION', 'Key': 'SERVICE'}]
+        )
         
-        # Parse Braket costs
         braket_cost = 0.0
-        if 'ResultsByTime' in data and data['ResultsByTime']:
-            for time_period in data['ResultsByTime']:
-                cost = float(time_period['Total']['BlendedCost']['Amount'])
-                braket_cost += cost
-        
-        click.echo(f"🔬 Amazon Braket")
-        click.echo(f"   Cost: ${braket_cost:.2f}")
-        
-        # Get total AWS costs (all services)
-        cmd_total = [
-            'aws', 'ce', 'get-cost-and-usage',
-            '--time-period', f'Start={start_str},End={end_str}',
-            '--granularity', 'MONTHLY',
-            '--metrics', 'BlendedCost',
-            '--profile', profile
-        ]
-        
-        result_total = subprocess.run(cmd_total, capture_output=True, text=True, check=True)
-        data_total = json.loads(result_total.stdout)
-        
         total_cost = 0.0
-        if 'ResultsByTime' in data_total and data_total['ResultsByTime']:
-            for time_period in data_total['ResultsByTime']:
-                cost = float(time_period['Total']['BlendedCost']['Amount'])
+        for time_period in data.get('ResultsByTime', []):
+            for group in time_period.get('Groups', []):
+                cost = float(group['Metrics']['BlendedCost']['Amount'])
                 total_cost += cost
+                if group['Keys'][0] == 'Amazon Braket':
+                    braket_cost += cost
+        
+        out = _EchoBuffer()
+        out.echo(f"🔬 Amazon Braket")
+        out.echo(f"   Cost: ${braket_cost:.2f}")
         
-        click.echo(f"\n💵 Total Braket Cost: ${braket_cost:.2f}")
-        click.echo(f"💵 Total AWS Cost (all services): ${total_cost:.2f}")
+        out.echo(f"\n💵 Total Braket Cost: ${braket_cost:.2f}")
+        out.echo(f"💵 Total AWS Cost (all services): ${total_cost:.2f}")
         
         if braket_cost == 0.0:
-            click.echo("\n✅ No Braket charges found (using local simulator or no usage)")
+            out.echo("\n✅ No Braket charges found (using local simulator or no usage)")
         elif braket_cost < 10.0:
-            click.echo("\n✅ Costs are low")
+            out.echo("\n✅ Costs are low")
         elif braket_cost < 50.0:
-            click.echo("\n⚠️  Moderate costs - monitor usage")
+            out.echo("\n⚠️  Moderate costs - monitor usage")
         else:
-            click.echo("\n⚠️  HIGH COSTS - review quantum device usage!")
+            out.echo("\n⚠️  HIGH COSTS - review quantum device usage!")
+        out.flush()
         
-    except subprocess.CalledProcessError as e:
+    except (BotoCoreError, ClientError) as e:
         click.echo("❌ Failed to get cost data from AWS", err=True)
-        click.echo(f"   Error: {e.stderr}", err=True)
-        sys.exit(1)
-    except json.JSONDecodeError:
-        click.echo("❌ Failed to parse AWS response", err=True)
+        click.echo(f"   Error: {e}", err=True)
         sys.exit(1)
 
 
@@ -553,7 +849,8 @@ def check_aws_costs(month, profile, region):
 @click.option('--bits', '-n', type=int, required=True, help='Number of qubits for key generation')
 @click.option('--device-arn', help='AWS Braket device ARN')
 @click.option('--runs', '-r', type=int, default=1, help='Number of simulation runs for accuracy')
-def plan_execution(bits, device_arn, runs):
+@click.option('--refresh-pricing', is_flag=True, help='Ignore cached AWS pricing and query the Pricing API again')
+def plan_execution(bits, device_arn, runs, refresh_pricing):
     """Plan quantum operation with exact resource calculation using simulator."""
     click.echo(f"📋 EXECUTION PLAN\n")
     click.echo(f"Operation: BB84 Quantum Key Distribution")
@@ -563,87 +860,105 @@ def plan_execution(bits, device_arn, runs):
     # Run on simulator multiple times to get accurate statistics
     click.echo(f"\n🔬 Running {runs} simulation(s) to calculate exact resources...")
     
-    from ncrypt.core.qkd import BB84Protocol
-    protocol = BB84Protocol()
-    
-    results = []
-    for i in range(runs):
-        result = protocol.run_protocol(n_bits=bits, noise_level=0.01)
-        if result:
-            results.append({
-                'sifted': len(result.sifted_key),
-                'final': result.key_length,
-                'error_rate': result.error_rate
-            })
-    
-    if not results:
+    import numpy as np
+    
+    # Runs are independent: spread them over worker processes, but skip the
+    # pool start-up for a single run. Each run's BB84Protocol seeds its own
+    # generator from OS entropy, so forked workers do not repeat each other.
+    run_args = [(bits, 0.01)] * runs
+    if runs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        
+        with ProcessPoolExecutor(max_workers=min(runs, os.cpu_count() or 1)) as executor:
+            outcomes = list(executor.map(_simulate_run, run_args))
+    else:
+        outcomes = [_simulate_run(args) for args in run_args]
+    
+    # Per-run statistics, filled in place; runs rejected by the QBER check
+    # leave no entry
+    sifted = np.empty(runs, dtype=np.int64)
+    final = np.empty(runs, dtype=np.int64)
+    errors = np.empty(runs, dtype=np.float64)
+    n_ok = 0
+    
+    for outcome in outcomes:
+        if outcome is not None:
+            sifted[n_ok], final[n_ok], errors[n_ok] = outcome
+            n_ok += 1
+    
+    if n_ok == 0:
         click.echo("❌ Simulation failed")
         return
     
+    sifted, final, errors = sifted[:n_ok], final[:n_ok], errors[:n_ok]
+    
     # Calculate averages
-    avg_sifted = sum(r['sifted'] for r in results) / len(results)
-    avg_final = sum(r['final'] for r in results) / len(results)
-    avg_error = sum(r['error_rate'] for r in results) / len(results)
+    avg_sifted = sifted.mean()
+    avg_final = final.mean()
+    avg_error = errors.mean()
     
-    min_final = min(r['final'] for r in results)
-    max_final = max(r['final'] for r in results)
+    min_final = int(final.min())
+    max_final = int(final.max())
     
-    click.echo(f"\n📊 Simulated Results ({runs} run{'s' if runs > 1 else ''}):")
-    click.echo(f"   Average sifted key: {avg_sifted:.0f} bits")
-    click.echo(f"   Average final key: {avg_final:.0f} bits")
-    click.echo(f"   Final key range: {min_final}-{max_final} bits")
-    click.echo(f"   Average error rate: {avg_error:.4f}")
+    out = _EchoBuffer()
+    out.echo(SIMULATED_RESULTS_TEMPLATE % (
+        runs, 's' if runs > 1 else '', avg_sifted, avg_final,
+        min_final, max_final, avg_error
+    ))
     
     if avg_final < 256:
-        click.echo(f"\n⚠️  Expected key ({avg_final:.0f} bits) is too short for AES-256!")
-        click.echo(f"   Recommended: {int(256 / 0.175)} qubits for 256+ bit key")
+        out.echo(f"\n⚠️  Expected key ({avg_final:.0f} bits) is too short for AES-256!")
+        out.echo(f"   Recommended: {int(256 / FINAL_KEY_FRACTION)} qubits for 256+ bit key")
     else:
-        click.echo(f"\n✅ Expected key ({avg_final:.0f} bits) is sufficient for encryption")
+        out.echo(f"\n✅ Expected key ({avg_final:.0f} bits) is sufficient for encryption")
     
     # AWS Resource calculation
     if device_arn:
-        click.echo(f"\n💰 AWS Braket Resources (Real Device):")
-        click.echo(f"   Device: {device_arn.split('/')[-1]}")
-        click.echo(f"   Circuits to execute: {bits}")
-        click.echo(f"   Shots per circuit: 1")
-        click.echo(f"   Total tasks: {bits}")
+        out.echo(f"\n💰 AWS Braket Resources (Real Device):")
+        out.echo(f"   Device: {device_arn.split('/')[-1]}")
+        n_circuits = _braket_circuits(bits)
+        out.echo(f"   Circuits to execute: ~{n_circuits} (matching-basis qubits only)")
+        out.echo(f"   Shots per circuit: 1")
+        out.echo(f"   Total tasks: ~{n_circuits}")
         
         # Get real-time pricing from AWS
         from ncrypt.utils.aws_pricing import BraketPricing
-        pricer = BraketPricing()
-        device_type = 'ionq' if 'ionq' in device_arn.lower() else 'rigetti'
-        cost_info = pricer.calculate_cost(bits, device_type, shots_per_circuit=1)
+        pricer = BraketPricing(refresh=refresh_pricing)
+        device_type = _device_type(device_arn)
+        cost_info = pricer.calculate_cost(n_circuits, device_type, shots_per_circuit=1)
         
-        click.echo(f"\n   Task costs: ${cost_info['unit_task_cost']} × {bits} = ${cost_info['task_cost']:.2f}")
-        click.echo(f"   Shot costs: ${cost_info['unit_shot_cost']} × {bits} = ${cost_info['shot_cost']:.2f}")
-        click.echo(f"   {'─' * 50}")
-        click.echo(f"   TOTAL COST: ${cost_info['total_cost']:.2f}")
+        out.echo(PLAN_COST_TEMPLATE % (
+            cost_info['unit_task_cost'], n_circuits, cost_info['task_cost'],
+            cost_info['unit_shot_cost'], n_circuits, cost_info['shot_cost'],
+            cost_info['total_cost']
+        ))
         
         if cost_info['pricing_source'] == 'AWS Pricing API':
-            click.echo(f"   📡 Real-time pricing from AWS")
+            out.echo(f"   📡 Real-time pricing from AWS")
         else:
-            click.echo(f"   ℹ️  Using fallback pricing (AWS API unavailable)")
+            out.echo(f"   ℹ️  Using fallback pricing (AWS API unavailable)")
         
         if cost_info['total_cost'] > 50:
-            click.echo(f"\n   ⚠️  Cost is ${cost_info['total_cost']:.2f}")
+            out.echo(f"\n   ⚠️  Cost is ${cost_info['total_cost']:.2f}")
     else:
-        click.echo(f"\n✅ Using Simulator: FREE (no AWS charges)")
+        out.echo(f"\n✅ Using Simulator: FREE (no AWS charges)")
     
-    click.echo(f"\n{'=' * 60}")
-    click.echo(f"📋 Execution Command:")
+    out.echo(f"\n{'=' * 60}")
+    out.echo(f"📋 Execution Command:")
     
     if device_arn:
-        click.echo(f"\nncrypt generate-key \\")
-        click.echo(f"  --bits {bits} \\")
-        click.echo(f"  --key-id YOUR_KEY_ID \\")
-        click.echo(f"  --backend braket \\")
-        click.echo(f"  --device-arn {device_arn}")
+        out.echo(f"\nncrypt generate-key \\")
+        out.echo(f"  --bits {bits} \\")
+        out.echo(f"  --key-id YOUR_KEY_ID \\")
+        out.echo(f"  --backend braket \\")
+        out.echo(f"  --device-arn {device_arn}")
     else:
-        click.echo(f"\nncrypt generate-key \\")
-        click.echo(f"  --bits {bits} \\")
-        click.echo(f"  --key-id YOUR_KEY_ID")
+        out.echo(f"\nncrypt generate-key \\")
+        out.echo(f"  --bits {bits} \\")
+        out.echo(f"  --key-id YOUR_KEY_ID")
     
-    click.echo(f"\n{'=' * 60}")
+    out.echo(f"\n{'=' * 60}")
+    out.flush()
 
 
 @cli.command()
@@ -653,7 +968,8 @@ def plan_execution(bits, device_arn, runs):
               default='ionq',
               help='Device type (ionq=Forte 36q, rigetti=Ankaa-3 82q)')
 @click.option('--profile', '-p', default='default', help='AWS profile for pricing API')
-def estimate_cost(bits, device, profile):
+@click.option('--refresh-pricing', is_flag=True, help='Ignore cached AWS pricing and query the Pricing API again')
+def estimate_cost(bits, device, profile, refresh_pricing):
     """
     Estimate cost for quantum device usage using real-time AWS pricing.
     
@@ -673,14 +989,16 @@ def estimate_cost(bits, device, profile):
         return
     
     # Get real-time pricing from AWS
-    pricer = BraketPricing(aws_profile=profile)
+    from ncrypt.utils.aws_pricing import BraketPricing
+    pricer = BraketPricing(aws_profile=profile, refresh=refresh_pricing)
     cost_info = pricer.calculate_cost(bits, device, shots_per_circuit=1)
     
-    click.echo(f"\n📊 {cost_info['device']}")
-    click.echo(f"   Task cost: ${cost_info['unit_task_cost']} × {bits} = ${cost_info['task_cost']:.2f}")
-    click.echo(f"   Shot cost: ${cost_info['unit_shot_cost']} × {bits} = ${cost_info['shot_cost']:.2f}")
-    click.echo(f"   {'─' * 40}")
-    click.echo(f"   Total: ${cost_info['total_cost']:.2f}")
+    click.echo(ESTIMATE_COST_TEMPLATE % (
+        cost_info['device'],
+        cost_info['unit_task_cost'], bits, cost_info['task_cost'],
+        cost_info['unit_shot_cost'], bits, cost_info['shot_cost'],
+        cost_info['total_cost']
+    ))
     
     if cost_info['pricing_source'] == 'AWS Pricing API':
         click.echo(f"\n   📡 Real-time pricing from AWS Pricing API")
@@ -691,7 +1009,7 @@ def estimate_cost(bits, device, profile):
     total = cost_info['total_cost']
     
     # Warnings
-    if total > 100:
+    if total > HIGH_COST_THRESHOLD_USD:
         click.echo(f"\n⚠️  HIGH COST: ${total:.2f}")
         click.echo("   Consider reducing circuits or using Rigetti")
     elif total > 50:
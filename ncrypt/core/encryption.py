@@ -5,27 +5,337 @@ Uses quantum-generated keys for classical encryption operations.
 
 import hashlib
 import hmac
-from typing import List, Optional, Tuple
+from collections import OrderedDict
+from typing import BinaryIO, Dict, List, Optional, Tuple
+import numpy as np
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import padding
 import logging
+import mmap
 import os
+import struct
+import tempfile
 
 logger = logging.getLogger(__name__)
 
+# Number of per-key handles (and derived keys) kept by QuantumEncryption
+HANDLE_CACHE_SIZE = 32
+
+# Fixed AES-256-GCM parameters used by the encrypt_fixed256 fast path
+GCM_KEY_SIZE = 32
+GCM_IV_SIZE = 12
+GCM_TAG_SIZE = 16
+
+# Read size for streaming file encryption; a multiple of the AES block size
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Length of the HMAC-SHA256 tag written by QuantumKeyHandle.encrypt()
+HMAC_TAG_SIZE = hashlib.sha256().digest_size
+
+# Encrypted file header: magic, iv length, tag length, key id length,
+# followed by iv, tag and the UTF-8 key id
+FILE_MAGIC = b"NCRY"
+FILE_HEADER = struct.Struct("<4sBBH")
+
+
+class QuantumKeyHandle:
+    """
+    Encryption handle bound to a single derived AES-256 key.
+    
+    Key derivation and AES key setup happen once when the handle is created,
+    so encrypting many messages or files with the same quantum key only pays
+    for the cipher itself. Obtain handles via QuantumEncryption.handle().
+    """
+    
+    def __init__(self, key: bytes, backend):
+        """
+        Initialize handle.
+        
+        Args:
+            key: Derived 32-byte AES key
+            backend: cryptography backend
+        """
+        self.key = key
+        self.backend = backend
+        self._algorithm = algorithms.AES(key)
+        self._aead: Optional[AESGCM] = None
+        self._mac_template: Optional[hmac.HMAC] = None
+    
+    def encrypt(
+        self,
+        plaintext: bytes,
+        associated_data: Optional[bytes] = None
+    ) -> Tuple[bytes, bytes, bytes]:
+        """
+        Encrypt data with the bound key.
+        
+        Args:
+            plaintext: Data to encrypt
+            associated_data: Optional authenticated but unencrypted data
+        
+        Returns:
+            Tuple of (ciphertext, iv, tag) with a 12-byte IV and 16-byte tag
+        """
+        # AES-256-GCM encrypts and authenticates in a single pass
+        iv = os.urandom(GCM_IV_SIZE)
+        sealed = self._gcm().encrypt(iv, plaintext, associated_data)
+        ciphertext, tag = sealed[:-GCM_TAG_SIZE], sealed[-GCM_TAG_SIZE:]
+        
+        logger.info(f"Encrypted {len(plaintext)} bytes -> {len(ciphertext)} bytes")
+        return ciphertext, iv, tag
+    
+    def decrypt(
+        self,
+        ciphertext: bytes,
+        iv: bytes,
+        tag: bytes,
+        associated_data: Optional[bytes] = None
+    ) -> bytes:
+        """
+        Decrypt data with the bound key.
+        
+        The cipher follows the IV length: 12-byte IVs are AES-256-GCM,
+        16-byte IVs AES-256-CBC with HMAC-SHA256 (messages encrypted by
+        earlier versions, which did not authenticate associated_data).
+        
+        Args:
+            ciphertext: Encrypted data
+            iv: Initialization vector
+            tag: Authentication tag
+            associated_data: Optional authenticated but unencrypted data
+        
+        Returns:
+            Decrypted plaintext
+        
+        Raises:
+            ValueError: If authentication fails
+        """
+        if len(iv) == GCM_IV_SIZE:
+            try:
+                plaintext = self._gcm().decrypt(iv, ciphertext + tag, associated_data)
+            except InvalidTag:
+                raise ValueError("Authentication failed: message may have been tampered with")
+        else:
+            plaintext = self._decrypt_cbc(ciphertext, iv, tag)
+        
+        logger.info(f"Decrypted {len(ciphertext)} bytes -> {len(plaintext)} bytes")
+        return plaintext
+    
+    def _decrypt_cbc(self, ciphertext: bytes, iv: bytes, tag: bytes) -> bytes:
+        """Decrypt legacy AES-256-CBC data authenticated with HMAC-SHA256."""
+        # Verify authentication tag
+        expected_tag = self._mac(iv + ciphertext).digest()
+        if not hmac.compare_digest(tag, expected_tag):
+            raise ValueError("Authentication failed: message may have been tampered with")
+        
+        # Decrypt using AES-256-CBC
+        cipher = Cipher(self._algorithm, modes.CBC(iv), backend=self.backend)
+        decryptor = cipher.decryptor()
+        padded_plaintext = decryptor.update(ciphertext) + decryptor.finalize()
+        
+        # Remove padding
+        unpadder = padding.PKCS7(128).unpadder()
+        return unpadder.update(padded_plaintext) + unpadder.finalize()
+    
+    def verify_stream(
+        self,
+        src: BinaryIO,
+        iv: bytes,
+        tag: bytes,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> None:
+        """
+        Check the tag of the ciphertext in src without decrypting it.
+        
+        Reads from the current position to EOF and seeks back afterwards.
+        
+        Args:
+            src: Readable, seekable binary file object with the ciphertext
+            iv: Initialization vector
+            tag: Authentication tag
+            chunk_size: Number of ciphertext bytes read per step
+        
+        Raises:
+            ValueError: If authentication fails
+        """
+        start = src.tell()
+        mac = self._mac(iv)
+        for chunk in iter(lambda: src.read(chunk_size), b""):
+            mac.update(chunk)
+        src.seek(start)
+        
+        if not hmac.compare_digest(tag, mac.digest()):
+            raise ValueError("Authentication failed: message may have been tampered with")
+    
+    def _mac(self, data: bytes) -> hmac.HMAC:
+        """Start an HMAC-SHA256 over data from a copy of the keyed template."""
+        if self._mac_template is None:
+            self._mac_template = hmac.new(self.key, digestmod=hashlib.sha256)
+        mac = self._mac_template.copy()
+        mac.update(data)
+        return mac
+    
+    def decrypt_legacy_stream(
+        self,
+        src: BinaryIO,
+        output_path: str,
+        iv: bytes,
+        tag: bytes,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> None:
+        """
+        Decrypt AES-256-CBC + HMAC-SHA256 data written by earlier versions.
+        
+        The tag is checked with verify_stream() before output_path is
+        created, so a tampered input or wrong key leaves nothing behind.
+        
+        Args:
+            src: Readable, seekable binary file object positioned at the ciphertext
+            output_path: Path of the plaintext file to write
+            iv: 16-byte initialization vector
+            tag: 32-byte HMAC-SHA256 tag
+            chunk_size: Number of ciphertext bytes read per step
+        
+        Raises:
+            ValueError: If authentication fails
+        """
+        self.verify_stream(src, iv, tag, chunk_size)
+        with open(output_path, 'wb') as dst:
+            self._decrypt_chunks(src, dst, iv, chunk_size)
+    
+    def _decrypt_chunks(self, src: BinaryIO, dst: BinaryIO, iv: bytes, chunk_size: int) -> None:
+        """Decrypt src into dst without checking the tag."""
+        decryptor = Cipher(self._algorithm, modes.CBC(iv), backend=self.backend).decryptor()
+        unpadder = padding.PKCS7(128).unpadder()
+        for chunk in iter(lambda: src.read(chunk_size), b""):
+            dst.write(unpadder.update(decryptor.update(chunk)))
+        dst.write(unpadder.update(decryptor.finalize()) + unpadder.finalize())
+    
+    def encrypt_stream_gcm(
+        self,
+        src: BinaryIO,
+        dst: BinaryIO,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Tuple[bytes, bytes]:
+        """
+        Encrypt src into dst chunk by chunk with AES-256-GCM.
+        
+        GCM needs no padding and authenticates in the same pass (OpenSSL
+        uses AES-NI and carry-less multiply where available). Each chunk is
+        encrypted into one reused output buffer via update_into().
+        
+        Args:
+            src: Readable binary file object with the plaintext
+            dst: Writable binary file object for the ciphertext
+            chunk_size: Number of plaintext bytes read per step
+        
+        Returns:
+            Tuple of (iv, tag) with a 12-byte IV and 16-byte tag
+        """
+        iv = os.urandom(GCM_IV_SIZE)
+        encryptor = Cipher(self._algorithm, modes.GCM(iv), backend=self.backend).encryptor()
+        self._stream_into(encryptor, src, dst, chunk_size)
+        encryptor.finalize()
+        return iv, encryptor.tag
+    
+    def decrypt_stream_gcm(
+        self,
+        src: BinaryIO,
+        dst: BinaryIO,
+        iv: bytes,
+        tag: bytes,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> None:
+        """
+        Decrypt AES-256-GCM data from src (current position to EOF) into dst.
+        
+        The tag is only checked at the end, after all plaintext has been
+        written to dst; callers must discard dst if this raises.
+        
+        Args:
+            src: Readable binary file object with the ciphertext
+            dst: Writable binary file object for the plaintext
+            iv: 12-byte initialization vector
+            tag: 16-byte GCM tag
+            chunk_size: Number of ciphertext bytes read per step
+        
+        Raises:
+            ValueError: If authentication fails
+        """
+        decryptor = Cipher(self._algorithm, modes.GCM(iv, tag), backend=self.backend).decryptor()
+        self._stream_into(decryptor, src, dst, chunk_size)
+        try:
+            decryptor.finalize()
+        except InvalidTag:
+            raise ValueError("Authentication failed: message may have been tampered with")
+    
+    @staticmethod
+    def _stream_into(context, src: BinaryIO, dst: BinaryIO, chunk_size: int) -> None:
+        """
+        Feed src through a cipher context into dst using one reused buffer.
+        
+        Regular files are memory-mapped and sliced straight into the cipher,
+        so chunks are paged in by the kernel instead of copied by read();
+        other streams (and empty files, which cannot be mapped) are read.
+        Either way the kernel is told the input is read sequentially, so it
+        can read ahead while the previous chunk is being encrypted.
+        """
+        buf = bytearray(chunk_size + 15)
+        view = memoryview(buf)
+        
+        try:
+            mapped = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            mapped = None
+        
+        if mapped is None:
+            if hasattr(os, 'posix_fadvise'):
+                try:
+                    os.posix_fadvise(src.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                except (AttributeError, OSError, ValueError):
+                    pass
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                n = context.update_into(chunk, buf)
+                dst.write(view[:n])
+            return
+        
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        
+        with mapped, memoryview(mapped) as data:
+            start, end = src.tell(), len(data)
+            for offset in range(start, end, chunk_size):
+                n = context.update_into(data[offset:offset + chunk_size], buf)
+                dst.write(view[:n])
+        src.seek(end)
+    
+    def _gcm(self) -> AESGCM:
+        """Return the AESGCM context for the bound key, creating it on first use."""
+        if self._aead is None:
+            self._aead = AESGCM(self.key)
+        return self._aead
+
 
 class QuantumEncryption:
     """
     Encryption system using quantum-generated keys.
     
-    Uses AES-256 for symmetric encryption with keys derived from
+    Uses AES-256-GCM for symmetric encryption with keys derived from
     quantum key distribution (QKD).
     """
     
     def __init__(self):
         """Initialize quantum encryption system."""
         self.backend = default_backend()
+        self._handles: "OrderedDict[bytes, QuantumKeyHandle]" = OrderedDict()
+        self._derived_keys: "OrderedDict[Tuple[bytes, bytes], bytes]" = OrderedDict()
+        self._prf_templates: Dict[bytes, hmac.HMAC] = {}
         logger.info("QuantumEncryption initialized")
     
     def key_to_bytes(self, key_bits: List[int], target_length: int = 32) -> bytes:
@@ -45,24 +355,17 @@ class QuantumEncryption:
                 f"Generate a longer key with more qubits (try: ncrypt generate-key --bits 2000 --key-id new_key)"
             )
         
-        # Take only what we need
-        key_bits = key_bits[: target_length * 8]
-        
-        # Convert bits to bytes
-        key_bytes = bytearray()
-        for i in range(0, len(key_bits), 8):
-            byte = 0
-            for j in range(8):
-                if i + j < len(key_bits):
-                    byte = (byte << 1) | key_bits[i + j]
-            key_bytes.append(byte)
-        
-        return bytes(key_bytes)
+        # Take only what we need and pack it most significant bit first
+        bits = np.asarray(key_bits[: target_length * 8], dtype=np.uint8)
+        return np.packbits(bits).tobytes()
     
     def derive_key(self, quantum_key: List[int], salt: bytes = b"") -> bytes:
         """
         Derive encryption key from quantum key using HKDF.
         
+        Derived keys are cached per (key material, salt), so repeated
+        encrypt/decrypt calls with the same quantum key skip the HMAC.
+        
         Args:
             quantum_key: Quantum-generated key bits
             salt: Optional salt for key derivation
@@ -76,10 +379,57 @@ class QuantumEncryption:
         if not salt:
             salt = b"ncrypt-qkd-v1"
         
-        derived = hmac.new(salt, quantum_bytes, hashlib.sha256).digest()
+        # Keyed by the packed key bytes rather than id(quantum_key): lists
+        # are mutable and ids are reused once a key list is freed
+        cache_key = (quantum_bytes, salt)
+        derived = self._derived_keys.get(cache_key)
+        if derived is not None:
+            self._derived_keys.move_to_end(cache_key)
+            return derived
+        
+        # Copy a per-salt keyed HMAC instead of re-keying it on every call
+        prf = self._prf_templates.get(salt)
+        if prf is None:
+            prf = self._prf_templates[salt] = hmac.new(salt, digestmod=hashlib.sha256)
+        prf = prf.copy()
+        prf.update(quantum_bytes)
+        derived = prf.digest()
+        self._derived_keys[cache_key] = derived
+        if len(self._derived_keys) > HANDLE_CACHE_SIZE:
+            self._derived_keys.popitem(last=False)
+        
         logger.debug("Derived encryption key from quantum key")
         return derived
     
+    def handle(self, quantum_key: List[int]) -> QuantumKeyHandle:
+        """
+        Get a reusable encryption handle for a quantum key.
+        
+        Handles are cached per derived key, so callers encrypting many
+        messages or files with one key should fetch the handle once and
+        reuse it inside their loop.
+        
+        Args:
+            quantum_key: Quantum-generated key bits
+        
+        Returns:
+            QuantumKeyHandle bound to the derived AES key
+        """
+        return self._handle_for_key(self.derive_key(quantum_key))
+    
+    def _handle_for_key(self, key: bytes) -> QuantumKeyHandle:
+        """Return the cached handle for a derived AES key, creating it if needed."""
+        handle = self._handles.get(key)
+        if handle is None:
+            handle = QuantumKeyHandle(key, self.backend)
+            self._handles[key] = handle
+            if len(self._handles) > HANDLE_CACHE_SIZE:
+                self._handles.popitem(last=False)
+        else:
+            self._handles.move_to_end(key)
+        
+        return handle
+    
     def encrypt(
         self, 
         plaintext: bytes, 
@@ -97,30 +447,7 @@ class QuantumEncryption:
         Returns:
             Tuple of (ciphertext, iv, tag)
         """
-        # Derive AES key from quantum key
-        key = self.derive_key(quantum_key)
-        
-        # Generate random IV
-        iv = os.urandom(16)
-        
-        # Pad plaintext to block size
-        padder = padding.PKCS7(128).padder()
-        padded_data = padder.update(plaintext) + padder.finalize()
-        
-        # Encrypt using AES-256-CBC
-        cipher = Cipher(
-            algorithms.AES(key),
-            modes.CBC(iv),
-            backend=self.backend
-        )
-        encryptor = cipher.encryptor()
-        ciphertext = encryptor.update(padded_data) + encryptor.finalize()
-        
-        # Generate authentication tag
-        tag = hmac.new(key, iv + ciphertext, hashlib.sha256).digest()
-        
-        logger.info(f"Encrypted {len(plaintext)} bytes -> {len(ciphertext)} bytes")
-        return ciphertext, iv, tag
+        return self.handle(quantum_key).encrypt(plaintext, associated_data)
     
     def decrypt(
         self,
@@ -146,54 +473,126 @@ class QuantumEncryption:
         Raises:
             ValueError: If authentication fails
         """
-        # Derive AES key from quantum key
-        key = self.derive_key(quantum_key)
+        return self.handle(quantum_key).decrypt(ciphertext, iv, tag, associated_data)
+    
+    def encrypt_fixed256(self, plaintext: bytes, key: bytes) -> Tuple[bytes, bytes, bytes]:
+        """
+        Fast path: AES-256-GCM with an already derived 32-byte key.
         
-        # Verify authentication tag
-        expected_tag = hmac.new(key, iv + ciphertext, hashlib.sha256).digest()
-        if not hmac.compare_digest(tag, expected_tag):
-            raise ValueError("Authentication failed: message may have been tampered with")
+        Skips quantum key conversion and derivation and reuses a cached
+        AESGCM context per key, so short messages are dominated by the
+        cipher call rather than Python setup. Output uses a 12-byte IV and
+        16-byte tag and must be decrypted with decrypt_fixed256().
         
-        # Decrypt using AES-256-CBC
-        cipher = Cipher(
-            algorithms.AES(key),
-            modes.CBC(iv),
-            backend=self.backend
-        )
-        decryptor = cipher.decryptor()
-        padded_plaintext = decryptor.update(ciphertext) + decryptor.finalize()
+        Args:
+            plaintext: Data to encrypt
+            key: 32-byte AES key (e.g. from derive_key())
         
-        # Remove padding
-        unpadder = padding.PKCS7(128).unpadder()
-        plaintext = unpadder.update(padded_plaintext) + unpadder.finalize()
+        Returns:
+            Tuple of (ciphertext, iv, tag)
+        """
+        if len(key) != GCM_KEY_SIZE:
+            raise ValueError(f"Key must be {GCM_KEY_SIZE} bytes, got {len(key)}")
         
-        logger.info(f"Decrypted {len(ciphertext)} bytes -> {len(plaintext)} bytes")
-        return plaintext
+        return self._handle_for_key(key).encrypt(plaintext)
+    
+    def decrypt_fixed256(
+        self,
+        ciphertext: bytes,
+        iv: bytes,
+        tag: bytes,
+        key: bytes
+    ) -> bytes:
+        """
+        Decrypt data produced by encrypt_fixed256().
+        
+        Args:
+            ciphertext: Encrypted data
+            iv: 12-byte initialization vector
+            tag: 16-byte GCM tag
+            key: 32-byte AES key used for encryption
+        
+        Returns:
+            Decrypted plaintext
+        
+        Raises:
+            ValueError: If the key size is wrong or authentication fails
+        """
+        if len(key) != GCM_KEY_SIZE:
+            raise ValueError(f"Key must be {GCM_KEY_SIZE} bytes, got {len(key)}")
+        
+        return self._handle_for_key(key).decrypt(ciphertext, iv, tag)
+    
+    def read_header(self, path: str) -> Optional[Dict]:
+        """
+        Read the binary header of a file written by encrypt_file().
+        
+        Args:
+            path: Path to encrypted file
+        
+        Returns:
+            Dictionary with iv, tag, key_id (None if not recorded) and
+            header_length, or None if the file has no nCrypt header
+        """
+        with open(path, 'rb') as f:
+            prefix = f.read(FILE_HEADER.size)
+            if len(prefix) < FILE_HEADER.size:
+                return None
+            
+            magic, iv_len, tag_len, key_id_len = FILE_HEADER.unpack(prefix)
+            if magic != FILE_MAGIC:
+                return None
+            
+            body = f.read(iv_len + tag_len + key_id_len)
+        
+        if len(body) < iv_len + tag_len + key_id_len:
+            raise ValueError(f"Truncated header in {path}")
+        
+        key_id = body[iv_len + tag_len:].decode('utf-8') if key_id_len else None
+        return {
+            "iv": body[:iv_len],
+            "tag": body[iv_len:iv_len + tag_len],
+            "key_id": key_id,
+            "header_length": FILE_HEADER.size + len(body)
+        }
     
     def encrypt_file(
         self,
         input_path: str,
         output_path: str,
-        quantum_key: List[int]
+        quantum_key: List[int],
+        key_id: Optional[str] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
     ) -> Tuple[bytes, bytes]:
         """
         Encrypt a file using quantum-generated key.
         
+        The output starts with a binary header holding the IV, tag and
+        optional key ID, so no separate metadata file is needed. The file
+        is streamed through AES-256-GCM in chunk_size pieces, so memory use
+        does not grow with the file size.
+        
         Args:
             input_path: Path to input file
             output_path: Path to output encrypted file
             quantum_key: Quantum-generated key bits
+            key_id: Optional key identifier recorded in the header
+            chunk_size: Number of bytes read per step
         
         Returns:
             Tuple of (iv, tag) needed for decryption
         """
-        with open(input_path, 'rb') as f:
-            plaintext = f.read()
-        
-        ciphertext, iv, tag = self.encrypt(plaintext, quantum_key)
-        
-        with open(output_path, 'wb') as f:
-            f.write(ciphertext)
+        handle = self.handle(quantum_key)
+        key_id_bytes = key_id.encode('utf-8') if key_id else b""
+        header = FILE_HEADER.pack(FILE_MAGIC, GCM_IV_SIZE, GCM_TAG_SIZE, len(key_id_bytes))
+        
+        with open(input_path, 'rb') as fin, open(output_path, 'wb') as fout:
+            # The tag is only known after the last chunk: reserve its slot
+            # in the header and fill it in afterwards
+            fout.write(header + bytes(GCM_IV_SIZE + GCM_TAG_SIZE) + key_id_bytes)
+            iv, tag = handle.encrypt_stream_gcm(fin, fout, chunk_size)
+            fout.seek(FILE_HEADER.size)
+            fout.write(iv + tag)
         
         logger.info(f"File encrypted: {input_path} -> {output_path}")
         return iv, tag
@@ -202,27 +601,63 @@ class QuantumEncryption:
         self,
         input_path: str,
         output_path: str,
-        iv: bytes,
-        tag: bytes,
-        quantum_key: List[int]
+        iv: Optional[bytes],
+        tag: Optional[bytes],
+        quantum_key: List[int],
+        offset: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
     ) -> None:
         """
         Decrypt a file using quantum-generated key.
         
+        The cipher follows the IV length: 12-byte IVs are AES-256-GCM
+        (current files), 16-byte IVs AES-256-CBC with HMAC-SHA256 (files
+        written by earlier versions).
+        
         Args:
             input_path: Path to encrypted file
             output_path: Path to output decrypted file
-            iv: Initialization vector from encryption
-            tag: Authentication tag from encryption
+            iv: Initialization vector from encryption (None: read from header)
+            tag: Authentication tag from encryption (None: read from header)
             quantum_key: Quantum-generated key bits
-        """
-        with open(input_path, 'rb') as f:
-            ciphertext = f.read()
-        
-        plaintext = self.decrypt(ciphertext, iv, tag, quantum_key)
+            offset: Start of the ciphertext in the file. None detects the
+                binary header; 0 treats the whole file as ciphertext
+                (legacy files with a .meta sidecar)
+            chunk_size: Number of bytes read per step
         
-        with open(output_path, 'wb') as f:
-            f.write(plaintext)
+        Raises:
+            ValueError: If authentication fails; no output file is written
+        """
+        if offset is None:
+            header = self.read_header(input_path)
+            if header is not None:
+                offset = header["header_length"]
+                iv = iv if iv is not None else header["iv"]
+                tag = tag if tag is not None else header["tag"]
+            else:
+                offset = 0
+        
+        if iv is None or tag is None:
+            raise ValueError(f"No IV/tag given and no header found in {input_path}")
+        
+        handle = self.handle(quantum_key)
+        
+        with open(input_path, 'rb') as fin:
+            fin.seek(offset)
+            
+            if len(iv) != GCM_IV_SIZE:
+                handle.decrypt_legacy_stream(fin, output_path, iv, tag, chunk_size)
+            else:
+                # GCM only authenticates at the end: decrypt into a temporary
+                # file and move it into place once the tag has been checked
+                out_dir = os.path.dirname(os.path.abspath(output_path))
+                fd, tmp_path = tempfile.mkstemp(dir=out_dir, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as fout:
+                        handle.decrypt_stream_gcm(fin, fout, iv, tag, chunk_size)
+                    os.replace(tmp_path, output_path)
+                except BaseException:
+                    os.remove(tmp_path)
+                    raise
         
         logger.info(f"File decrypted: {input_path} -> {output_path}")
-
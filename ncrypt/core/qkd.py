@@ -4,6 +4,7 @@ Implements the BB84 protocol for secure key exchange using quantum mechanics.
 """
 
 import numpy as np
+import secrets
 from typing import List, Tuple, Dict, Optional
 from dataclasses import dataclass
 import logging
@@ -11,6 +12,20 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def _popcount(data: bytes) -> int:
+    """Count set bits in a byte string (int.bit_count on Python 3.10+)."""
+    value = int.from_bytes(data, 'little')
+    if hasattr(value, 'bit_count'):
+        return value.bit_count()
+    return bin(value).count('1')
+
+
+def _random_bits(n: int) -> np.ndarray:
+    """Draw n cryptographically secure random bits as a uint8 array."""
+    buf = np.frombuffer(secrets.token_bytes((n + 7) // 8), dtype=np.uint8)
+    return np.unpackbits(buf)[:n]
+
+
 @dataclass
 class QKDResult:
     """Result of a QKD session."""
@@ -61,17 +76,20 @@ class BB84Protocol:
                            Default 0.11 (11%) is typical for secure communication
         """
         self.error_threshold = error_threshold
+        # Channel noise and measurement outcomes are simulation randomness;
+        # Alice's bits and bases still come from the secrets module
+        self._rng = np.random.default_rng()
         logger.info(f"BB84Protocol initialized with error threshold: {error_threshold}")
     
     def generate_random_bits(self, n: int) -> np.ndarray:
         """Generate n random bits."""
-        return np.random.randint(0, 2, n)
+        return _random_bits(n)
     
     def generate_random_bases(self, n: int) -> np.ndarray:
         """Generate n random measurement bases."""
-        return np.random.randint(0, 2, n)
+        return _random_bits(n)
     
-    def prepare_qubits(self, bits: np.ndarray, bases: np.ndarray) -> List[Tuple[int, int]]:
+    def prepare_qubits(self, bits: np.ndarray, bases: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
         Prepare qubits based on bits and bases.
         
@@ -80,15 +98,19 @@ class BB84Protocol:
         - Diagonal basis (1):   0 -> |+⟩, 1 -> |-⟩
         
         Returns:
-            List of (bit, basis) tuples representing prepared qubits
+            Tuple of (bits, bases) uint8 arrays describing the prepared qubits
         """
-        qubits = [(int(bit), int(basis)) for bit, basis in zip(bits, bases)]
-        logger.debug(f"Prepared {len(qubits)} qubits")
-        return qubits
+        bits = np.asarray(bits, dtype=np.uint8)
+        bases = np.asarray(bases, dtype=np.uint8)
+        if bits.shape != bases.shape:
+            raise ValueError(f"Got {bits.size} bits but {bases.size} bases")
+        
+        logger.debug(f"Prepared {len(bits)} qubits")
+        return bits, bases
     
     def measure_qubits(
         self, 
-        qubits: List[Tuple[int, int]], 
+        qubits: Tuple[np.ndarray, np.ndarray],
         bases: np.ndarray,
         noise_level: float = 0.0
     ) -> np.ndarray:
@@ -96,29 +118,27 @@ class BB84Protocol:
         Measure qubits in given bases.
         
         Args:
-            qubits: List of (bit, basis) tuples from Alice
+            qubits: (bits, bases) arrays from prepare_qubits()
             bases: Measurement bases chosen by Bob
             noise_level: Simulated quantum channel noise (0.0 to 0.5)
         
         Returns:
             Measured bits
         """
-        measured_bits = []
-        
-        for (alice_bit, alice_basis), bob_basis in zip(qubits, bases):
-            if alice_basis == bob_basis:
-                # Same basis: measurement is deterministic (plus noise)
-                if np.random.random() < noise_level:
-                    # Bit flip due to noise
-                    measured_bits.append(1 - alice_bit)
-                else:
-                    measured_bits.append(alice_bit)
-            else:
-                # Different basis: measurement is random (50/50)
-                measured_bits.append(np.random.randint(0, 2))
-        
-        logger.debug(f"Measured {len(measured_bits)} qubits with noise level {noise_level}")
-        return np.array(measured_bits)
+        alice_bits, alice_bases = qubits
+        n = len(alice_bits)
+        
+        # Same basis: measurement is deterministic, flipped by channel noise
+        same_basis = alice_bases == np.asarray(bases)
+        noise_flips = (self._rng.random(n) < noise_level).astype(np.uint8)
+        
+        # Different basis: measurement is random (50/50)
+        random_bits = self._rng.integers(0, 2, n, dtype=np.uint8)
+        
+        measured_bits = np.where(same_basis, alice_bits ^ noise_flips, random_bits)
+        
+        logger.debug(f"Measured {n} qubits with noise level {noise_level}")
+        return measured_bits
     
     def sift_keys(
         self,
@@ -167,17 +187,25 @@ class BB84Protocol:
         if sample_size >= key_length:
             raise ValueError("Sample size must be smaller than key length")
         
-        # Randomly select indices to check
-        check_indices = np.random.choice(key_length, sample_size, replace=False)
-        keep_indices = np.array([i for i in range(key_length) if i not in check_indices])
+        # Random check positions; a boolean mask keeps the rest in order
+        # without sorting the leftover indices
+        check_indices = self._rng.permutation(key_length)[:sample_size]
+        keep_mask = np.ones(key_length, dtype=bool)
+        keep_mask[check_indices] = False
+        
+        alice_arr = np.asarray(alice_key)
+        bob_arr = np.asarray(bob_key)
         
-        # Calculate error rate
-        errors = sum(1 for i in check_indices if alice_key[i] != bob_key[i])
+        # Calculate error rate: XOR the bit-packed samples and popcount the result
+        alice_packed = np.packbits(alice_arr[check_indices].astype(np.uint8))
+        bob_packed = np.packbits(bob_arr[check_indices].astype(np.uint8))
+        mismatches = np.bitwise_xor(alice_packed, bob_packed).tobytes()
+        errors = _popcount(mismatches)
         error_rate = errors / sample_size
         
         # Keep remaining bits
-        remaining_alice = [alice_key[i] for i in keep_indices]
-        remaining_bob = [bob_key[i] for i in keep_indices]
+        remaining_alice = alice_arr[keep_mask].tolist()
+        remaining_bob = bob_arr[keep_mask].tolist()
         
         logger.info(f"QBER: {error_rate:.4f} ({errors}/{sample_size} errors)")
         return error_rate, remaining_alice, remaining_bob
@@ -195,23 +223,24 @@ class BB84Protocol:
         
         Returns:
             Compressed key
+        
+        Raises:
+            ValueError: If compression_factor is outside 0.0 to 1.0
         """
+        if not 0.0 <= compression_factor <= 1.0:
+            raise ValueError(f"compression_factor must be between 0.0 and 1.0, got {compression_factor}")
+        
         new_length = int(len(key) * compression_factor)
         if new_length == 0:
             return []
         
-        # Simplified privacy amplification using XOR of adjacent bits
-        amplified = []
+        # Simplified privacy amplification using XOR of adjacent bits:
+        # output bit i is the XOR of key[i*step:(i+1)*step]; trailing bits
+        # past the last full segment are dropped
         step = len(key) // new_length
-        
-        for i in range(new_length):
-            start_idx = i * step
-            end_idx = min(start_idx + step, len(key))
-            # XOR all bits in this segment
-            segment_bit = 0
-            for j in range(start_idx, end_idx):
-                segment_bit ^= key[j]
-            amplified.append(segment_bit)
+        bits = np.asarray(key, dtype=np.uint8)[: new_length * step]
+        starts = np.arange(0, new_length * step, step)
+        amplified = np.bitwise_xor.reduceat(bits, starts).tolist()
         
         logger.info(f"Privacy amplification: {len(key)} -> {len(amplified)} bits")
         return amplified
@@ -0,0 +1,241 @@
+"""
+nCrypt Key Daemon
+Long-running process that keeps a warmed-up BB84Protocol alive and serves
+key generation requests over a Unix socket.
+
+Running ``ncrypt generate-key`` repeatedly from a shell pays interpreter
+start-up, imports and first-call initialization on every invocation. The
+daemon pays them once; clients then only pay for a local socket round-trip.
+
+Wire format: one JSON object per line in each direction, e.g.
+``{"op": "generate", "n_bits": 2000, "noise_level": 0.01}``.
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import tempfile
+from typing import Dict, Optional
+
+import click
+
+import ncrypt
+from ncrypt.core.qkd import BB84Protocol
+
+logger = logging.getLogger(__name__)
+
+
+def _default_socket_path() -> str:
+    """Per-user socket path: $XDG_RUNTIME_DIR, else a private ncrypt-<uid> dir in the temp dir."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "ncrypt.sock")
+    return os.path.join(tempfile.gettempdir(), f"ncrypt-{os.getuid()}", "ncrypt.sock")
+
+
+DEFAULT_SOCKET_PATH = _default_socket_path()
+
+
+def _check_socket_dir(socket_path: str) -> None:
+    """
+    Refuse a socket whose directory another user could tamper with.
+    
+    Raises:
+        PermissionError: If the directory is not owned by the current user
+            or is group- or world-writable
+    """
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    st = os.stat(socket_dir)
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"Socket directory {socket_dir} is not owned by the current user")
+    if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(
+            f"Socket directory {socket_dir} is group- or world-writable; use a private (0700) directory"
+        )
+
+
+class KeyRequestHandler(socketserver.StreamRequestHandler):
+    """Handle newline-delimited JSON requests on one client connection."""
+    
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            
+            try:
+                request = json.loads(line)
+                response = self.server.dispatch(request)
+            except Exception as e:
+                logger.error(f"Request failed: {e}")
+                response = {"ok": False, "error": str(e)}
+            
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class KeyDaemon(socketserver.UnixStreamServer):
+    """
+    Unix-socket server holding a single warmed-up BB84Protocol.
+    
+    Supported operations:
+        - ping: liveness check
+        - generate: run BB84 and return the final key
+    """
+    
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, error_threshold: float = 0.11):
+        """
+        Initialize the daemon and bind its socket.
+        
+        Args:
+            socket_path: Filesystem path of the Unix socket
+            error_threshold: QBER threshold for the shared BB84Protocol
+        
+        Raises:
+            RuntimeError: If another daemon is already listening on socket_path
+            FileExistsError: If socket_path exists and is not a socket
+            PermissionError: If the socket directory is not private to the user
+        """
+        socket_dir = os.path.dirname(os.path.abspath(socket_path))
+        if not os.path.isdir(socket_dir):
+            os.mkdir(socket_dir, 0o700)
+        _check_socket_dir(socket_path)
+        self._remove_stale_socket(socket_path)
+        
+        ncrypt.warmup()
+        self.protocol = BB84Protocol(error_threshold=error_threshold)
+        self.socket_path = socket_path
+        
+        super().__init__(socket_path, KeyRequestHandler)
+        # The bind honoured the umask; only the owner may talk to the daemon
+        os.chmod(socket_path, 0o600)
+        logger.info(f"Key daemon listening on {socket_path}")
+    
+    @staticmethod
+    def _remove_stale_socket(socket_path: str) -> None:
+        """Remove a socket left behind by a daemon that is no longer running."""
+        try:
+            mode = os.stat(socket_path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(f"{socket_path} exists and is not a socket")
+        
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(socket_path)
+            except ConnectionRefusedError:
+                logger.info(f"Removing stale socket {socket_path}")
+                os.remove(socket_path)
+                return
+        raise RuntimeError(f"An ncrypt daemon is already listening on {socket_path}")
+    
+    def dispatch(self, request: Dict) -> Dict:
+        """
+        Execute a single request.
+        
+        Args:
+            request: Decoded request object
+        
+        Returns:
+            Response object
+        """
+        op = request.get("op")
+        
+        if op == "ping":
+            return {"ok": True}
+        
+        if op == "generate":
+            n_bits = int(request.get("n_bits", 2000))
+            noise_level = float(request.get("noise_level", 0.01))
+            if n_bits <= 0:
+                raise ValueError(f"n_bits must be positive, got {n_bits}")
+            result = self.protocol.run_protocol(n_bits=n_bits, noise_level=noise_level)
+            
+            if result is None:
+                return {"ok": False, "error": "error rate too high"}
+            
+            return {
+                "ok": True,
+                "key": [int(b) for b in result.final_key],
+                "error_rate": result.error_rate,
+                "key_length": result.key_length
+            }
+        
+        raise ValueError(f"Unknown operation: {op}")
+    
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def request_key(
+    n_bits: int = 2000,
+    noise_level: float = 0.01,
+    socket_path: str = DEFAULT_SOCKET_PATH
+) -> Optional[Dict]:
+    """
+    Ask a running key daemon to generate a key.
+    
+    Args:
+        n_bits: Number of qubits to exchange
+        noise_level: Channel noise level (0.0 to 0.5)
+        socket_path: Filesystem path of the daemon's Unix socket
+    
+    Returns:
+        Response dictionary with key, error_rate and key_length, or None
+        if the daemon rejected the request (invalid parameters) or the key
+        (error rate too high); the reason is logged
+    
+    Raises:
+        ConnectionError: If no daemon is listening on socket_path
+        PermissionError: If the socket is not owned by the current user or
+            its directory is not private to the user
+    """
+    request = {"op": "generate", "n_bits": n_bits, "noise_level": noise_level}
+    
+    try:
+        # Keys from a socket another user controls must never be accepted
+        if os.stat(socket_path).st_uid != os.getuid():
+            raise PermissionError(f"Socket {socket_path} is not owned by the current user; refusing its keys")
+        _check_socket_dir(socket_path)
+        
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile('rb') as f:
+                response = json.loads(f.readline())
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise ConnectionError(f"No ncrypt daemon at {socket_path}: {e}") from e
+    
+    if not response.get("ok"):
+        logger.warning(f"Daemon request failed: {response.get('error')}")
+        return None
+    
+    return response
+
+
+@click.command()
+@click.option('--socket', 'socket_path', default=DEFAULT_SOCKET_PATH, help='Unix socket path')
+@click.option('--error-threshold', default=0.11, help='Maximum acceptable QBER')
+def main(socket_path, error_threshold):
+    """Run the nCrypt key generation daemon."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    server = KeyDaemon(socket_path, error_threshold)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Key daemon shutting down")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
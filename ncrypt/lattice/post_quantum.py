@@ -6,12 +6,47 @@ as described in the NCRYPT whitepaper for quantum-resistant security.
 """
 
 import numpy as np
-from typing import Tuple, List
+from typing import Tuple, List, Optional, Union
+import base64
 import hashlib
 import logging
+import os
+import secrets
+
+try:
+    import oqs
+    OQS_AVAILABLE = True
+except ImportError:
+    OQS_AVAILABLE = False
+    oqs = None
 
 logger = logging.getLogger(__name__)
 
+# liboqs KEMs tried in order; newer liboqs releases only ship the
+# standardized ML-KEM name
+KEM_ALGORITHMS = ("ML-KEM-768", "Kyber768")
+
+# AES-256-GCM nonce size for messages sealed under a KEM shared secret
+KEM_NONCE_SIZE = 12
+
+
+def _encode_array(array: np.ndarray) -> dict:
+    """Serialize an integer array as base64 int16 bytes plus its shape."""
+    data = np.ascontiguousarray(array, dtype='<i2').tobytes()
+    return {
+        "data": base64.b64encode(data).decode('ascii'),
+        "shape": list(np.shape(array)),
+        "dtype": "int16"
+    }
+
+
+def _decode_array(value: Union[dict, list]) -> np.ndarray:
+    """Inverse of _encode_array(); nested lists from older versions also work."""
+    if isinstance(value, dict):
+        data = base64.b64decode(value["data"])
+        return np.frombuffer(data, dtype='<i2').reshape(value["shape"])
+    return np.array(value)
+
 
 class ModuleLWE:
     """
@@ -23,6 +58,12 @@ class ModuleLWE:
     
     This is a simplified educational implementation. Production systems
     should use NIST-standardized algorithms like Kyber or Dilithium.
+    
+    Unlike Kyber, the public matrix A is a full n x n matrix over Z_q rather
+    than a matrix of ring elements, so all products are plain matrix-vector
+    multiplications and there is no polynomial multiplication for an NTT to
+    accelerate. With q = 3329 there is also no primitive 2n-th root of unity
+    for n = 256, which a full negacyclic NTT would require.
     """
     
     def __init__(self, n: int = 256, q: int = 3329, sigma: float = 3.2):
@@ -37,6 +78,7 @@ class ModuleLWE:
         self.n = n
         self.q = q
         self.sigma = sigma
+        self._rng = np.random.default_rng()
         logger.info(f"Module-LWE initialized: n={n}, q={q}, sigma={sigma}")
     
     def generate_keypair(self) -> Tuple[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
@@ -48,17 +90,19 @@ class ModuleLWE:
             public_key: (A, b) where b = A*s + e (mod q)
             private_key: s (secret vector)
         """
-        # Generate random matrix A
-        A = np.random.randint(0, self.q, size=(self.n, self.n))
+        # Generate random matrix A. Key material is stored as int16
+        # (q < 2^12); products are taken in int32, which cannot overflow
+        # since n * q * 2 < 2^21 for n = 256
+        A = self._rng.integers(0, self.q, size=(self.n, self.n), dtype=np.int16)
         
         # Generate secret key s (small coefficients)
-        s = np.random.randint(-2, 3, size=self.n)
+        s = self._rng.integers(-2, 3, size=self.n, dtype=np.int16)
         
         # Generate error e (Gaussian noise)
-        e = np.round(np.random.normal(0, self.sigma, size=self.n)).astype(int)
+        e = np.round(self._rng.normal(0, self.sigma, size=self.n)).astype(np.int32)
         
         # Compute b = A*s + e (mod q)
-        b = (A @ s + e) % self.q
+        b = ((A @ s.astype(np.int32) + e) % self.q).astype(np.int16)
         
         public_key = (A, b)
         private_key = s
@@ -80,14 +124,15 @@ class ModuleLWE:
         A, b = public_key
         
         # Generate random small vector r
-        r = np.random.randint(-1, 2, size=self.n)
+        r = self._rng.integers(-1, 2, size=self.n, dtype=np.int32)
         
         # Generate small errors
-        e1 = np.round(np.random.normal(0, self.sigma, size=self.n)).astype(int)
-        e2 = int(np.round(np.random.normal(0, self.sigma)))
+        e1 = np.round(self._rng.normal(0, self.sigma, size=self.n)).astype(np.int32)
+        e2 = int(np.round(self._rng.normal(0, self.sigma)))
         
-        # Compute ciphertext
-        u = (A.T @ r + e1) % self.q
+        # Compute ciphertext; r @ A equals A.T @ r but reads A in its
+        # row-major layout instead of through the strided transpose
+        u = (r @ A + e1) % self.q
         v = (b @ r + e2 + message_bit * (self.q // 2)) % self.q
         
         logger.debug(f"Encrypted bit {message_bit}")
@@ -104,7 +149,7 @@ class ModuleLWE:
         Returns:
             Decrypted bit (0 or 1)
         """
-        s = private_key
+        s = np.asarray(private_key, dtype=np.int32)
         u, v = ciphertext
         
         # Compute m' = v - s^T * u (mod q)
@@ -119,6 +164,58 @@ class ModuleLWE:
         logger.debug(f"Decrypted to bit {message_bit}")
         return message_bit
     
+    def encrypt_batch(
+        self,
+        public_key: Tuple[np.ndarray, np.ndarray],
+        bits: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Encrypt many bits at once.
+        
+        Equivalent to calling encrypt() per bit, but all randomness is drawn
+        in bulk and the products with A and b are single matrix products.
+        
+        Args:
+            public_key: (A, b) public key
+            bits: Array of 0/1 message bits
+        
+        Returns:
+            Tuple (U, v): U has one ciphertext vector u per row, v holds
+            the matching scalars
+        """
+        A, b = public_key
+        bits = np.asarray(bits, dtype=np.int32)
+        count = len(bits)
+        
+        # One small random vector r (and error e1, e2) per bit
+        R = self._rng.integers(-1, 2, size=(count, self.n), dtype=np.int32)
+        E1 = np.round(self._rng.normal(0, self.sigma, size=(count, self.n))).astype(np.int32)
+        e2 = np.round(self._rng.normal(0, self.sigma, size=count)).astype(np.int32)
+        
+        # Row i of R @ A is A.T @ r_i
+        U = (R @ A + E1) % self.q
+        v = (R @ b + e2 + bits * (self.q // 2)) % self.q
+        
+        logger.debug(f"Encrypted {count} bits")
+        return U, v
+    
+    def decrypt_batch(self, private_key: np.ndarray, U: np.ndarray, v: np.ndarray) -> np.ndarray:
+        """
+        Decrypt many ciphertexts at once.
+        
+        Args:
+            private_key: Secret key s
+            U: Ciphertext vectors u, one per row
+            v: Ciphertext scalars v
+        
+        Returns:
+            Array of decrypted bits (uint8)
+        """
+        # m' = v - u . s (mod q), rounded to the nearest multiple of q/2
+        s = np.asarray(private_key, dtype=np.int32)
+        m_prime = (np.asarray(v) - np.asarray(U) @ s) % self.q
+        return ((m_prime >= self.q // 4) & (m_prime <= 3 * self.q // 4)).astype(np.uint8)
+    
     def encrypt_bytes(self, public_key: Tuple[np.ndarray, np.ndarray], data: bytes) -> List[Tuple]:
         """
         Encrypt multiple bytes.
@@ -130,12 +227,10 @@ class ModuleLWE:
         Returns:
             List of ciphertexts
         """
-        ciphertexts = []
-        for byte in data:
-            for i in range(8):
-                bit = (byte >> i) & 1
-                ct = self.encrypt(public_key, bit)
-                ciphertexts.append(ct)
+        # Bits are encrypted least significant first within each byte
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder='little')
+        U, v = self.encrypt_batch(public_key, bits)
+        ciphertexts = list(zip(U, v.tolist()))
         
         logger.info(f"Encrypted {len(data)} bytes to {len(ciphertexts)} ciphertexts")
         return ciphertexts
@@ -151,19 +246,18 @@ class ModuleLWE:
         Returns:
             Decrypted bytes
         """
-        bits = [self.decrypt(private_key, ct) for ct in ciphertexts]
+        if ciphertexts:
+            U = np.stack([ct[0] for ct in ciphertexts])
+            v = np.array([ct[1] for ct in ciphertexts])
+            bits = self.decrypt_batch(private_key, U, v)
+        else:
+            bits = np.zeros(0, dtype=np.uint8)
         
-        # Convert bits to bytes
-        data = bytearray()
-        for i in range(0, len(bits), 8):
-            byte = 0
-            for j in range(8):
-                if i + j < len(bits):
-                    byte |= (bits[i + j] << j)
-            data.append(byte)
+        # Bits were encrypted least significant first within each byte
+        data = np.packbits(bits, bitorder='little').tobytes()
         
         logger.info(f"Decrypted {len(ciphertexts)} ciphertexts to {len(data)} bytes")
-        return bytes(data)
+        return data
 
 
 class ModuleSIS:
@@ -188,9 +282,11 @@ class ModuleSIS:
         self.n = n
         self.m = m
         self.q = q
+        self._rng = np.random.default_rng()
         
-        # Generate random matrix A for the hash function
-        self.A = np.random.randint(0, q, size=(n, m))
+        # Generate random matrix A for the hash function (entries < q fit
+        # in int16; products with the {-1, 0, 1} inputs are taken in int32)
+        self.A = self._rng.integers(0, q, size=(n, m), dtype=np.int16)
         
         logger.info(f"Module-SIS initialized: n={n}, m={m}, q={q}")
     
@@ -204,23 +300,40 @@ class ModuleSIS:
         Returns:
             Hash value as lattice vector
         """
-        # Convert data to short vector
-        # Use classical hash to map to small coefficients
-        h = hashlib.sha256(data).digest()
-        
-        # Map to small coefficients
-        x = np.zeros(self.m, dtype=int)
-        for i in range(min(self.m, len(h) * 8)):
-            byte_idx = i // 8
-            bit_idx = i % 8
-            x[i] = ((h[byte_idx] >> bit_idx) & 1) * 2 - 1  # Map to {-1, 1}
-        
         # Compute hash: h = A * x (mod q)
-        hash_value = (self.A @ x) % self.q
+        hash_value = (self.A @ self._short_vectors([data])[:, 0]) % self.q
         
         logger.debug(f"Computed Module-SIS hash of {len(data)} bytes")
         return hash_value
     
+    def hash_batch(self, data_list: List[bytes]) -> np.ndarray:
+        """
+        Compute the Module-SIS hash of several inputs with one matrix product.
+        
+        Args:
+            data_list: Inputs to hash
+        
+        Returns:
+            Array of shape (n, len(data_list)); column i equals hash(data_list[i])
+        """
+        return (self.A @ self._short_vectors(data_list)) % self.q
+    
+    def _short_vectors(self, data_list: List[bytes]) -> np.ndarray:
+        """
+        Map inputs to short vectors, one column per input.
+        
+        Each input is hashed with SHA-256 (a classical hash maps it to small
+        coefficients); the digest bits, least significant first, become
+        entries in {-1, 1}. Entries past the 256 digest bits stay 0.
+        """
+        digests = b"".join(hashlib.sha256(data).digest() for data in data_list)
+        bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8), bitorder='little')
+        bits = bits.reshape(len(data_list), 256)[:, : self.m]
+        
+        X = np.zeros((self.m, len(data_list)), dtype=np.int32)
+        X[: bits.shape[1]] = bits.T.astype(np.int32) * 2 - 1
+        return X
+    
     def commit(self, value: int, randomness: bytes = None) -> Tuple[np.ndarray, bytes]:
         """
         Create a cryptographic commitment to a value.
@@ -232,8 +345,10 @@ class ModuleSIS:
         Returns:
             Tuple of (commitment, randomness)
         """
+        # The opening must be unpredictable for the commitment to hide the
+        # value, so it comes from the OS CSPRNG rather than the PCG64 stream
         if randomness is None:
-            randomness = np.random.bytes(32)
+            randomness = secrets.token_bytes(32)
         
         # Create commitment data
         commit_data = value.to_bytes(8, 'big') + randomness
@@ -265,6 +380,52 @@ class ModuleSIS:
         
         logger.debug(f"Commitment verification: {'valid' if is_valid else 'invalid'}")
         return is_valid
+    
+    def verify_commitments(
+        self,
+        commitments: List[np.ndarray],
+        values: List[int],
+        randomness: List[bytes]
+    ) -> List[bool]:
+        """
+        Verify several commitments with a single batched hash.
+        
+        Args:
+            commitments: Commitments to verify
+            values: Claimed values, one per commitment
+            randomness: Randomness used in each commitment
+        
+        Returns:
+            List with True for each valid commitment
+        """
+        if not commitments:
+            return []
+        
+        commit_data = [v.to_bytes(8, 'big') + r for v, r in zip(values, randomness)]
+        expected = self.hash_batch(commit_data)
+        valid = (np.stack(commitments, axis=1) == expected).all(axis=0)
+        
+        logger.debug(f"Verified {len(commitments)} commitments, {int(valid.sum())} valid")
+        return valid.tolist()
+
+
+def _select_kem() -> str:
+    """Return the first entry of KEM_ALGORITHMS enabled in the installed liboqs."""
+    enabled = set(oqs.get_enabled_kem_mechanisms())
+    for algorithm in KEM_ALGORITHMS:
+        if algorithm in enabled:
+            return algorithm
+    raise RuntimeError(f"liboqs has none of {', '.join(KEM_ALGORITHMS)} enabled")
+
+
+def _kem(algorithm: str, secret_key: Optional[bytes] = None):
+    """Open a liboqs KeyEncapsulation context, failing clearly without oqs."""
+    if not OQS_AVAILABLE:
+        raise ImportError(
+            f"liboqs not installed; it is needed for {algorithm} keys. "
+            "Install with: pip install liboqs-python"
+        )
+    return oqs.KeyEncapsulation(algorithm, secret_key=secret_key)
 
 
 class LatticeCrypto:
@@ -273,12 +434,33 @@ class LatticeCrypto:
     
     Combines Module-LWE and Module-SIS for complete quantum-resistant
     cryptographic operations as described in the NCRYPT whitepaper.
+    
+    With use_kem=True (requires liboqs, the ``oqs`` package), account keys
+    and message encryption use its ML-KEM/Kyber implementation: a shared
+    secret is encapsulated to the recipient and the message is sealed with
+    AES-256-GCM. By default the educational Module-LWE code is used. Keys
+    and messages carry their algorithm, so both kinds can be decrypted.
     """
     
-    def __init__(self):
-        """Initialize lattice cryptography system."""
+    def __init__(self, use_kem: bool = False):
+        """
+        Initialize lattice cryptography system.
+        
+        Args:
+            use_kem: Generate liboqs ML-KEM/Kyber keys instead of Module-LWE keys
+        
+        Raises:
+            ImportError: If use_kem is set and liboqs is not installed
+        """
+        if use_kem and not OQS_AVAILABLE:
+            raise ImportError(
+                "liboqs not installed. "
+                "Install with: pip install liboqs-python"
+            )
+        
         self.lwe = ModuleLWE()
         self.sis = ModuleSIS()
+        self.kem_algorithm = _select_kem() if use_kem else None
         logger.info("Lattice cryptography system initialized")
     
     def generate_account_keypair(self) -> Tuple[dict, dict]:
@@ -288,17 +470,29 @@ class LatticeCrypto:
         Returns:
             Tuple of (public_key_dict, private_key_dict)
         """
+        if self.kem_algorithm is not None:
+            with oqs.KeyEncapsulation(self.kem_algorithm) as kem:
+                pk = kem.generate_keypair()
+                sk = kem.export_secret_key()
+            
+            logger.info(f"Generated {self.kem_algorithm} account keypair")
+            return (
+                {"type": self.kem_algorithm, "key": base64.b64encode(pk).decode('ascii')},
+                {"type": self.kem_algorithm, "key": base64.b64encode(sk).decode('ascii')}
+            )
+        
         pk, sk = self.lwe.generate_keypair()
         
+        # Arrays are stored as base64 int16 bytes rather than nested lists
         public_key = {
             "type": "Module-LWE",
-            "A": pk[0].tolist(),
-            "b": pk[1].tolist()
+            "A": _encode_array(pk[0]),
+            "b": _encode_array(pk[1])
         }
         
         private_key = {
             "type": "Module-LWE",
-            "s": sk.tolist()
+            "s": _encode_array(sk)
         }
         
         logger.info("Generated quantum-resistant account keypair")
@@ -315,17 +509,22 @@ class LatticeCrypto:
         Returns:
             Encrypted message dictionary
         """
+        if public_key["type"] != "Module-LWE":
+            return self._kem_encrypt(public_key, message)
+        
         # Reconstruct public key
-        A = np.array(public_key["A"])
-        b = np.array(public_key["b"])
+        A = _decode_array(public_key["A"])
+        b = _decode_array(public_key["b"])
         pk = (A, b)
         
-        # Encrypt
-        ciphertexts = self.lwe.encrypt_bytes(pk, message)
+        # Encrypt all message bits (least significant first) in one batch
+        bits = np.unpackbits(np.frombuffer(message, dtype=np.uint8), bitorder='little')
+        U, v = self.lwe.encrypt_batch(pk, bits)
         
-        # Convert to serializable format
+        # Convert to serializable format: one row of u and one v per bit
         encrypted = {
-            "ciphertexts": [(u.tolist(), int(v)) for u, v in ciphertexts],
+            "u": _encode_array(U),
+            "v": _encode_array(v),
             "algorithm": "Module-LWE"
         }
         
@@ -342,15 +541,65 @@ class LatticeCrypto:
         
         Returns:
             Decrypted message
+        
+        Raises:
+            ValueError: If a KEM-sealed message fails authentication
         """
+        if encrypted.get("algorithm", "Module-LWE") != "Module-LWE":
+            return self._kem_decrypt(private_key, encrypted)
+        
         # Reconstruct private key
-        s = np.array(private_key["s"])
+        s = _decode_array(private_key["s"])
         
-        # Reconstruct ciphertexts
-        ciphertexts = [(np.array(u), v) for u, v in encrypted["ciphertexts"]]
+        if "ciphertexts" in encrypted:
+            # Older versions stored a list of (u, v) pairs
+            ciphertexts = [(np.array(u), v) for u, v in encrypted["ciphertexts"]]
+            message = self.lwe.decrypt_bytes(s, ciphertexts)
+        else:
+            U = _decode_array(encrypted["u"])
+            v = _decode_array(encrypted["v"])
+            bits = self.lwe.decrypt_batch(s, U, v)
+            message = np.packbits(bits, bitorder='little').tobytes()
         
-        # Decrypt
-        message = self.lwe.decrypt_bytes(s, ciphertexts)
+        logger.info(f"Decrypted message to {len(message)} bytes")
+        return message
+    
+    def _kem_encrypt(self, public_key: dict, message: bytes) -> dict:
+        """Encapsulate a key to a liboqs KEM public key and seal message with it."""
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        
+        algorithm = public_key["type"]
+        with _kem(algorithm) as kem:
+            kem_ciphertext, shared_secret = kem.encap_secret(base64.b64decode(public_key["key"]))
+        
+        nonce = os.urandom(KEM_NONCE_SIZE)
+        sealed = AESGCM(shared_secret[:32]).encrypt(nonce, message, None)
+        
+        logger.info(f"Encrypted message of {len(message)} bytes with {algorithm}")
+        return {
+            "kem_ciphertext": base64.b64encode(kem_ciphertext).decode('ascii'),
+            "nonce": base64.b64encode(nonce).decode('ascii'),
+            "ciphertext": base64.b64encode(sealed).decode('ascii'),
+            "algorithm": algorithm
+        }
+    
+    def _kem_decrypt(self, private_key: dict, encrypted: dict) -> bytes:
+        """Decapsulate the shared key and open a message from _kem_encrypt()."""
+        from cryptography.exceptions import InvalidTag
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        
+        algorithm = encrypted["algorithm"]
+        with _kem(algorithm, base64.b64decode(private_key["key"])) as kem:
+            shared_secret = kem.decap_secret(base64.b64decode(encrypted["kem_ciphertext"]))
+        
+        try:
+            message = AESGCM(shared_secret[:32]).decrypt(
+                base64.b64decode(encrypted["nonce"]),
+                base64.b64decode(encrypted["ciphertext"]),
+                None
+            )
+        except InvalidTag:
+            raise ValueError("Authentication failed: message may have been tampered with")
         
         logger.info(f"Decrypted message to {len(message)} bytes")
         return message
@@ -382,4 +631,23 @@ class LatticeCrypto:
             True if valid
         """
         return self.sis.verify_commitment(commitment, amount, opening)
+    
+    def verify_value_commitments_batch(
+        self,
+        commitments: List[np.ndarray],
+        amounts: List[int],
+        openings: List[bytes]
+    ) -> List[bool]:
+        """
+        Verify many value commitments at once (e.g. all outputs of a block).
+        
+        Args:
+            commitments: Commitments to verify
+            amounts: Claimed amounts
+            openings: Opening values
+        
+        Returns:
+            List with True for each valid commitment
+        """
+        return self.sis.verify_commitments(commitments, amounts, openings)
 
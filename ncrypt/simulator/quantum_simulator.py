@@ -3,12 +3,47 @@ Quantum Simulator
 Simulates quantum operations for testing and development without hardware.
 """
 
+import math
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import List, Tuple, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Smallest exchange worth splitting across threads in simulate_qkd_exchange
+PARALLEL_EXCHANGE_THRESHOLD = 1 << 16
+
+# Working-set budget per block of runs in simulate_qkd_exchange_batch (~L2 size)
+BATCH_BLOCK_BYTES = 1 << 20
+
+
+def _constant(values) -> np.ndarray:
+    """Build a read-only complex array, safe to hand out without copying."""
+    array = np.array(values, dtype=complex)
+    array.flags.writeable = False
+    return array
+
+
+# BB84 states indexed [basis][bit]: |0⟩, |1⟩ and |+⟩, |-⟩
+_STATES = (
+    (_constant([1.0, 0.0]), _constant([0.0, 1.0])),
+    (_constant(np.array([1.0, 1.0]) / np.sqrt(2)), _constant(np.array([1.0, -1.0]) / np.sqrt(2))),
+)
+
+# Projective measurements (M0, M1) indexed by basis
+_OPERATORS = (
+    (_constant([[1.0, 0.0], [0.0, 0.0]]), _constant([[0.0, 0.0], [0.0, 1.0]])),
+    (_constant([[0.5, 0.5], [0.5, 0.5]]), _constant([[0.5, -0.5], [-0.5, 0.5]])),
+)
+
+
+def _channel_errors_worker(args: Tuple[Optional[str], float, int, np.random.SeedSequence]) -> int:
+    """Count errors for one chunk of test qubits in a worker process."""
+    noise_model, noise_level, n_qubits, seed = args
+    simulator = QuantumSimulator(noise_model)
+    return simulator._channel_errors(n_qubits, noise_level, np.random.default_rng(seed))
+
 
 class QuantumSimulator:
     """
@@ -28,6 +63,7 @@ class QuantumSimulator:
         """
         self.noise_model = noise_model
         self.shots = 1024
+        self._rng = np.random.default_rng()
         logger.info(f"QuantumSimulator initialized with noise model: {noise_model}")
     
     def create_qubit_state(self, bit: int, basis: int) -> np.ndarray:
@@ -39,22 +75,10 @@ class QuantumSimulator:
             basis: 0 (rectilinear) or 1 (diagonal)
         
         Returns:
-            2D state vector
-        """
-        if basis == 0:  # Rectilinear basis
-            if bit == 0:
-                # |0⟩ state
-                return np.array([1.0, 0.0], dtype=complex)
-            else:
-                # |1⟩ state
-                return np.array([0.0, 1.0], dtype=complex)
-        else:  # Diagonal basis
-            if bit == 0:
-                # |+⟩ state = (|0⟩ + |1⟩) / √2
-                return np.array([1.0, 1.0], dtype=complex) / np.sqrt(2)
-            else:
-                # |-⟩ state = (|0⟩ - |1⟩) / √2
-                return np.array([1.0, -1.0], dtype=complex) / np.sqrt(2)
+            2D state vector (shared and read-only; copy before modifying)
+        """
+        # Rectilinear basis: |0⟩, |1⟩; diagonal basis: |±⟩ = (|0⟩ ± |1⟩) / √2
+        return _STATES[1 if basis else 0][1 if bit else 0]
     
     def get_measurement_operator(self, basis: int) -> Tuple[np.ndarray, np.ndarray]:
         """
@@ -64,20 +88,10 @@ class QuantumSimulator:
             basis: 0 (rectilinear) or 1 (diagonal)
         
         Returns:
-            Tuple of (M0, M1) measurement operators
-        """
-        if basis == 0:  # Rectilinear basis
-            # M0 = |0⟩⟨0|
-            M0 = np.array([[1.0, 0.0], [0.0, 0.0]], dtype=complex)
-            # M1 = |1⟩⟨1|
-            M1 = np.array([[0.0, 0.0], [0.0, 1.0]], dtype=complex)
-        else:  # Diagonal basis
-            # M0 = |+⟩⟨+|
-            M0 = np.array([[0.5, 0.5], [0.5, 0.5]], dtype=complex)
-            # M1 = |-⟩⟨-|
-            M1 = np.array([[0.5, -0.5], [-0.5, 0.5]], dtype=complex)
-        
-        return M0, M1
+            Tuple of (M0, M1) measurement operators (shared and read-only)
+        """
+        # Rectilinear basis: |0⟩⟨0|, |1⟩⟨1|; diagonal basis: |+⟩⟨+|, |-⟩⟨-|
+        return _OPERATORS[1 if basis else 0]
     
     def apply_noise(self, state: np.ndarray, noise_level: float = 0.01) -> np.ndarray:
         """
@@ -90,23 +104,43 @@ class QuantumSimulator:
         Returns:
             Noisy state
         """
+        if self.noise_model not in ('depolarizing', 'amplitude_damping'):
+            return state
+        
+        c0, c1 = self._noisy_amplitudes(state, noise_level)
+        
+        # Renormalize
+        inv_norm = 1.0 / math.sqrt(
+            c0.real * c0.real + c0.imag * c0.imag + c1.real * c1.real + c1.imag * c1.imag
+        )
+        return np.array([c0 * inv_norm, c1 * inv_norm], dtype=complex)
+    
+    def _noisy_amplitudes(self, state: np.ndarray, noise_level: float) -> Tuple[complex, complex]:
+        """
+        Unnormalized amplitudes of a state after the channel noise.
+        
+        States are two amplitudes, so the noise is applied to Python complex
+        scalars rather than through temporary NumPy arrays.
+        
+        Args:
+            state: Input quantum state
+            noise_level: Amount of noise to apply
+        
+        Returns:
+            Tuple of (c0, c1) amplitudes, not renormalized
+        """
+        c0, c1 = complex(state[0]), complex(state[1])
+        if noise_level <= 0:
+            return c0, c1
+        
         if self.noise_model == 'depolarizing':
-            # Depolarizing noise: mix with maximally mixed state
-            mixed_state = np.array([0.5, 0.5], dtype=complex)
-            noisy_state = (1 - noise_level) * state + noise_level * mixed_state
-            # Renormalize
-            noisy_state = noisy_state / np.linalg.norm(noisy_state)
-            return noisy_state
+            # Depolarizing noise: mix with maximally mixed state [0.5, 0.5]
+            mixed = 0.5 * noise_level
+            return (1 - noise_level) * c0 + mixed, (1 - noise_level) * c1 + mixed
         elif self.noise_model == 'amplitude_damping':
             # Simplified amplitude damping
-            decay_factor = 1 - noise_level
-            noisy_state = state.copy()
-            noisy_state[0] += np.sqrt(noise_level) * state[1]
-            noisy_state[1] *= np.sqrt(decay_factor)
-            noisy_state = noisy_state / np.linalg.norm(noisy_state)
-            return noisy_state
-        else:
-            return state
+            return c0 + math.sqrt(noise_level) * c1, c1 * math.sqrt(1 - noise_level)
+        return c0, c1
     
     def measure_qubit(
         self, 
@@ -125,62 +159,200 @@ class QuantumSimulator:
         Returns:
             Measurement result (0 or 1)
         """
-        # Apply noise if specified
-        if noise_level > 0:
-            state = self.apply_noise(state, noise_level)
-        
-        # Get measurement operators
-        M0, M1 = self.get_measurement_operator(basis)
+        # Fold the channel noise into the measurement: the noisy amplitudes are
+        # never normalized into a state, since P(1) is divided by the norm anyway
+        c0, c1 = self._noisy_amplitudes(state, noise_level)
+        norm = abs(c0) ** 2 + abs(c1) ** 2
         
-        # Calculate probabilities
-        prob_0 = np.abs(np.vdot(state, M0 @ state))
-        prob_1 = np.abs(np.vdot(state, M1 @ state))
-        
-        # Normalize probabilities
-        total = prob_0 + prob_1
-        prob_0 /= total
-        prob_1 /= total
+        # P(1) = |<1|c>|^2 in the rectilinear basis, |<-|c>|^2 = |c0 - c1|^2 / 2 in the diagonal one
+        if basis == 0:
+            prob_1 = abs(c1) ** 2 / norm
+        else:
+            prob_1 = 0.5 * abs(c0 - c1) ** 2 / norm
         
-        # Measure
-        result = np.random.choice([0, 1], p=[prob_0, prob_1])
-        return result
+        # Measure: a single Bernoulli draw
+        return int(self._rng.random() < prob_1)
     
     def simulate_qkd_exchange(
         self,
         alice_bits: List[int],
         alice_bases: List[int],
         bob_bases: List[int],
-        noise_level: float = 0.01
+        noise_level: float = 0.01,
+        threads: Optional[int] = None
     ) -> List[int]:
         """
         Simulate quantum key distribution exchange.
         
+        Args:
+            alice_bits: Alice's random bits (list or uint8 array)
+            alice_bases: Alice's random bases (list or uint8 array)
+            bob_bases: Bob's random bases (list or uint8 array)
+            noise_level: Quantum channel noise
+            threads: Draw outcomes on this many threads, each with an
+                independent random stream, once the exchange has at least
+                PARALLEL_EXCHANGE_THRESHOLD qubits (None or 1: single thread)
+        
+        Returns:
+            Bob's measurement results
+        """
+        # Lists are converted once; uint8 arrays pass through without a copy
+        alice_bits = np.ascontiguousarray(alice_bits, dtype=np.uint8)
+        alice_bases = np.ascontiguousarray(alice_bases, dtype=np.uint8)
+        bob_bases = np.ascontiguousarray(bob_bases, dtype=np.uint8)
+        
+        # Only 8 (bit, basis, basis) combinations exist: look up each qubit's
+        # chance of reading 1 and draw all outcomes at once
+        prob_1 = self._outcome_probabilities(noise_level)[alice_bits, alice_bases, bob_bases]
+        if threads and threads > 1 and len(prob_1) >= PARALLEL_EXCHANGE_THRESHOLD:
+            chunks = np.array_split(prob_1, threads)
+            rngs = [np.random.default_rng(seed) for seed in np.random.SeedSequence().spawn(threads)]
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                draws = executor.map(lambda rng, chunk: rng.random(len(chunk)) < chunk, rngs, chunks)
+                bob_results = np.concatenate(list(draws)).astype(np.uint8)
+        else:
+            bob_results = (self._rng.random(len(prob_1)) < prob_1).astype(np.uint8)
+        
+        logger.debug(f"Simulated {len(alice_bits)} qubit exchanges")
+        return bob_results.tolist()
+    
+    def simulate_qkd_exchange_batch(
+        self,
+        n_runs: int,
+        n_qubits: int,
+        noise_level: float = 0.01
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Simulate many independent random QKD exchanges in one call.
+        
+        Each run draws its own random bits and bases for Alice and Bob. Runs
+        are processed as (rows, n_qubits) blocks sized to BATCH_BLOCK_BYTES,
+        so the random buffer of a block stays cache-resident.
+        
+        Args:
+            n_runs: Number of independent exchanges
+            n_qubits: Qubits sent per exchange
+            noise_level: Quantum channel noise
+        
+        Returns:
+            Tuple of (errors, sifted) int64 arrays of length n_runs: bit errors
+            on matching bases and the number of matching bases per run
+        """
+        prob_table = self._outcome_probabilities(noise_level)
+        errors = np.empty(n_runs, dtype=np.int64)
+        sifted = np.empty(n_runs, dtype=np.int64)
+        
+        # Four uniform doubles per qubit: bit, Alice's basis, Bob's basis, outcome
+        rows_per_block = max(1, BATCH_BLOCK_BYTES // (4 * 8 * max(n_qubits, 1)))
+        for start in range(0, n_runs, rows_per_block):
+            rows = min(rows_per_block, n_runs - start)
+            u = self._rng.random((4, rows, n_qubits))
+            alice_bits = (u[0] < 0.5).astype(np.uint8)
+            alice_bases = (u[1] < 0.5).astype(np.uint8)
+            bob_bases = (u[2] < 0.5).astype(np.uint8)
+            bob_results = u[3] < prob_table[alice_bits, alice_bases, bob_bases]
+            
+            matching = alice_bases == bob_bases
+            errors[start:start + rows] = np.count_nonzero(matching & (alice_bits != bob_results), axis=1)
+            sifted[start:start + rows] = np.count_nonzero(matching, axis=1)
+        
+        logger.debug(f"Simulated {n_runs} exchanges of {n_qubits} qubits")
+        return errors, sifted
+    
+    def _outcome_probabilities(self, noise_level: float) -> np.ndarray:
+        """
+        Probability of measuring 1 for every BB84 preparation and basis.
+        
+        Evaluates the state-vector model (create_qubit_state, apply_noise and
+        the measurement operators) once per combination, so vectorized
+        exchanges sample exactly the distribution of measure_qubit().
+        
+        Args:
+            noise_level: Channel noise level
+        
+        Returns:
+            Array of shape (2, 2, 2) indexed by [bit, alice_basis, bob_basis]
+        """
+        prob_1 = np.empty((2, 2, 2))
+        for bit in (0, 1):
+            for alice_basis in (0, 1):
+                state = self.create_qubit_state(bit, alice_basis)
+                if noise_level > 0:
+                    state = self.apply_noise(state, noise_level)
+                
+                for bob_basis in (0, 1):
+                    M0, M1 = self.get_measurement_operator(bob_basis)
+                    p0 = np.abs(np.vdot(state, M0 @ state))
+                    p1 = np.abs(np.vdot(state, M1 @ state))
+                    prob_1[bit, alice_basis, bob_basis] = p1 / (p0 + p1)
+        
+        return prob_1
+    
+    def simulate_bb84_batch(
+        self,
+        alice_bits: np.ndarray,
+        alice_bases: np.ndarray,
+        bob_bases: np.ndarray,
+        noise_level: float = 0.0
+    ) -> np.ndarray:
+        """
+        Compute BB84 measurement outcomes for a whole batch analytically.
+        
+        BB84 qubits are independent single-qubit states, so no state vectors
+        are needed: when bases match Bob reads Alice's bit (flipped with
+        probability noise_level), otherwise he gets a fair coin.
+        
         Args:
             alice_bits: Alice's random bits
             alice_bases: Alice's random bases
             bob_bases: Bob's random bases
-            noise_level: Quantum channel noise
+            noise_level: Probability of a bit flip on matching bases
         
         Returns:
             Bob's measurement results
         """
-        bob_results = []
+        alice_bits = np.ascontiguousarray(alice_bits, dtype=np.uint8)
+        n = len(alice_bits)
         
-        for alice_bit, alice_basis, bob_basis in zip(alice_bits, alice_bases, bob_bases):
-            # Alice prepares qubit
-            state = self.create_qubit_state(alice_bit, alice_basis)
-            
-            # Bob measures qubit
-            result = self.measure_qubit(state, bob_basis, noise_level)
-            bob_results.append(result)
+        basis_diff = np.ascontiguousarray(alice_bases, dtype=np.uint8) ^ np.ascontiguousarray(bob_bases, dtype=np.uint8)
+        same_basis = basis_diff == 0
+        noise_flips = (self._rng.random(n) < noise_level).astype(np.uint8)
+        coin_flips = self._rng.integers(0, 2, n, dtype=np.uint8)
         
-        logger.debug(f"Simulated {len(alice_bits)} qubit exchanges")
+        bob_results = np.where(same_basis, alice_bits ^ noise_flips, coin_flips)
+        
+        logger.debug(f"Simulated {n} BB84 exchanges analytically")
         return bob_results
     
+    def _channel_errors(self, n_qubits: int, noise_level: float, rng: np.random.Generator) -> int:
+        """
+        Send n_qubits test qubits with matching bases and count bit errors.
+        
+        Args:
+            n_qubits: Number of test qubits
+            noise_level: Channel noise level
+            rng: Random generator for bits, bases and measurement outcomes
+        
+        Returns:
+            Number of qubits Bob measured differently from Alice's bit
+        """
+        # One uniform draw per qubit each for the bit, the basis and the outcome
+        u = rng.random(3 * n_qubits)
+        
+        # Test with matching bases (should have low error)
+        alice_bits = (u[:n_qubits] < 0.5).astype(np.uint8)
+        bases = (u[n_qubits:2 * n_qubits] < 0.5).astype(np.uint8)
+        
+        prob_1 = self._outcome_probabilities(noise_level)[alice_bits, bases, bases]
+        bob_results = u[2 * n_qubits:] < prob_1
+        
+        return int(np.count_nonzero(alice_bits != bob_results))
+    
     def estimate_channel_quality(
         self,
         n_test_qubits: int = 1000,
-        noise_level: float = 0.01
+        noise_level: float = 0.01,
+        processes: Optional[int] = None
     ) -> dict:
         """
         Estimate quantum channel quality.
@@ -188,23 +360,25 @@ class QuantumSimulator:
         Args:
             n_test_qubits: Number of test qubits to send
             noise_level: Expected noise level
+            processes: Split the test qubits over this many worker processes,
+                each with an independent random stream (None or 1: run here)
         
         Returns:
             Dictionary with channel statistics
         """
-        # Test with matching bases (should have low error)
-        alice_bits = np.random.randint(0, 2, n_test_qubits)
-        bases = np.random.randint(0, 2, n_test_qubits)
-        
-        bob_results = self.simulate_qkd_exchange(
-            alice_bits.tolist(),
-            bases.tolist(),
-            bases.tolist(),
-            noise_level
-        )
+        if processes and processes > 1 and n_test_qubits >= processes:
+            seeds = np.random.SeedSequence().spawn(processes)
+            base, extra = divmod(n_test_qubits, processes)
+            tasks = [
+                (self.noise_model, noise_level, base + (i < extra), seed)
+                for i, seed in enumerate(seeds)
+            ]
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                errors = sum(executor.map(_channel_errors_worker, tasks))
+        else:
+            errors = self._channel_errors(n_test_qubits, noise_level, self._rng)
         
         # Calculate error rate
-        errors = sum(1 for a, b in zip(alice_bits, bob_results) if a != b)
         error_rate = errors / n_test_qubits
         
         # Calculate fidelity (simplified)
@@ -8,15 +8,41 @@ Implements the three privacy levels described in the NCRYPT whitepaper:
 """
 
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
+import functools
 import hashlib
 import json
 import logging
 
+import numpy as np
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 
+def _canonical_json(data: Dict) -> bytes:
+    """
+    Encode data as compact, key-sorted UTF-8 JSON.
+    
+    orjson is used when installed; the json fallback is configured to emit
+    byte-identical output so encodings do not depend on the environment. It
+    also covers integers beyond 64 bits, which orjson rejects.
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+
+
 class PrivacyMode(Enum):
     """Privacy modes for NCRYPT transactions."""
     TRANSPARENT = "transparent"
@@ -43,16 +69,219 @@ class TransactionOutput:
     amount: Optional[int]   # Visible in public, hidden in value-hidden/private
     commitment: Optional[bytes] = None  # For value-hidden outputs
     encrypted_data: Optional[bytes] = None  # For private outputs
+    _commitment_hex: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _encrypted_hex: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    
+    def __setattr__(self, name, value):
+        if name == "commitment":
+            object.__setattr__(self, "_commitment_hex", None)
+        elif name == "encrypted_data":
+            object.__setattr__(self, "_encrypted_hex", None)
+        object.__setattr__(self, name, value)
+    
+    @property
+    def commitment_array(self) -> Optional[np.ndarray]:
+        """Commitment as a read-only uint8 array view (no copy)."""
+        if self.commitment is None:
+            return None
+        return np.frombuffer(self.commitment, dtype=np.uint8)
     
     def to_dict(self) -> Dict:
         """Convert to dictionary for serialization."""
+        # Hex forms are computed once and reused by every later serialization
+        if self._commitment_hex is None and self.commitment:
+            self._commitment_hex = self.commitment.hex()
+        if self._encrypted_hex is None and self.encrypted_data:
+            self._encrypted_hex = self.encrypted_data.hex()
+        
         return {
             "type": self.txo_type.value,
             "address": self.address,
             "amount": self.amount,
-            "commitment": self.commitment.hex() if self.commitment else None,
-            "encrypted_data": self.encrypted_data.hex() if self.encrypted_data else None
+            "commitment": self._commitment_hex,
+            "encrypted_data": self._encrypted_hex
         }
+    
+    def _pack(self, buf: bytearray) -> None:
+        """Append the canonical binary encoding of this output to buf."""
+        flags = (
+            (_HAS_ADDRESS if self.address is not None else 0)
+            | (_HAS_AMOUNT if self.amount is not None else 0)
+            | (_HAS_COMMITMENT if self.commitment is not None else 0)
+            | (_HAS_ENCRYPTED if self.encrypted_data is not None else 0)
+        )
+        buf.append(_TXO_TYPE_CODES[self.txo_type])
+        buf.append(flags)
+        if self.address is not None:
+            _write_bytes(buf, self.address.encode())
+        if self.amount is not None:
+            _write_signed(buf, self.amount)
+        if self.commitment is not None:
+            _write_bytes(buf, self.commitment)
+        if self.encrypted_data is not None:
+            _write_bytes(buf, self.encrypted_data)
+    
+    @classmethod
+    def _unpack(cls, data: bytes, offset: int) -> Tuple["TransactionOutput", int]:
+        """Decode one output written by _pack(); returns it and the next offset."""
+        txo_type, flags = _TXO_TYPES[data[offset]], data[offset + 1]
+        offset += 2
+        
+        address = amount = commitment = encrypted_data = None
+        if flags & _HAS_ADDRESS:
+            raw, offset = _read_bytes(data, offset)
+            address = raw.decode()
+        if flags & _HAS_AMOUNT:
+            amount, offset = _read_signed(data, offset)
+        if flags & _HAS_COMMITMENT:
+            commitment, offset = _read_bytes(data, offset)
+        if flags & _HAS_ENCRYPTED:
+            encrypted_data, offset = _read_bytes(data, offset)
+        
+        return cls(txo_type, address, amount, commitment, encrypted_data), offset
+
+
+@functools.lru_cache(maxsize=4096)
+def _output_ciphertext(recipient: str, amount: int) -> bytes:
+    """Deterministic private-output payload, memoized across calls."""
+    # In production, use quantum-resistant encryption
+    return hashlib.sha256(f"{recipient}:{amount}".encode()).digest()
+
+
+@functools.lru_cache(maxsize=4096)
+def _amount_commitment(amount: int) -> bytes:
+    """Deterministic amount commitment, memoized across calls."""
+    # In production, use Module-SIS based commitment
+    return hashlib.sha256(str(amount).encode()).digest()
+
+
+# Stable int8 codes for TXOType in OutputBatch.txo_types
+_TXO_TYPES = tuple(TXOType)
+_TXO_TYPE_CODES = {txo_type: code for code, txo_type in enumerate(_TXO_TYPES)}
+
+# Canonical binary transaction encoding hashed by compute_hash(). Enum codes
+# are part of the hash, so new values may only be appended; other tx types
+# are written as a string after the _CUSTOM_TX_TYPE code.
+CANONICAL_SCHEMA_VERSION = 2
+_TX_TYPES = ("public", "mask", "private", "unmask", "accountable")
+_TX_TYPE_CODES = {tx_type: code for code, tx_type in enumerate(_TX_TYPES)}
+_CUSTOM_TX_TYPE = 0xFF
+_PRIVACY_MODES = tuple(PrivacyMode)
+_PRIVACY_MODE_CODES = {mode: code for code, mode in enumerate(_PRIVACY_MODES)}
+
+# Presence flags for optional fields (transaction byte, then per-output byte)
+_HAS_TRACKING_KEY, _HAS_TIMESTAMP = 0x01, 0x02
+_HAS_ADDRESS, _HAS_AMOUNT, _HAS_COMMITMENT, _HAS_ENCRYPTED = 0x01, 0x02, 0x04, 0x08
+
+
+def _write_bytes(buf: bytearray, data: bytes) -> None:
+    """Append data to buf prefixed with its length as an unsigned LEB128 varint."""
+    _write_varint(buf, len(data))
+    buf += data
+
+
+def _write_varint(buf: bytearray, value: int) -> None:
+    """Append a non-negative integer to buf as an unsigned LEB128 varint."""
+    while value >= 0x80:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _write_signed(buf: bytearray, value: int) -> None:
+    """Append an integer of any size to buf as a zigzag-encoded LEB128 varint."""
+    _write_varint(buf, value << 1 if value >= 0 else (~value << 1) | 1)
+
+
+def _read_bytes(data: bytes, offset: int) -> Tuple[bytes, int]:
+    """Read a length-prefixed field; returns it and the next offset."""
+    length, offset = _read_varint(data, offset)
+    end = offset + length
+    if end > len(data):
+        raise ValueError("Truncated canonical transaction encoding")
+    return bytes(data[offset:end]), end
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """Read an unsigned LEB128 varint; returns it and the next offset."""
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _read_signed(data: bytes, offset: int) -> Tuple[int, int]:
+    """Read a zigzag-encoded varint; returns it and the next offset."""
+    value, offset = _read_varint(data, offset)
+    return (~(value >> 1) if value & 1 else value >> 1), offset
+
+
+@dataclass
+class OutputBatch:
+    """
+    Column-wise (struct-of-arrays) view of a list of transaction outputs.
+    
+    Fixed-width fields live in contiguous NumPy arrays so block-level work
+    (commitment checks, bulk serialization) walks memory once instead of
+    fetching attributes output by output. Missing amounts/commitments are
+    zero-filled and flagged False in the matching mask.
+    """
+    txo_types: np.ndarray  # int8 codes into tuple(TXOType)
+    addresses: List[Optional[str]]
+    amounts: np.ndarray  # int64
+    amount_mask: np.ndarray  # bool
+    commitments: np.ndarray  # uint8, shape (n, commitment_size)
+    commitment_mask: np.ndarray  # bool
+    encrypted_data: List[Optional[bytes]]
+    
+    @classmethod
+    def from_outputs(cls, outputs: List[TransactionOutput]) -> "OutputBatch":
+        """
+        Gather outputs into columns.
+        
+        Args:
+            outputs: Transaction outputs
+        
+        Returns:
+            Column-wise batch of the outputs
+        
+        Raises:
+            ValueError: If the present commitments differ in size
+        """
+        n = len(outputs)
+        amounts = np.zeros(n, dtype=np.int64)
+        amount_mask = np.zeros(n, dtype=bool)
+        commitment_mask = np.zeros(n, dtype=bool)
+        
+        sizes = {len(out.commitment) for out in outputs if out.commitment is not None}
+        if len(sizes) > 1:
+            raise ValueError(f"Commitments of mixed sizes cannot be batched: {sorted(sizes)}")
+        commitments = np.zeros((n, sizes.pop() if sizes else 0), dtype=np.uint8)
+        
+        for i, out in enumerate(outputs):
+            if out.amount is not None:
+                amounts[i] = out.amount
+                amount_mask[i] = True
+            if out.commitment is not None:
+                commitments[i] = out.commitment_array
+                commitment_mask[i] = True
+        
+        return cls(
+            txo_types=np.fromiter((_TXO_TYPE_CODES[out.txo_type] for out in outputs), dtype=np.int8, count=n),
+            addresses=[out.address for out in outputs],
+            amounts=amounts,
+            amount_mask=amount_mask,
+            commitments=commitments,
+            commitment_mask=commitment_mask,
+            encrypted_data=[out.encrypted_data for out in outputs]
+        )
+    
+    def __len__(self) -> int:
+        return len(self.txo_types)
 
 
 @dataclass
@@ -70,19 +299,103 @@ class Transaction:
     timestamp: Optional[int] = None
     signature: Optional[bytes] = None
     
+    def _canonical_bytes(self) -> bytes:
+        """
+        Serialize the hashed transaction fields in canonical binary form.
+        
+        Layout: schema version, tx type code, privacy mode code and presence
+        flags (one byte each), followed by the length-prefixed tx type when
+        it has no code; varint-counted, length-prefixed inputs;
+        varint-counted outputs; then the optional tracking key and timestamp.
+        Integers (amounts, timestamp) are zigzag varints of any size. The
+        signature is not included.
+        
+        Returns:
+            Canonical encoding
+        """
+        flags = (
+            (_HAS_TRACKING_KEY if self.tracking_key is not None else 0)
+            | (_HAS_TIMESTAMP if self.timestamp is not None else 0)
+        )
+        buf = bytearray((
+            CANONICAL_SCHEMA_VERSION,
+            _TX_TYPE_CODES.get(self.tx_type, _CUSTOM_TX_TYPE),
+            _PRIVACY_MODE_CODES[self.privacy_mode],
+            flags
+        ))
+        if buf[1] == _CUSTOM_TX_TYPE:
+            _write_bytes(buf, self.tx_type.encode())
+        
+        _write_varint(buf, len(self.inputs))
+        for tx_input in self.inputs:
+            _write_bytes(buf, tx_input.encode())
+        
+        _write_varint(buf, len(self.outputs))
+        for out in self.outputs:
+            out._pack(buf)
+        
+        if self.tracking_key is not None:
+            _write_bytes(buf, self.tracking_key.encode())
+        if self.timestamp is not None:
+            _write_signed(buf, self.timestamp)
+        
+        return bytes(buf)
+    
+    @classmethod
+    def from_canonical_bytes(cls, data: bytes) -> "Transaction":
+        """
+        Rebuild an (unsigned) transaction from its canonical encoding.
+        
+        Args:
+            data: Bytes produced by _canonical_bytes()
+        
+        Returns:
+            Transaction with the hashed fields restored and no signature
+        
+        Raises:
+            ValueError: If the encoding is truncated or uses another schema version
+        """
+        if len(data) < 4 or data[0] != CANONICAL_SCHEMA_VERSION:
+            raise ValueError("Unsupported canonical transaction encoding")
+        
+        try:
+            privacy_mode, flags, offset = _PRIVACY_MODES[data[2]], data[3], 4
+            if data[1] == _CUSTOM_TX_TYPE:
+                raw, offset = _read_bytes(data, offset)
+                tx_type = raw.decode()
+            else:
+                tx_type = _TX_TYPES[data[1]]
+            
+            n_inputs, offset = _read_varint(data, offset)
+            inputs = []
+            for _ in range(n_inputs):
+                raw, offset = _read_bytes(data, offset)
+                inputs.append(raw.decode())
+            
+            n_outputs, offset = _read_varint(data, offset)
+            outputs = []
+            for _ in range(n_outputs):
+                out, offset = TransactionOutput._unpack(data, offset)
+                outputs.append(out)
+            
+            tracking_key = timestamp = None
+            if flags & _HAS_TRACKING_KEY:
+                raw, offset = _read_bytes(data, offset)
+                tracking_key = raw.decode()
+            if flags & _HAS_TIMESTAMP:
+                timestamp, offset = _read_signed(data, offset)
+        except IndexError as e:
+            raise ValueError(f"Truncated canonical transaction encoding: {e}") from e
+        
+        return cls(tx_type, privacy_mode, inputs, outputs, tracking_key, timestamp)
+    
+    def as_batch(self) -> OutputBatch:
+        """Column-wise view of this transaction's outputs."""
+        return OutputBatch.from_outputs(self.outputs)
+    
     def compute_hash(self) -> str:
         """Compute transaction hash."""
-        tx_data = {
-            "type": self.tx_type,
-            "privacy_mode": self.privacy_mode.value,
-            "inputs": self.inputs,
-            "outputs": [out.to_dict() for out in self.outputs],
-            "tracking_key": self.tracking_key,
-            "timestamp": self.timestamp
-        }
-        
-        tx_json = json.dumps(tx_data, sort_keys=True)
-        return hashlib.sha256(tx_json.encode()).hexdigest()
+        return hashlib.sha256(self._canonical_bytes()).hexdigest()
     
     def to_dict(self) -> Dict:
         """Convert transaction to dictionary."""
@@ -96,6 +409,17 @@ class Transaction:
             "timestamp": self.timestamp,
             "signature": self.signature.hex() if self.signature else None
         }
+    
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the full transaction for transport.
+        
+        Encodes to_dict() as compact, key-sorted JSON.
+        
+        Returns:
+            Compact, key-sorted UTF-8 JSON of to_dict()
+        """
+        return _canonical_json(self.to_dict())
 
 
 class TransparentTransaction:
@@ -293,16 +617,71 @@ class DAPOAFramework:
         else:
             raise ValueError(f"Unknown privacy mode: {privacy_mode}")
     
+    def hash_batch(self, transactions: List[Transaction]) -> str:
+        """
+        Compute a single digest committing to a batch of transactions.
+        
+        Each transaction body is length-prefixed and fed to one streaming
+        SHA-256 hasher, so a block of transactions costs one hash object
+        instead of one per transaction.
+        
+        Args:
+            transactions: Transactions in block order
+        
+        Returns:
+            Hex digest of the batch
+        """
+        h = hashlib.sha256()
+        for tx in transactions:
+            body = tx._canonical_bytes()
+            h.update(len(body).to_bytes(4, 'little'))
+            h.update(body)
+        
+        logger.debug(f"Hashed batch of {len(transactions)} transactions")
+        return h.hexdigest()
+    
+    def verify_block(self, transactions: List[Transaction], amounts: List[int]) -> np.ndarray:
+        """
+        Verify the value commitments of a block of accountable transactions.
+        
+        The first output of every transaction is gathered into one
+        OutputBatch, whose contiguous (N, 32) commitment column is compared
+        against the recomputed commitments in a single vectorized pass.
+        
+        Args:
+            transactions: Accountable transactions in block order
+            amounts: Claimed amount for each transaction
+        
+        Returns:
+            Boolean array, True where the commitment matches its amount
+        """
+        if len(transactions) != len(amounts):
+            raise ValueError("Need exactly one claimed amount per transaction")
+        
+        if not transactions:
+            return np.zeros(0, dtype=bool)
+        
+        batch = OutputBatch.from_outputs([tx.outputs[0] for tx in transactions])
+        if not batch.commitment_mask.all():
+            raise ValueError("Every transaction needs a committed first output")
+        commitments = batch.commitments
+        expected = np.frombuffer(
+            b"".join(self._create_commitment(amount) for amount in amounts),
+            dtype=np.uint8
+        ).reshape(len(amounts), -1)
+        
+        valid = np.all(commitments == expected, axis=1)
+        
+        logger.info(f"Verified block: {int(valid.sum())}/{len(transactions)} commitments valid")
+        return valid
+    
     def _encrypt_output(self, recipient: str, amount: int) -> bytes:
         """Encrypt output data for private transaction."""
-        data = f"{recipient}:{amount}".encode()
-        # In production, use quantum-resistant encryption
-        return hashlib.sha256(data).digest()
+        return _output_ciphertext(recipient, amount)
     
     def _create_commitment(self, amount: int) -> bytes:
         """Create cryptographic commitment to amount."""
-        # In production, use Module-SIS based commitment
-        return hashlib.sha256(str(amount).encode()).digest()
+        return _amount_commitment(amount)
     
     def reveal_to_auditor(
         self,
@@ -330,8 +709,9 @@ class DAPOAFramework:
         # In production, verify tracking_private_key matches tracking_key
         # and decrypt transaction details
         
+        tx_hash = transaction.compute_hash()
         revealed = {
-            "transaction_hash": transaction.compute_hash(),
+            "transaction_hash": tx_hash,
             "sender": "revealed_sender",
             "recipient": "revealed_recipient",
             "amount": "revealed_amount",
@@ -339,6 +719,6 @@ class DAPOAFramework:
             "note": "Revealed to authorized auditor"
         }
         
-        logger.info(f"Revealed transaction {transaction.compute_hash()[:8]} to auditor")
+        logger.info(f"Revealed transaction {tx_hash[:8]} to auditor")
         return revealed
 
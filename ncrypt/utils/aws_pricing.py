@@ -6,10 +6,44 @@ Fetches real-time pricing from AWS Pricing API.
 import subprocess
 import json
 import logging
-from typing import Dict, Optional
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+try:
+    import boto3
+    BOTO3_AVAILABLE = True
+except ImportError:
+    BOTO3_AVAILABLE = False
+    boto3 = None
 
 logger = logging.getLogger(__name__)
 
+# On-disk pricing cache shared by CLI invocations
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ncrypt", "pricing")
+DEFAULT_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Pricing API responses run to hundreds of nested JSON documents; orjson
+# parses them several times faster when installed (both accept bytes and
+# raise a json.JSONDecodeError subclass)
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+# Pricing API operation -> (pricing field, unit marker): task pricing is in the
+# "Task" operation, shot pricing in the "CompleteTask" operation
+_PRICE_OPERATIONS = {
+    'task': ('task', 'quantum-task'),
+    'completetask': ('shot', 'quantum-shot'),
+}
+
 
 class BraketPricing:
     """Fetch and cache AWS Braket pricing information."""
@@ -21,17 +55,35 @@ class BraketPricing:
         'simulator': {'task': 0.00, 'shot': 0.00, 'name': 'Simulator'}
     }
     
-    def __init__(self, aws_profile: str = 'default', region: str = 'us-east-1'):
+    def __init__(
+        self,
+        aws_profile: str = 'default',
+        region: str = 'us-east-1',
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        cache_ttl: float = DEFAULT_CACHE_TTL_SECONDS,
+        refresh: bool = False
+    ):
         """
         Initialize pricing fetcher.
         
         Args:
             aws_profile: AWS CLI profile
             region: AWS region
+            cache_dir: Directory for cached AWS pricing responses (None disables
+                the disk cache)
+            cache_ttl: Maximum age in seconds of a cached response
+            refresh: Ignore cached responses and query AWS again
         """
         self.aws_profile = aws_profile
         self.region = region
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        self.refresh = refresh
         self._pricing_cache = {}
+        self._price_list: Optional[List] = None  # Braket PriceList, fetched once
+        self._price_list_fetched = False
+        self._client = None
+        self._client_lock = threading.Lock()
     
     def get_device_pricing(self, device_arn: Optional[str] = None, device_type: Optional[str] = None) -> Dict:
         """
@@ -61,8 +113,12 @@ class BraketPricing:
             logger.debug(f"Using cached pricing for {device_type}")
             return self._pricing_cache[device_type]
         
-        # Try to fetch from AWS
-        pricing = self._fetch_from_aws(device_type)
+        # Check disk cache, then fetch from AWS
+        pricing = self._read_disk_cache(device_type)
+        if pricing is None:
+            pricing = self._fetch_from_aws(device_type)
+            if pricing and pricing.get('source') == 'AWS Pricing API':
+                self._write_disk_cache(device_type, pricing)
         
         if pricing:
             self._pricing_cache[device_type] = pricing
@@ -72,6 +128,61 @@ class BraketPricing:
         logger.warning(f"Using fallback pricing for {device_type}")
         return self.FALLBACK_PRICING.get(device_type, self.FALLBACK_PRICING['ionq'])
     
+    def _cache_path(self, device_type: str) -> str:
+        """Path of the disk cache entry for a device type and region."""
+        return os.path.join(self.cache_dir, f"{device_type}-{self.region}.json")
+    
+    def _read_disk_cache(self, device_type: str) -> Optional[Dict]:
+        """
+        Load cached pricing for a device type if present and fresh.
+        
+        Args:
+            device_type: 'ionq', 'rigetti', or 'simulator'
+        
+        Returns:
+            Pricing dictionary or None if missing, corrupt, stale or refresh
+            was requested
+        """
+        if self.cache_dir is None or self.refresh:
+            return None
+        
+        try:
+            with open(self._cache_path(device_type), 'r') as f:
+                entry = json.load(f)
+            fetched_at = float(entry['fetched_at'])
+            pricing = entry['pricing']
+        except (OSError, ValueError, TypeError, KeyError):
+            return None  # Missing or corrupt entry
+        
+        if not isinstance(pricing, dict) or time.time() - fetched_at >= self.cache_ttl:
+            return None
+        
+        logger.debug(f"Using disk-cached pricing for {device_type}")
+        return pricing
+    
+    def _write_disk_cache(self, device_type: str, pricing: Dict) -> None:
+        """
+        Atomically store fetched pricing on disk.
+        
+        Args:
+            device_type: 'ionq', 'rigetti', or 'simulator'
+            pricing: Pricing dictionary returned by _fetch_from_aws()
+        """
+        if self.cache_dir is None:
+            return
+        
+        tmp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'fetched_at': time.time(), 'pricing': pricing}, f)
+            os.replace(tmp_path, self._cache_path(device_type))
+        except OSError as e:
+            logger.debug(f"Could not write pricing cache: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
     def _fetch_from_aws(self, device_type: str) -> Optional[Dict]:
         """
         Fetch pricing from AWS Pricing API.
@@ -86,25 +197,11 @@ class BraketPricing:
             return {'task': 0.0, 'shot': 0.0, 'name': 'Local Simulator', 'source': 'free'}
         
         try:
-            # Query AWS Pricing API for Braket
-            # Note: productFamily filter doesn't work well for Braket, so we filter by service
-            cmd = [
-                'aws', 'pricing', 'get-products',
-                '--service-code', 'AmazonBraket',
-                '--format-version', 'aws_v1',
-                '--max-results', '100',
-                '--region', 'us-east-1',  # Pricing API is only in us-east-1
-                '--profile', self.aws_profile
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-            
-            if result.returncode != 0:
-                logger.warning(f"AWS CLI returned error (code {result.returncode}): {result.stderr.strip()}")
+            price_list = self._get_price_list()
+            if price_list is None:
                 return None
             
-            data = json.loads(result.stdout)
-            logger.debug(f"AWS Pricing API returned {len(data.get('PriceList', []))} items")
+            logger.debug(f"AWS Pricing API returned {len(price_list)} items")
             
             # Parse pricing data - task and shot pricing are in separate API items
             # Prefer latest generation devices: Forte for IonQ, Ankaa for Rigetti
@@ -116,8 +213,13 @@ class BraketPricing:
             # Collect all pricing for matching devices
             device_pricing = {}  # device_name -> {'task': X, 'shot': Y}
             
-            for price_item in data.get('PriceList', []):
-                price_data = json.loads(price_item)
+            for price_item in price_list:
+                # A matching item must mention the device type somewhere, so
+                # skip parsing the (mostly irrelevant) rest of the price list
+                if device_type not in price_item.lower():
+                    continue
+                
+                price_data = _json_loads(price_item)
                 
                 # Check if this is for the right device type
                 attributes = price_data.get('product', {}).get('attributes', {})
@@ -131,26 +233,20 @@ class BraketPricing:
                 if device_type in provider or device_type in device_name:
                     # Extract pricing from this item
                     terms = price_data.get('terms', {}).get('OnDemand', {})
+                    if not terms:
+                        continue
+                    
+                    entry = device_pricing.setdefault(device_name, {'task': None, 'shot': None})
+                    if operation not in _PRICE_OPERATIONS:
+                        continue
+                    field, unit_marker = _PRICE_OPERATIONS[operation]
                     
-                    for term_id, term_data in terms.items():
-                        price_dimensions = term_data.get('priceDimensions', {})
-                        
-                        for dim_id, dim_data in price_dimensions.items():
-                            unit = dim_data.get('unit', '').lower()
-                            price = float(dim_data.get('pricePerUnit', {}).get('USD', 0))
-                            
-                            # Initialize device entry if not exists
-                            if device_name not in device_pricing:
-                                device_pricing[device_name] = {'task': None, 'shot': None}
-                            
-                            # Task pricing is in "Task" operation
-                            if 'quantum-task' in unit and operation == 'task':
-                                device_pricing[device_name]['task'] = price
-                                logger.debug(f"Found task price for {device_name}: ${price}")
-                            # Shot pricing is in "CompleteTask" operation
-                            elif 'quantum-shot' in unit and operation == 'completetask':
-                                device_pricing[device_name]['shot'] = price
-                                logger.debug(f"Found shot price for {device_name}: ${price}")
+                    for term_data in terms.values():
+                        for dim_data in term_data.get('priceDimensions', {}).values():
+                            if unit_marker in dim_data.get('unit', '').lower():
+                                price = float(dim_data.get('pricePerUnit', {}).get('USD', 0))
+                                entry[field] = price
+                                logger.debug(f"Found {field} price for {device_name}: ${price}")
             
             # Select the best device based on preference
             selected_device = None
@@ -186,7 +282,7 @@ class BraketPricing:
             if device_pricing:
                 logger.warning(f"Found {len(device_pricing)} {device_type} devices but none with complete pricing")
             else:
-                logger.warning(f"No pricing found in AWS API for {device_type} after checking {len(data.get('PriceList', []))} items")
+                logger.warning(f"No pricing found in AWS API for {device_type} after checking {len(price_list)} items")
             return None
             
         except subprocess.TimeoutExpired:
@@ -199,17 +295,81 @@ class BraketPricing:
             logger.warning(f"Error fetching AWS pricing: {e}")
             return None
     
+    def _get_price_list(self) -> Optional[List]:
+        """
+        Query the AWS Pricing API for Braket products.
+        
+        The list covers every Braket device, so it is fetched once per
+        BraketPricing and parsed per device type. Uses an in-process boto3
+        client when boto3 is installed and falls back to the aws CLI
+        otherwise.
+        
+        Returns:
+            PriceList items (JSON documents) or None if the CLI call failed
+        """
+        if not self._price_list_fetched:
+            # A failed query (error or timeout) is not repeated per device
+            try:
+                self._price_list = self._query_price_list()
+            finally:
+                self._price_list_fetched = True
+        return self._price_list
+    
+    def _query_price_list(self) -> Optional[List]:
+        """Run the Pricing API get-products query behind _get_price_list()."""
+        if BOTO3_AVAILABLE:
+            # Note: productFamily filter doesn't work well for Braket, so we filter by service
+            paginator = self._pricing_client().get_paginator('get_products')
+            pages = paginator.paginate(
+                ServiceCode='AmazonBraket',
+                FormatVersion='aws_v1',
+                PaginationConfig={'MaxItems': 100, 'PageSize': 100}
+            )
+            return [item for page in pages for item in page.get('PriceList', [])]
+        
+        # Query AWS Pricing API for Braket
+        # Note: productFamily filter doesn't work well for Braket, so we filter by service
+        cmd = [
+            'aws', 'pricing', 'get-products',
+            '--service-code', 'AmazonBraket',
+            '--format-version', 'aws_v1',
+            '--max-results', '100',
+            '--region', 'us-east-1',  # Pricing API is only in us-east-1
+            '--profile', self.aws_profile
+        ]
+        
+        # Raw bytes go straight to the JSON parser without a decode step
+        result = subprocess.run(cmd, capture_output=True, timeout=10)
+        
+        if result.returncode != 0:
+            stderr = result.stderr.decode(errors='replace').strip()
+            logger.warning(f"AWS CLI returned error (code {result.returncode}): {stderr}")
+            return None
+        
+        return _json_loads(result.stdout).get('PriceList', [])
+    
+    def _pricing_client(self):
+        """Create the boto3 Pricing client once and share it between threads."""
+        with self._client_lock:
+            if self._client is None:
+                session = boto3.session.Session(profile_name=self.aws_profile)
+                # Pricing API is only in us-east-1
+                self._client = session.client('pricing', region_name='us-east-1')
+            return self._client
+    
     def get_all_pricing(self) -> Dict:
         """
         Get pricing for all device types.
         
+        The Braket price list is downloaded once and parsed for each device
+        type.
+        
         Returns:
             Dictionary of device_type -> pricing
         """
         return {
-            'ionq': self.get_device_pricing(device_type='ionq'),
-            'rigetti': self.get_device_pricing(device_type='rigetti'),
-            'simulator': self.get_device_pricing(device_type='simulator')
+            device_type: self.get_device_pricing(device_type=device_type)
+            for device_type in ('ionq', 'rigetti', 'simulator')
         }
     
     def calculate_cost(
@@ -4,14 +4,143 @@ Secure storage and management of quantum-generated keys.
 """
 
 import json
+import mmap
 import os
-from typing import List, Dict, Optional
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, Optional, Tuple, Union
 from datetime import datetime, timezone
 import hashlib
+import hmac
 import logging
+import secrets
+
+import numpy as np
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+    msgpack = None
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+try:
+    from bitarray import bitarray
+    BITARRAY_AVAILABLE = True
+except ImportError:
+    BITARRAY_AVAILABLE = False
+    bitarray = None
 
 logger = logging.getLogger(__name__)
 
+# Stored key file extensions, in lookup order
+KEY_EXTENSIONS = (".mpk", ".json")
+
+# Packed key bits stored next to a JSON metadata file
+KEY_BITS_EXTENSION = ".bin"
+
+# SQLite metadata index in the storage directory, serving list_keys
+INDEX_FILENAME = "index.sqlite"
+
+# Number of key files whose integrity digest load_key remembers
+HASH_CACHE_SIZE = 256
+
+# Per-store random secret keying the HMAC integrity tags of saved keys;
+# it must stay with the key files (tags fail to verify without it)
+STORE_SECRET_FILENAME = ".secret"
+STORE_SECRET_SIZE = 32
+
+# Key file JSON codec: orjson when installed, stdlib json otherwise (both
+# produce compact or 2-space indented UTF-8 and read each other's files)
+if ORJSON_AVAILABLE:
+    def _json_dumps(data: Dict, pretty: bool = False) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else None)
+    _json_loads = orjson.loads
+else:
+    def _json_dumps(data: Dict, pretty: bool = False) -> bytes:
+        if pretty:
+            return json.dumps(data, indent=2).encode()
+        return json.dumps(data, separators=(',', ':')).encode()
+    _json_loads = json.loads
+
+# Thread cap for key file I/O in list_keys and flush (I/O-bound, so above CPU count)
+LIST_KEYS_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def _key_bits(key: Union[List[int], np.ndarray, "bitarray"]) -> np.ndarray:
+    """
+    Key bits as a contiguous uint8 array, one byte per bit.
+    
+    Arrays from the BB84 pipeline are used as-is when already uint8 (other
+    integer dtypes are narrowed once); bitarrays are unpacked from their
+    bytes and lists are converted in one pass.
+    """
+    if isinstance(key, np.ndarray):
+        return np.ascontiguousarray(key.astype(np.uint8, copy=False))
+    if BITARRAY_AVAILABLE and isinstance(key, bitarray):
+        packed = np.frombuffer(key.tobytes(), dtype=np.uint8)
+        return np.unpackbits(packed, count=len(key), bitorder=key.endian())
+    return np.fromiter(key, dtype=np.uint8, count=len(key))
+
+
+def _right_aligned_bits(key: List[int], group_bits: int) -> np.ndarray:
+    """
+    Key bits as a uint8 array, ready to pack MSB-first in group_bits groups.
+    
+    Export formats pack a trailing partial group right-aligned (zero-padded
+    on the left), so the missing zeros are inserted before that group.
+    """
+    bits = _key_bits(key)
+    tail = len(bits) % group_bits
+    if tail:
+        split = len(bits) - tail
+        bits = np.concatenate((bits[:split], np.zeros(group_bits - tail, dtype=np.uint8), bits[split:]))
+    return bits
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """
+    Replace path with data via a temporary file in the same directory.
+    
+    os.replace swaps in a new inode, so arrays returned by _map_packed_bits
+    keep mapping the old contents instead of faulting on a truncated file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _map_packed_bits(bits_path: str) -> np.ndarray:
+    """
+    Read-only uint8 view of a packed .bin key file.
+    
+    The file is memory-mapped, so pages are read on demand and nothing is
+    copied onto the heap; the mapping lives as long as the returned array.
+    Empty files (and platforms without mmap) fall back to a plain read.
+    """
+    with open(bits_path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            return np.frombuffer(f.read(), dtype=np.uint8)
+    return np.frombuffer(mapped, dtype=np.uint8)
+
 
 class KeyManager:
     """
@@ -21,57 +150,183 @@ class KeyManager:
     generated through quantum key distribution.
     """
     
-    def __init__(self, storage_dir: str = "./keys"):
+    def __init__(self, storage_dir: str = "./keys", use_msgpack: bool = False):
         """
         Initialize key manager.
         
         Args:
             storage_dir: Directory for key storage
+            use_msgpack: Save new keys as msgpack (.mpk) with the key bits as
+                raw bytes instead of a JSON array (requires msgpack)
         """
+        if use_msgpack and not MSGPACK_AVAILABLE:
+            raise ImportError(
+                "msgpack not installed. "
+                "Install with: pip install msgpack"
+            )
+        
         self.storage_dir = storage_dir
+        self.use_msgpack = use_msgpack
+        # storage_dir with a trailing separator; key paths are prefix + name
+        self._path_prefix = os.path.join(storage_dir, "")
+        self._pending: Dict[str, tuple] = {}  # key_id -> (key, metadata, pretty) awaiting flush()
+        self._batch_depth = 0
+        self._flush_every: Optional[int] = None
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        # filepath -> (stat signature, computed digest), LRU-ordered
+        self._hash_cache: "OrderedDict[str, tuple]" = OrderedDict()
         os.makedirs(storage_dir, exist_ok=True)
+        self._secret = self._load_store_secret()
         logger.info(f"KeyManager initialized with storage: {storage_dir}")
     
     def save_key(
         self,
-        key: List[int],
+        key: Union[List[int], np.ndarray, "bitarray"],
         key_id: str,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        pretty: bool = False
     ) -> str:
         """
         Save quantum key with metadata.
         
         Args:
-            key: Quantum-generated key bits
+            key: Quantum-generated key bits (list, integer array or bitarray)
             key_id: Unique identifier for the key
             metadata: Optional metadata (protocol, timestamp, etc.)
+            pretty: Indent the JSON file for human reading (default: compact)
         
         Returns:
-            Path to saved key file
+            Path to saved key file (written on flush() inside batch())
         """
         if metadata is None:
             metadata = {}
         
+        # Convert once; hashing and both storage formats use the uint8 bits
+        key = _key_bits(key)
+        
         # Add default metadata
         metadata.update({
             "key_id": key_id,
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "key_length": len(key),
-            "key_hash": self._hash_key(key)
+            "key_tag": self._tag_key(np.packbits(key), len(key))
         })
         
-        key_data = {
-            "key": key,
-            "metadata": metadata
-        }
+        with self._lock:
+            if self._batch_depth:
+                self._pending[key_id] = (key, metadata, pretty)
+                if self._flush_every and len(self._pending) >= self._flush_every:
+                    self.flush()
+                ext = ".mpk" if self.use_msgpack else ".json"
+                return self._key_path(key_id, ext)
         
-        filename = f"{key_id}.json"
-        filepath = os.path.join(self.storage_dir, filename)
+        filepath = self._write_key(key, key_id, metadata, pretty)
+        self._index_keys([(key_id, metadata)])
+        logger.info(f"Key saved: {key_id} ({len(key)} bits)")
+        return filepath
+    
+    def save_keys(
+        self,
+        items: List[Tuple[Union[List[int], np.ndarray, "bitarray"], str, Optional[Dict]]],
+        pretty: bool = False
+    ) -> List[str]:
+        """
+        Save many keys at once.
         
-        with open(filepath, 'w') as f:
-            json.dump(key_data, f, indent=2)
+        The keys are written in parallel on worker threads and indexed in a
+        single transaction, as inside batch().
+        
+        Args:
+            items: (key, key_id, metadata) tuples; metadata may be None
+            pretty: Indent the JSON files for human reading
+        
+        Returns:
+            Paths to the saved key files, in input order
+        """
+        with self.batch():
+            return [
+                self.save_key(key, key_id, metadata, pretty)
+                for key, key_id, metadata in items
+            ]
+    
+    @contextmanager
+    def batch(self, flush_every: Optional[int] = None) -> Iterator["KeyManager"]:
+        """
+        Defer key writes until the block exits.
+        
+        Keys saved inside the block are queued and written together by
+        flush(), on worker threads, when the outermost batch exits (also on
+        error). Loading, listing or deleting keys flushes first, so queued
+        keys are never invisible.
+        
+        Args:
+            flush_every: Also flush whenever this many keys are queued
+        
+        Yields:
+            This key manager
+        """
+        with self._lock:
+            self._batch_depth += 1
+            if flush_every is not None:
+                self._flush_every = flush_every
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._flush_every = None
+                    self.flush()
+    
+    def flush(self) -> int:
+        """
+        Write all keys queued by batch().
+        
+        Returns:
+            Number of keys written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            
+            with ThreadPoolExecutor(max_workers=min(LIST_KEYS_MAX_WORKERS, len(pending))) as executor:
+                futures = [
+                    executor.submit(self._write_key, key, key_id, metadata, pretty)
+                    for key_id, (key, metadata, pretty) in pending.items()
+                ]
+                for future in futures:
+                    future.result()
+            
+            self._index_keys([(key_id, entry[1]) for key_id, entry in pending.items()])
+        
+        logger.info(f"Flushed {len(pending)} batched keys")
+        return len(pending)
+    
+    def _write_key(self, key: np.ndarray, key_id: str, metadata: Dict, pretty: bool = False) -> str:
+        """Write one key and its metadata to storage; returns the key file path."""
+        if self.use_msgpack:
+            filepath = self._key_path(key_id, ".mpk")
+            key_data = {
+                "key": key.tobytes(),
+                "metadata": metadata
+            }
+            _write_atomic(filepath, msgpack.packb(key_data, use_bin_type=True))
+        else:
+            # Key bits go to a packed sidecar (8 bits per byte); the JSON file
+            # only carries metadata, so list_keys never touches the bits
+            key_file = f"{key_id}{KEY_BITS_EXTENSION}"
+            _write_atomic(self._path_prefix + key_file, np.packbits(key).tobytes())
+            
+            filepath = self._key_path(key_id, ".json")
+            key_data = {
+                "key_file": key_file,
+                "key_bits": len(key),
+                "metadata": metadata
+            }
+            _write_atomic(filepath, _json_dumps(key_data, pretty))
         
-        logger.info(f"Key saved: {key_id} ({len(key)} bits)")
         return filepath
     
     def load_key(self, key_id: str) -> Dict:
@@ -87,46 +342,201 @@ class KeyManager:
         Raises:
             FileNotFoundError: If key not found
         """
-        filename = f"{key_id}.json"
-        filepath = os.path.join(self.storage_dir, filename)
-        
-        if not os.path.exists(filepath):
+        self.flush()
+        filepath = self._find_key_file(key_id)
+        if filepath is None:
             raise FileNotFoundError(f"Key not found: {key_id}")
         
-        with open(filepath, 'r') as f:
-            key_data = json.load(f)
+        key_data = self._read_key_file(filepath)
         
         # Verify key integrity
-        key = key_data["key"]
-        stored_hash = key_data["metadata"].get("key_hash")
-        computed_hash = self._hash_key(key)
-        
-        if stored_hash and stored_hash != computed_hash:
+        if not self._verify_key(filepath, key_data):
             logger.warning(f"Key integrity check failed for {key_id}")
         
         logger.info(f"Key loaded: {key_id}")
         return key_data
     
+    def load_key_packed(self, key_id: str) -> np.ndarray:
+        """
+        Load key bits packed 8 per byte (MSB first), skipping the unpack step.
+        
+        Keys stored with a .bin sidecar are returned as a read-only
+        memory-mapped view. The final byte is zero-padded; the metadata
+        "key_length" gives the number of valid bits. No integrity check is
+        done; load_key verifies the stored tag.
+        
+        Args:
+            key_id: Unique identifier for the key
+        
+        Returns:
+            Packed key bits as a uint8 array
+        
+        Raises:
+            FileNotFoundError: If key not found
+        """
+        self.flush()
+        filepath = self._find_key_file(key_id)
+        if filepath is None:
+            raise FileNotFoundError(f"Key not found: {key_id}")
+        
+        key_data = self._read_key_file(filepath, with_key=False)
+        if "key_file" in key_data:
+            return _map_packed_bits(self._path_prefix + key_data["key_file"])
+        
+        # Legacy JSON and msgpack keys hold unpacked bits
+        return np.packbits(_key_bits(key_data["key"]))
+    
+    def load_key_bitarray(self, key_id: str) -> "bitarray":
+        """
+        Load key bits as a bitarray, one bit per bit in memory.
+        
+        Like load_key_packed(), no integrity check is done.
+        
+        Args:
+            key_id: Unique identifier for the key
+        
+        Returns:
+            Key bits as a big-endian bitarray
+        
+        Raises:
+            ImportError: If bitarray is not installed
+            FileNotFoundError: If key not found
+        """
+        if not BITARRAY_AVAILABLE:
+            raise ImportError(
+                "bitarray not installed. Install with: pip install bitarray"
+            )
+        
+        packed = self.load_key_packed(key_id)
+        bits = bitarray(endian='big')
+        bits.frombytes(packed.tobytes())
+        del bits[self.get_key_info(key_id)["key_length"]:]
+        return bits
+    
     def list_keys(self) -> List[Dict]:
         """
         List all stored keys.
         
+        The metadata index is first reconciled with the key files on disk,
+        so keys added or removed outside this KeyManager are reflected.
+        
         Returns:
-            List of key metadata dictionaries
+            List of key metadata dictionaries, newest first
+        """
+        self.flush()
+        with self._lock:
+            self._sync_index()
+            rows = self._index().execute(
+                "SELECT metadata FROM keys ORDER BY timestamp DESC"
+            ).fetchall()
+        return [_json_loads(metadata) for (metadata,) in rows]
+    
+    def rebuild_index(self) -> int:
         """
-        keys = []
+        Rebuild the metadata index from the key files on disk.
         
-        for filename in os.listdir(self.storage_dir):
-            if filename.endswith('.json'):
-                filepath = os.path.join(self.storage_dir, filename)
-                try:
-                    with open(filepath, 'r') as f:
-                        key_data = json.load(f)
-                    keys.append(key_data["metadata"])
-                except Exception as e:
-                    logger.error(f"Error reading {filename}: {e}")
+        Runs automatically when the index file is missing. list_keys() picks
+        up added and removed key files by itself; a rebuild is only needed
+        after key files were rewritten in place outside this KeyManager.
         
-        return sorted(keys, key=lambda x: x.get("timestamp", ""), reverse=True)
+        Returns:
+            Number of keys indexed
+        """
+        with self._lock:
+            self._index().execute("DELETE FROM keys")
+            self._sync_index()
+            (count,) = self._index().execute("SELECT COUNT(*) FROM keys").fetchone()
+        
+        logger.info(f"Rebuilt key index: {count} keys")
+        return count
+    
+    def _sync_index(self) -> None:
+        """
+        Reconcile the metadata index with the key files on disk.
+        
+        Only file names are listed; rows of missing files are dropped and
+        just the metadata of unindexed files is read.
+        """
+        with os.scandir(self.storage_dir) as entries:
+            on_disk = {
+                os.path.splitext(entry.name)[0] for entry in entries
+                if entry.name.endswith(KEY_EXTENSIONS) and entry.is_file()
+            }
+        
+        with self._lock:
+            db = self._index()
+            indexed = {key_id for (key_id,) in db.execute("SELECT key_id FROM keys")}
+            stale = indexed - on_disk
+            if stale:
+                db.executemany("DELETE FROM keys WHERE key_id = ?", [(key_id,) for key_id in stale])
+            found = [(key_id, self._find_key_file(key_id)) for key_id in sorted(on_disk - indexed)]
+            found = [(key_id, path) for key_id, path in found if path is not None]
+            if not found:
+                return
+            new_ids, paths = zip(*found)
+            
+            # Metadata files are small and independent; overlap their read latency
+            if len(paths) > 1:
+                with ThreadPoolExecutor(max_workers=min(LIST_KEYS_MAX_WORKERS, len(paths))) as executor:
+                    results = list(executor.map(self._read_metadata, paths))
+            else:
+                results = [self._read_metadata(path) for path in paths]
+            
+            self._index_keys([
+                (key_id, metadata)
+                for key_id, metadata in zip(new_ids, results)
+                if metadata is not None
+            ])
+    
+    def close(self) -> None:
+        """Write any batched keys and close the metadata index."""
+        self.flush()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+    
+    def __enter__(self) -> "KeyManager":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def _index(self) -> sqlite3.Connection:
+        """Open the metadata index on first use, rebuilding it if it was missing."""
+        with self._lock:
+            if self._db is None:
+                path = os.path.join(self.storage_dir, INDEX_FILENAME)
+                missing = not os.path.exists(path)
+                db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS keys ("
+                    "key_id TEXT PRIMARY KEY, timestamp TEXT NOT NULL, metadata BLOB NOT NULL)"
+                )
+                db.execute("CREATE INDEX IF NOT EXISTS keys_by_timestamp ON keys (timestamp)")
+                self._db = db
+                if missing:
+                    self.rebuild_index()
+            return self._db
+    
+    def _index_keys(self, keys: List[tuple]) -> None:
+        """Insert or replace (key_id, metadata) rows in the metadata index."""
+        with self._lock:
+            db = self._index()
+            db.execute("BEGIN")
+            db.executemany(
+                "INSERT OR REPLACE INTO keys (key_id, timestamp, metadata) VALUES (?, ?, ?)",
+                [(key_id, metadata.get("timestamp", ""), _json_dumps(metadata)) for key_id, metadata in keys]
+            )
+            db.execute("COMMIT")
+    
+    def _read_metadata(self, filepath: str) -> Optional[Dict]:
+        """Read the metadata of one key file, or None (logged) if unreadable."""
+        try:
+            return self._read_key_file(filepath, with_key=False)["metadata"]
+        except Exception as e:
+            logger.error(f"Error reading {os.path.basename(filepath)}: {e}")
+            return None
     
     def delete_key(self, key_id: str) -> bool:
         """
@@ -138,29 +548,202 @@ class KeyManager:
         Returns:
             True if deleted, False if not found
         """
-        filename = f"{key_id}.json"
-        filepath = os.path.join(self.storage_dir, filename)
+        self.flush()
+        filepath = self._find_key_file(key_id)
         
-        if os.path.exists(filepath):
+        if filepath is not None:
             os.remove(filepath)
+            bits_path = self._key_path(key_id, KEY_BITS_EXTENSION)
+            if os.path.exists(bits_path):
+                os.remove(bits_path)
+            with self._lock:
+                self._index().execute("DELETE FROM keys WHERE key_id = ?", (key_id,))
             logger.info(f"Key deleted: {key_id}")
             return True
         else:
             logger.warning(f"Key not found for deletion: {key_id}")
             return False
     
-    def _hash_key(self, key: List[int]) -> str:
+    def _find_key_file(self, key_id: str) -> Optional[str]:
+        """Return the path of the stored file for key_id, or None if missing."""
+        for ext in KEY_EXTENSIONS:
+            filepath = self._key_path(key_id, ext)
+            if os.path.exists(filepath):
+                return filepath
+        return None
+    
+    def _key_path(self, key_id: str, ext: str) -> str:
+        """Path of the key_id file with extension ext in the storage directory."""
+        return self._path_prefix + key_id + ext
+    
+    def _read_key_file(self, filepath: str, with_key: bool = True) -> Dict:
+        """
+        Read a stored key file in either JSON or msgpack format.
+        
+        Args:
+            filepath: Path of the .mpk or .json key file
+            with_key: Also load the key bits from a packed .bin sidecar
+                and unpack msgpack key bytes (metadata-only callers skip both)
+        
+        Returns:
+            Dictionary with metadata and, when loaded, the key bits as a list
+        """
+        if filepath.endswith(".mpk"):
+            if not MSGPACK_AVAILABLE:
+                raise ImportError(
+                    f"msgpack not installed, cannot read {filepath}. "
+                    "Install with: pip install msgpack"
+                )
+            with open(filepath, 'rb') as f:
+                key_data = msgpack.unpackb(f.read(), raw=False)
+            if with_key:
+                key_data["key"] = list(key_data["key"])
+            return key_data
+        
+        with open(filepath, 'rb') as f:
+            key_data = _json_loads(f.read())
+        
+        # Legacy JSON files store the bits inline under "key"
+        if with_key and "key" not in key_data:
+            bits_path = os.path.join(os.path.dirname(filepath), key_data["key_file"])
+            packed = _map_packed_bits(bits_path)
+            key_data["key"] = np.unpackbits(packed)[:key_data["key_bits"]].tolist()
+        return key_data
+    
+    def _verify_key(self, filepath: str, key_data: Dict) -> bool:
+        """
+        Check a loaded key against its stored integrity digest.
+        
+        Keys carry an HMAC tag over their packed bits ("key_tag"); older
+        files carry a SHA-256 over one byte per bit ("key_hash"). The
+        computed digest is reused while the key file and any .bin sidecar
+        keep the same (mtime_ns, size), skipping the pass over the key.
+        
+        Args:
+            filepath: Path of the loaded key file
+            key_data: Loaded key data with "key" and "metadata"
+        
+        Returns:
+            True if the digest matches or the file has none
+        """
+        metadata = key_data["metadata"]
+        expected = metadata.get("key_tag") or metadata.get("key_hash")
+        if not expected:
+            return True
+        
+        paths = [filepath]
+        if "key_file" in key_data:
+            paths.append(os.path.join(os.path.dirname(filepath), key_data["key_file"]))
+        signature = tuple((st.st_mtime_ns, st.st_size) for st in map(os.stat, paths))
+        
+        with self._lock:
+            cached = self._hash_cache.get(filepath)
+            if cached is not None and cached[0] == signature:
+                self._hash_cache.move_to_end(filepath)
+                return hmac.compare_digest(cached[1], expected)
+        
+        key = key_data["key"]
+        if "key_tag" not in metadata:
+            computed = self._hash_key(key)
+        elif "key_file" in key_data:
+            # Tag the packed sidecar bytes directly instead of repacking
+            computed = self._tag_key(_map_packed_bits(paths[1]), len(key))
+        else:
+            computed = self._tag_key(np.packbits(_key_bits(key)), len(key))
+        
+        with self._lock:
+            self._hash_cache[filepath] = (signature, computed)
+            if len(self._hash_cache) > HASH_CACHE_SIZE:
+                self._hash_cache.popitem(last=False)
+        return hmac.compare_digest(computed, expected)
+    
+    def _tag_key(self, packed: np.ndarray, n_bits: int) -> str:
         """
-        Compute hash of key for integrity checking.
+        HMAC-SHA256 integrity tag of packed key bits under the store secret.
+        
+        The bit count is authenticated along with the packed bytes, since
+        the zero padding of the last byte would otherwise hide it.
         
         Args:
-            key: Key bits
+            packed: Key bits packed 8 per byte (MSB first)
+            n_bits: Number of valid key bits
+        
+        Returns:
+            Hex digest of the tag
+        """
+        mac = hmac.new(self._secret, n_bits.to_bytes(8, 'little'), hashlib.sha256)
+        mac.update(packed)
+        return mac.hexdigest()
+    
+    def _load_store_secret(self) -> bytes:
+        """
+        Read the store's HMAC secret, creating it (owner-only) on first use.
+        
+        A new secret is written in full to a temporary file and then linked
+        into place, so concurrent KeyManagers never see a partial secret and
+        all end up with the one that was linked first. On filesystems without
+        hard links (FAT/exFAT, some network and overlay mounts) it is created
+        directly with exclusive-create instead.
+        
+        The secret lives in the same directory as the keys, so the HMAC tags
+        only catch corruption and accidental edits; anyone who can write to
+        the store can also read the secret and forge tags.
+        
+        Raises:
+            ValueError: If the existing secret file has the wrong size
+        """
+        path = os.path.join(self.storage_dir, STORE_SECRET_FILENAME)
+        if not os.path.exists(path):
+            secret = secrets.token_bytes(STORE_SECRET_SIZE)
+            # mkstemp creates the file with mode 0600
+            fd, tmp_path = tempfile.mkstemp(dir=self.storage_dir, prefix=STORE_SECRET_FILENAME)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(secret)
+                os.link(tmp_path, path)
+            except FileExistsError:
+                pass  # Another KeyManager created it first
+            except OSError as e:
+                logger.debug(f"Hard links unsupported in {self.storage_dir} ({e}); creating secret directly")
+                self._create_secret_exclusive(path, secret)
+            finally:
+                os.remove(tmp_path)
+        
+        with open(path, 'rb') as f:
+            secret = f.read()
+        if len(secret) != STORE_SECRET_SIZE:
+            raise ValueError(
+                f"Corrupt store secret {path}: {len(secret)} bytes, expected {STORE_SECRET_SIZE}"
+            )
+        return secret
+    
+    @staticmethod
+    def _create_secret_exclusive(path: str, secret: bytes) -> None:
+        """Create the secret file owner-only with O_EXCL, unless it already exists."""
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            return  # Another KeyManager created it first
+        with os.fdopen(fd, 'wb') as f:
+            f.write(secret)
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _hash_key(self, key: Union[List[int], np.ndarray]) -> str:
+        """
+        Compute the legacy hash of key for integrity checking.
+        
+        The digest is SHA-256 over one byte per key bit, as stored in
+        "key_hash" by older key files. A contiguous uint8 array is hashed
+        through the buffer protocol without a copy.
+        
+        Args:
+            key: Key bits (list or uint8 array)
         
         Returns:
             Hex digest of key hash
         """
-        key_bytes = bytes(key)
-        return hashlib.sha256(key_bytes).hexdigest()
+        return hashlib.sha256(_key_bits(key)).hexdigest()
     
     def export_key(self, key_id: str, output_path: str, format: str = "hex") -> None:
         """
@@ -175,43 +758,27 @@ class KeyManager:
         key = key_data["key"]
         
         if format == "hex":
-            # Convert bits to hex
-            hex_str = ""
-            for i in range(0, len(key), 4):
-                nibble = 0
-                for j in range(4):
-                    if i + j < len(key):
-                        nibble = (nibble << 1) | key[i + j]
-                hex_str += f"{nibble:x}"
+            # Convert bits to hex: one digit per 4 bits; packbits zero-fills an
+            # odd final nibble, which is dropped again
+            bits = _right_aligned_bits(key, 4)
+            hex_str = np.packbits(bits).tobytes().hex()[:len(bits) // 4]
             
             with open(output_path, 'w') as f:
                 f.write(hex_str)
         
         elif format == "binary":
             # Convert bits to bytes
-            byte_array = bytearray()
-            for i in range(0, len(key), 8):
-                byte = 0
-                for j in range(8):
-                    if i + j < len(key):
-                        byte = (byte << 1) | key[i + j]
-                byte_array.append(byte)
+            packed = np.packbits(_right_aligned_bits(key, 8)).tobytes()
             
             with open(output_path, 'wb') as f:
-                f.write(bytes(byte_array))
+                f.write(packed)
         
         elif format == "base64":
             import base64
             # Convert bits to bytes then base64
-            byte_array = bytearray()
-            for i in range(0, len(key), 8):
-                byte = 0
-                for j in range(8):
-                    if i + j < len(key):
-                        byte = (byte << 1) | key[i + j]
-                byte_array.append(byte)
+            packed = np.packbits(_right_aligned_bits(key, 8)).tobytes()
             
-            b64_str = base64.b64encode(bytes(byte_array)).decode('utf-8')
+            b64_str = base64.b64encode(packed).decode('utf-8')
             with open(output_path, 'w') as f:
                 f.write(b64_str)
         
@@ -224,12 +791,29 @@ class KeyManager:
         """
         Get key metadata without loading full key.
         
+        The key file must exist; its metadata comes from the index, or from
+        the file itself (skipping the key bits) when not indexed yet.
+        
         Args:
             key_id: Unique identifier for the key
         
         Returns:
             Key metadata dictionary
+        
+        Raises:
+            FileNotFoundError: If key not found
         """
-        key_data = self.load_key(key_id)
-        return key_data["metadata"]
+        self.flush()
+        filepath = self._find_key_file(key_id)
+        with self._lock:
+            if filepath is None:
+                # Drop the row of a key file removed outside this KeyManager
+                self._index().execute("DELETE FROM keys WHERE key_id = ?", (key_id,))
+                raise FileNotFoundError(f"Key not found: {key_id}")
+            row = self._index().execute(
+                "SELECT metadata FROM keys WHERE key_id = ?", (key_id,)
+            ).fetchone()
+        if row is not None:
+            return _json_loads(row[0])
+        return self._read_key_file(filepath, with_key=False)["metadata"]
 
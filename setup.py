@@ -34,7 +34,11 @@ setup(
         "click>=8.1.0",
     ],
     extras_require={
-        "braket": ["amazon-braket-sdk>=1.50.0"],
+        "braket": ["amazon-braket-sdk>=1.50.0", "boto3>=1.28.0"],
+        "bitarray": ["bitarray>=2.9"],
+        "msgpack": ["msgpack>=1.0.0"],
+        "orjson": ["orjson>=3.9.0"],
+        "pqc": ["liboqs-python>=0.10.0"],
         "dev": [
             "pytest>=7.4.0",
             "pytest-cov>=4.1.0",
@@ -46,6 +50,7 @@ setup(
     entry_points={
         "console_scripts": [
             "ncrypt=ncrypt.cli.main:main",
+            "ncrypt-daemon=ncrypt.daemon:main",
         ],
     },
 )
@@ -9,7 +9,25 @@ from ncrypt.core.qkd import BB84Protocol
 from ncrypt.core.encryption import QuantumEncryption
 from ncrypt.simulator.quantum_simulator import QuantumSimulator
 from ncrypt.utils.key_manager import KeyManager
+from ncrypt.utils.aws_pricing import BraketPricing, DEFAULT_CACHE_TTL_SECONDS
+from ncrypt.lattice.post_quantum import LatticeCrypto, ModuleLWE
+from ncrypt.transactions.privacy_modes import (
+    AccountableTransaction,
+    DAPOAFramework,
+    OutputBatch,
+    PrivacyMode,
+    PrivateTransaction,
+    Transaction,
+    TransactionOutput,
+    TransparentTransaction,
+    TXOType,
+)
+import hashlib
+import json
+import os
+import socket
 import tempfile
+import threading
 import shutil
 
 
@@ -33,9 +51,19 @@ class TestBB84Protocol:
         protocol = BB84Protocol()
         bits = np.array([0, 1, 0, 1])
         bases = np.array([0, 0, 1, 1])
-        qubits = protocol.prepare_qubits(bits, bases)
-        assert len(qubits) == 4
+        qubit_bits, qubit_bases = protocol.prepare_qubits(bits, bases)
+        assert len(qubit_bits) == 4
+        assert np.array_equal(qubit_bases, bases)
     
+    def test_noiseless_measurement(self):
+        """Test that matching bases reproduce Alice's bits without noise."""
+        protocol = BB84Protocol()
+        bits = protocol.generate_random_bits(500)
+        bases = protocol.generate_random_bases(500)
+        qubits = protocol.prepare_qubits(bits, bases)
+        measured = protocol.measure_qubits(qubits, bases, noise_level=0.0)
+        assert np.array_equal(measured, bits)
+
     def test_key_sifting(self):
         """Test key sifting process."""
         protocol = BB84Protocol()
@@ -52,6 +80,30 @@ class TestBB84Protocol:
         assert len(alice_sifted) == 5
         assert len(bob_sifted) == 5
     
+    def test_error_rate_estimation(self):
+        """Test QBER estimation on identical and fully flipped keys."""
+        protocol = BB84Protocol()
+        key = [0, 1] * 50
+        flipped = [1 - b for b in key]
+        
+        error_rate, alice_rest, bob_rest = protocol.estimate_error_rate(key, key, 40)
+        assert error_rate == 0.0
+        assert len(alice_rest) == len(bob_rest) == 60
+        
+        error_rate, _, _ = protocol.estimate_error_rate(key, flipped, 40)
+        assert error_rate == 1.0
+    
+    def test_privacy_amplification(self):
+        """Test segment-XOR privacy amplification and factor validation."""
+        protocol = BB84Protocol()
+        key = [1, 1, 0, 1, 0, 0, 1, 0, 1, 1]
+        
+        assert protocol.privacy_amplification(key, 0.5) == [0, 1, 0, 1, 0]
+        assert protocol.privacy_amplification(key, 1.0) == key
+        assert protocol.privacy_amplification(key, 0.0) == []
+        with pytest.raises(ValueError):
+            protocol.privacy_amplification(key, 1.5)
+    
     def test_full_protocol_low_noise(self):
         """Test full BB84 protocol with low noise."""
         protocol = BB84Protocol()
@@ -94,13 +146,39 @@ class TestQuantumEncryption:
         ciphertext, iv, tag = qe.encrypt(plaintext, result.final_key)
         
         assert len(ciphertext) > 0
-        assert len(iv) == 16
-        assert len(tag) == 32
+        assert len(iv) == 12
+        assert len(tag) == 16
         
         # Decrypt
         decrypted = qe.decrypt(ciphertext, iv, tag, result.final_key)
         assert decrypted == plaintext
     
+    def test_key_handle(self):
+        """Test reusable per-key encryption handle."""
+        key_bits = [1, 0, 1, 1, 0, 0, 1, 0] * 32
+        qe = QuantumEncryption()
+        handle = qe.handle(key_bits)
+        assert qe.handle(key_bits) is handle
+        assert qe.derive_key(key_bits) == qe.derive_key(list(key_bits))
+        assert qe.derive_key(key_bits, b"other") != qe.derive_key(key_bits)
+
+        for message in (b"first", b"second message", b""):
+            ciphertext, iv, tag = handle.encrypt(message)
+            assert handle.decrypt(ciphertext, iv, tag) == message
+            assert qe.decrypt(ciphertext, iv, tag, key_bits) == message
+
+    def test_encrypt_fixed256(self):
+        """Test AES-256-GCM fast path with a derived key."""
+        qe = QuantumEncryption()
+        key = qe.derive_key([0, 1, 1, 0, 1, 0, 0, 1] * 32)
+        ciphertext, iv, tag = qe.encrypt_fixed256(b"short message", key)
+        assert len(iv) == 12
+        assert len(tag) == 16
+        assert qe.decrypt_fixed256(ciphertext, iv, tag, key) == b"short message"
+        
+        with pytest.raises(ValueError):
+            qe.decrypt_fixed256(ciphertext, iv, bytes(16), key)
+    
     def test_decrypt_wrong_key(self):
         """Test decryption with wrong key (should fail)."""
         protocol = BB84Protocol()
@@ -143,6 +221,59 @@ class TestQuantumEncryption:
             with open(input_file, 'r') as f1, open(decrypted_file, 'r') as f2:
                 assert f1.read() == f2.read()
 
+    
+    def test_file_header(self):
+        """Test that encrypted files carry IV, tag and key ID in a header."""
+        key_bits = [1, 1, 0, 1, 0, 0, 1, 0] * 32
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_file = f"{tmpdir}/test.txt"
+            encrypted_file = f"{tmpdir}/test.enc"
+            decrypted_file = f"{tmpdir}/test_dec.txt"
+            
+            with open(input_file, 'wb') as f:
+                f.write(b"header test")
+            
+            qe = QuantumEncryption()
+            iv, tag = qe.encrypt_file(input_file, encrypted_file, key_bits, key_id="k1")
+            
+            header = qe.read_header(encrypted_file)
+            assert header["iv"] == iv
+            assert header["tag"] == tag
+            assert header["key_id"] == "k1"
+            assert qe.read_header(input_file) is None
+            
+            # IV and tag are taken from the header when not given
+            qe.decrypt_file(encrypted_file, decrypted_file, None, None, key_bits)
+            with open(decrypted_file, 'rb') as f:
+                assert f.read() == b"header test"
+
+    def test_streaming_file_encryption(self):
+        """Test chunked file encryption across several chunks."""
+        key_bits = [0, 1, 1, 0, 1, 0, 0, 1] * 32
+        data = np.random.bytes(10000)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_file = f"{tmpdir}/test.bin"
+            encrypted_file = f"{tmpdir}/test.enc"
+            decrypted_file = f"{tmpdir}/test_dec.bin"
+            
+            with open(input_file, 'wb') as f:
+                f.write(data)
+            
+            qe = QuantumEncryption()
+            iv, tag = qe.encrypt_file(input_file, encrypted_file, key_bits, chunk_size=1024)
+            
+            # Streamed output matches one-shot AES-GCM of the whole file
+            header = qe.read_header(encrypted_file)
+            assert len(header["iv"]) == 12
+            assert len(header["tag"]) == 16
+            with open(encrypted_file, 'rb') as f:
+                f.seek(header["header_length"])
+                assert qe.handle(key_bits).decrypt(f.read(), iv, tag) == data
+            
+            qe.decrypt_file(encrypted_file, decrypted_file, None, None, key_bits, chunk_size=999)
+            with open(decrypted_file, 'rb') as f:
+                assert f.read() == data
+
 
 class TestQuantumSimulator:
     """Test quantum simulator."""
@@ -187,6 +318,27 @@ class TestQuantumSimulator:
         results = [sim.measure_qubit(state, 0, 0) for _ in range(100)]
         assert all(r == 1 for r in results)
     
+    def test_bb84_batch(self):
+        """Test analytic BB84 batch simulation."""
+        sim = QuantumSimulator()
+        alice_bits = np.random.randint(0, 2, 1000)
+        alice_bases = np.random.randint(0, 2, 1000)
+        bob_bases = np.random.randint(0, 2, 1000)
+        
+        bob_results = sim.simulate_bb84_batch(alice_bits, alice_bases, bob_bases)
+        same_basis = alice_bases == bob_bases
+        assert len(bob_results) == 1000
+        assert np.array_equal(bob_results[same_basis], alice_bits[same_basis])
+    
+    def test_qkd_exchange_batch(self):
+        """Test batched independent QKD exchanges."""
+        sim = QuantumSimulator()
+        errors, sifted = sim.simulate_qkd_exchange_batch(n_runs=20, n_qubits=500, noise_level=0.0)
+        
+        assert errors.shape == sifted.shape == (20,)
+        assert np.all(errors == 0)  # Noiseless channel, matching bases
+        assert np.all((sifted > 150) & (sifted < 350))
+    
     def test_channel_quality(self):
         """Test channel quality estimation."""
         sim = QuantumSimulator()
@@ -196,6 +348,113 @@ class TestQuantumSimulator:
         assert 'fidelity' in stats
         assert stats['error_rate'] < 0.05  # Should be low with 1% noise
         assert stats['fidelity'] > 0.95
+    
+    def test_outcome_table_matches_measurement(self):
+        """Test the vectorized outcome table against per-qubit measurement."""
+        sim = QuantumSimulator(noise_model='depolarizing')
+        
+        noiseless = sim._outcome_probabilities(0.0)
+        for bit in (0, 1):
+            for basis in (0, 1):
+                assert noiseless[bit, basis, basis] == pytest.approx(bit)
+                assert noiseless[bit, basis, 1 - basis] == pytest.approx(0.5)
+        
+        table = sim._outcome_probabilities(0.3)
+        for bit in (0, 1):
+            for alice_basis in (0, 1):
+                state = sim.create_qubit_state(bit, alice_basis)
+                for bob_basis in (0, 1):
+                    ones = sum(sim.measure_qubit(state, bob_basis, 0.3) for _ in range(4000))
+                    assert abs(ones / 4000 - table[bit, alice_basis, bob_basis]) < 0.05
+    
+    def test_qkd_exchange_threads(self):
+        """Test threaded exchanges give the same outcomes as a single thread."""
+        from ncrypt.simulator.quantum_simulator import PARALLEL_EXCHANGE_THRESHOLD
+        
+        sim = QuantumSimulator()
+        n = PARALLEL_EXCHANGE_THRESHOLD
+        rng = np.random.default_rng()
+        alice_bits = rng.integers(0, 2, n, dtype=np.uint8)
+        alice_bases = rng.integers(0, 2, n, dtype=np.uint8)
+        bob_bases = rng.integers(0, 2, n, dtype=np.uint8)
+        same_basis = alice_bases == bob_bases
+        
+        serial = np.array(sim.simulate_qkd_exchange(alice_bits, alice_bases, bob_bases, noise_level=0.0))
+        threaded = np.array(sim.simulate_qkd_exchange(alice_bits, alice_bases, bob_bases, noise_level=0.0, threads=4))
+        
+        # Matching bases are deterministic on a noiseless channel; the rest are fair coins
+        assert len(threaded) == len(serial) == n
+        assert np.array_equal(threaded[same_basis], serial[same_basis])
+        assert np.array_equal(threaded[same_basis], alice_bits[same_basis])
+        assert abs(threaded[~same_basis].mean() - 0.5) < 0.02
+        assert abs(serial[~same_basis].mean() - 0.5) < 0.02
+    
+    def test_channel_quality_processes(self):
+        """Test splitting channel estimation over processes matches a single process."""
+        sim = QuantumSimulator(noise_model='depolarizing')
+        table = sim._outcome_probabilities(0.3)
+        expected = np.mean([abs(bit - table[bit, basis, basis]) for bit in (0, 1) for basis in (0, 1)])
+        
+        serial = sim.estimate_channel_quality(n_test_qubits=40001, noise_level=0.3)
+        split = sim.estimate_channel_quality(n_test_qubits=40001, noise_level=0.3, processes=2)
+        
+        assert split['test_qubits'] == serial['test_qubits'] == 40001
+        assert abs(serial['error_rate'] - expected) < 0.01
+        assert abs(split['error_rate'] - expected) < 0.01
+        assert sim.estimate_channel_quality(n_test_qubits=1000, noise_level=0.0, processes=2)['error_rate'] == 0
+
+
+class TestBraketPricing:
+    """Test the AWS pricing disk cache."""
+    
+    @staticmethod
+    def _counting_pricing(tmpdir, **kwargs):
+        pricing = BraketPricing(cache_dir=tmpdir, **kwargs)
+        pricing.fetches = 0
+        
+        def fetch(device_type):
+            pricing.fetches += 1
+            return {'task': 0.3, 'shot': 0.01, 'name': 'IonQ', 'source': 'AWS Pricing API'}
+        
+        pricing._fetch_from_aws = fetch
+        return pricing
+    
+    def test_disk_cache(self):
+        """Test fresh entries are reused and stale, corrupt or refreshed ones refetched."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            first = self._counting_pricing(tmpdir)
+            assert first.get_device_pricing(device_type='ionq')['task'] == 0.3
+            assert first.fetches == 1
+            cache_path = first._cache_path('ionq')
+            
+            # A new instance reads the fresh disk entry
+            fresh = self._counting_pricing(tmpdir)
+            assert fresh.get_device_pricing(device_type='ionq')['task'] == 0.3
+            assert fresh.fetches == 0
+            
+            # refresh=True bypasses the disk cache
+            refreshed = self._counting_pricing(tmpdir, refresh=True)
+            refreshed.get_device_pricing(device_type='ionq')
+            assert refreshed.fetches == 1
+            
+            # Entries older than the TTL are refetched and rewritten
+            with open(cache_path) as f:
+                entry = json.load(f)
+            entry['fetched_at'] -= 2 * DEFAULT_CACHE_TTL_SECONDS
+            with open(cache_path, 'w') as f:
+                json.dump(entry, f)
+            stale = self._counting_pricing(tmpdir)
+            stale.get_device_pricing(device_type='ionq')
+            assert stale.fetches == 1
+            assert self._counting_pricing(tmpdir)._read_disk_cache('ionq') is not None
+            
+            # Corrupt entries fall back to fetching
+            for junk in ('not json', '[]', '{"fetched_at": "x", "pricing": {}}', '{"fetched_at": 1}'):
+                with open(cache_path, 'w') as f:
+                    f.write(junk)
+                corrupt = self._counting_pricing(tmpdir)
+                assert corrupt.get_device_pricing(device_type='ionq')['task'] == 0.3
+                assert corrupt.fetches == 1
 
 
 class TestKeyManager:
@@ -206,18 +465,94 @@ class TestKeyManager:
         with tempfile.TemporaryDirectory() as tmpdir:
             km = KeyManager(storage_dir=tmpdir)
             
-            key = [1, 0, 1, 1, 0, 0, 1, 0] * 10
+            key = np.tile(np.array([1, 0, 1, 1, 0, 0, 1, 0], dtype=np.uint8), 10)
             key_id = "test_key_001"
             
             # Save key
             filepath = km.save_key(key, key_id, metadata={"protocol": "BB84"})
             assert filepath.endswith(".json")
+            with open(f"{tmpdir}/{key_id}.bin", 'rb') as f:
+                assert len(f.read()) == len(key) // 8  # Bits packed 8 per byte
             
             # Load key
             key_data = km.load_key(key_id)
-            assert key_data["key"] == key
+            assert key_data["key"] == key.tolist()
             assert key_data["metadata"]["key_id"] == key_id
             assert key_data["metadata"]["protocol"] == "BB84"
+            
+            # Metadata only, from the index and from the key file
+            assert km.get_key_info(key_id) == key_data["metadata"]
+            km.close()
+            os.remove(f"{tmpdir}/index.sqlite")
+            km = KeyManager(storage_dir=tmpdir)
+            assert km.get_key_info(key_id)["key_length"] == len(key)
+            
+            # The index is not trusted for a key file removed behind its back
+            os.remove(filepath)
+            with pytest.raises(FileNotFoundError):
+                km.get_key_info(key_id)
+    
+    def test_resave_while_packed_view_held(self):
+        """Test re-saving a key does not invalidate an outstanding packed view."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            km = KeyManager(storage_dir=tmpdir)
+            
+            key = np.ones(80000, dtype=np.uint8)
+            km.save_key(key, "resaved")
+            packed = km.load_key_packed("resaved")
+            
+            km.save_key(np.zeros(8, dtype=np.uint8), "resaved")
+            
+            # The old view still reads the old file contents
+            assert len(packed) == 10000
+            assert int(packed[-1]) == 0xFF
+            assert km.load_key("resaved")["key"] == [0] * 8
+            assert [f for f in os.listdir(tmpdir) if f.endswith(".tmp")] == []
+    
+    def test_store_without_hard_links(self, monkeypatch):
+        """Test a store can be created where the filesystem refuses hard links."""
+        from ncrypt.utils.key_manager import STORE_SECRET_FILENAME, STORE_SECRET_SIZE
+        
+        def no_link(src, dst):
+            raise PermissionError(1, "Operation not permitted")
+        
+        monkeypatch.setattr(os, "link", no_link)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            km = KeyManager(storage_dir=tmpdir)
+            secret_path = os.path.join(tmpdir, STORE_SECRET_FILENAME)
+            assert os.path.getsize(secret_path) == STORE_SECRET_SIZE
+            assert os.stat(secret_path).st_mode & 0o777 == 0o600
+            
+            key = np.tile(np.array([1, 0, 0, 1], dtype=np.uint8), 16)
+            km.save_key(key, "no_links")
+            assert KeyManager(storage_dir=tmpdir).load_key("no_links")["key"] == key.tolist()
+            assert not [f for f in os.listdir(tmpdir) if f.startswith(STORE_SECRET_FILENAME) and f != STORE_SECRET_FILENAME]
+    
+    def test_save_and_load_msgpack_key(self):
+        """Test msgpack key storage round-trip."""
+        pytest.importorskip("msgpack")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            km = KeyManager(storage_dir=tmpdir, use_msgpack=True)
+            
+            key = np.tile(np.array([0, 1, 1, 0, 1, 0, 0, 1], dtype=np.uint8), 10)
+            filepath = km.save_key(key, "packed_key")
+            assert filepath.endswith(".mpk")
+            
+            assert km.load_key("packed_key")["key"] == key.tolist()
+            assert len(km.list_keys()) == 1
+            assert km.delete_key("packed_key") == True
+    
+    def test_save_and_load_bitarray_key(self):
+        """Test saving and loading bitarray keys."""
+        bitarray = pytest.importorskip("bitarray").bitarray
+        with tempfile.TemporaryDirectory() as tmpdir:
+            km = KeyManager(storage_dir=tmpdir)
+            
+            key = bitarray("1011001011", endian="little")
+            km.save_key(key, "bits_key")
+            
+            assert km.load_key("bits_key")["key"] == key.tolist()
+            assert km.load_key_bitarray("bits_key") == key
     
     def test_list_keys(self):
         """Test listing keys."""
@@ -226,19 +561,49 @@ class TestKeyManager:
             
             # Save multiple keys
             for i in range(3):
-                key = [1, 0] * 50
+                key = np.tile(np.array([1, 0], dtype=np.uint8), 50)
                 km.save_key(key, f"key_{i:03d}")
             
             # List keys
             keys = km.list_keys()
             assert len(keys) == 3
+            
+            # Key files removed or copied in behind the manager's back
+            os.remove(f"{tmpdir}/key_000.json")
+            for ext in (".json", ".bin"):
+                shutil.copy(f"{tmpdir}/key_001{ext}", f"{tmpdir}/key_copy{ext}")
+            assert sorted(k["key_id"] for k in km.list_keys()) == ["key_001", "key_001", "key_002"]
+            km.close()
+            
+            # A fresh manager rebuilds a missing index from the key files
+            os.remove(f"{tmpdir}/index.sqlite")
+            with KeyManager(storage_dir=tmpdir) as fresh:
+                assert len(fresh.list_keys()) == 3
+    
+    def test_batch_save(self):
+        """Test deferring key writes with batch()."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            km = KeyManager(storage_dir=tmpdir)
+            
+            with km.batch():
+                for i in range(5):
+                    km.save_key([1, 0] * 8, f"batched_{i}")
+                assert km._pending  # Nothing written yet
+                assert km.load_key("batched_0")["key"] == [1, 0] * 8  # Flushed on read
+            
+            assert len(km.list_keys()) == 5
+            
+            paths = km.save_keys([([0, 1] * 8, f"bulk_{i}", None) for i in range(3)])
+            assert all(os.path.exists(path) for path in paths)
+            assert km.load_key("bulk_2")["key"] == [0, 1] * 8
+            assert len(km.list_keys()) == 8
     
     def test_delete_key(self):
         """Test deleting keys."""
         with tempfile.TemporaryDirectory() as tmpdir:
             km = KeyManager(storage_dir=tmpdir)
             
-            key = [1, 0, 1, 0] * 20
+            key = np.tile(np.array([1, 0, 1, 0], dtype=np.uint8), 20)
             key_id = "temp_key"
             
             # Save and delete
@@ -248,6 +613,222 @@ class TestKeyManager:
             # Try to load deleted key
             with pytest.raises(FileNotFoundError):
                 km.load_key(key_id)
+    
+    def test_export_key(self):
+        """Test exporting keys, including a partial final group."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            km = KeyManager(storage_dir=tmpdir)
+            km.save_key([1, 0, 1, 1, 0, 0, 1, 0, 1, 1, 0, 1, 1], "export_key")
+            
+            hex_path = f"{tmpdir}/key.hex"
+            km.export_key("export_key", hex_path, format="hex")
+            with open(hex_path) as f:
+                assert f.read() == "b2d1"
+            
+            bin_path = f"{tmpdir}/key.bin"
+            km.export_key("export_key", bin_path, format="binary")
+            with open(bin_path, 'rb') as f:
+                assert f.read() == bytes([0xb2, 0x1b])
+
+
+class TestTransactions:
+    """Test transaction hashing and serialization."""
+    
+    def test_hash_tracks_in_place_edits(self):
+        """Test that the hash follows in-place edits of inputs and outputs."""
+        tx = TransparentTransaction.create("alice", "bob", 100, ["txo_1"])
+        hashes = {tx.compute_hash()}
+        
+        tx.inputs.append("txo_2")
+        hashes.add(tx.compute_hash())
+        tx.outputs[0].amount = 50
+        hashes.add(tx.compute_hash())
+        tx.outputs.append(TransactionOutput(TXOType.PUBLIC, "carol", 50))
+        hashes.add(tx.compute_hash())
+        
+        assert len(hashes) == 4
+    
+    def test_canonical_round_trip(self):
+        """Test canonical encoding round trips, including custom types and big ints."""
+        transactions = [
+            TransparentTransaction.create("alice", "bob", -5, ["txo_1", "txo_2"]),
+            PrivateTransaction.create(["txo_3"], [b"\x01\x02", b""]),
+            AccountableTransaction.create(["txo_4"], "carol", 7, "auditor_pk", bytes(32)),
+            Transaction("mint", PrivacyMode.TRANSPARENT, [],
+                        [TransactionOutput(TXOType.PUBLIC, "dave", 2**70)], timestamp=2**64),
+        ]
+        for tx in transactions:
+            restored = Transaction.from_canonical_bytes(tx._canonical_bytes())
+            assert restored.compute_hash() == tx.compute_hash()
+            assert restored.to_dict() == dict(tx.to_dict(), signature=None)
+            assert json.loads(tx.to_bytes()) == tx.to_dict()
+        
+        with pytest.raises(ValueError):
+            Transaction.from_canonical_bytes(transactions[0]._canonical_bytes()[:-1])
+    
+    def test_hash_batch(self):
+        """Test the block digest against the per-transaction encodings."""
+        dapoa = DAPOAFramework()
+        transactions = [
+            dapoa.create_transaction(mode, "alice", "bob", 10 + i, [f"txo_{i}"], "auditor_pk")
+            for i, mode in enumerate(PrivacyMode)
+        ]
+        
+        expected = hashlib.sha256()
+        for tx in transactions:
+            body = tx._canonical_bytes()
+            assert hashlib.sha256(body).hexdigest() == tx.compute_hash()
+            expected.update(len(body).to_bytes(4, 'little') + body)
+        assert dapoa.hash_batch(transactions) == expected.hexdigest()
+        assert dapoa.hash_batch(transactions[::-1]) != expected.hexdigest()
+    
+    def test_output_batch(self):
+        """Test that OutputBatch columns match the individual outputs."""
+        outputs = [
+            TransactionOutput(TXOType.PUBLIC, "bob", 10),
+            TransactionOutput(TXOType.VALUE_HIDDEN, "carol", None, commitment=bytes(range(32))),
+            TransactionOutput(TXOType.PRIVATE, None, None, encrypted_data=b"\x01"),
+        ]
+        batch = OutputBatch.from_outputs(outputs)
+        
+        assert len(batch) == 3
+        assert batch.addresses == [out.address for out in outputs]
+        assert batch.encrypted_data == [out.encrypted_data for out in outputs]
+        assert batch.amount_mask.tolist() == [True, False, False]
+        assert batch.amounts[0] == 10
+        assert batch.commitment_mask.tolist() == [False, True, False]
+        assert batch.commitments[1].tobytes() == outputs[1].commitment
+        
+        outputs.append(TransactionOutput(TXOType.VALUE_HIDDEN, "dave", None, commitment=bytes(16)))
+        with pytest.raises(ValueError):
+            OutputBatch.from_outputs(outputs)
+    
+    def test_verify_block(self):
+        """Test block commitment checks against per-transaction checks."""
+        dapoa = DAPOAFramework()
+        amounts = [5, 17, 42]
+        transactions = [
+            dapoa.create_transaction(PrivacyMode.ACCOUNTABLE, "alice", "bob", amount, ["txo"], "auditor_pk")
+            for amount in amounts
+        ]
+        claimed = [5, 18, 42]  # Second claim is wrong
+        
+        expected = [
+            tx.outputs[0].commitment == dapoa._create_commitment(amount)
+            for tx, amount in zip(transactions, claimed)
+        ]
+        assert expected == [True, False, True]
+        assert dapoa.verify_block(transactions, claimed).tolist() == expected
+        assert dapoa.verify_block([], []).tolist() == []
+        
+        with pytest.raises(ValueError):
+            dapoa.verify_block(transactions, amounts[:2])
+
+
+
+class TestLatticeCrypto:
+    """Test lattice-based encryption and commitments."""
+    
+    def test_lwe_batch_matches_per_bit(self):
+        """Test batch LWE encryption/decryption against the per-bit path."""
+        lwe = ModuleLWE()
+        public_key, private_key = lwe.generate_keypair()
+        bits = np.random.randint(0, 2, 64).astype(np.uint8)
+        
+        U, v = lwe.encrypt_batch(public_key, bits)
+        assert np.array_equal(lwe.decrypt_batch(private_key, U, v), bits)
+        assert [lwe.decrypt(private_key, (u, int(vi))) for u, vi in zip(U, v)] == bits.tolist()
+        
+        per_bit = [lwe.encrypt(public_key, int(bit)) for bit in bits]
+        U = np.stack([u for u, _ in per_bit])
+        v = np.array([vi for _, vi in per_bit])
+        assert np.array_equal(lwe.decrypt_batch(private_key, U, v), bits)
+        
+        ciphertexts = lwe.encrypt_bytes(public_key, b"lattice")
+        assert lwe.decrypt_bytes(private_key, ciphertexts) == b"lattice"
+    
+    def test_message_round_trip(self):
+        """Test account keys and messages survive JSON serialization."""
+        lattice = LatticeCrypto()
+        assert lattice.kem_algorithm is None  # Module-LWE unless asked for a KEM
+        
+        public_key, private_key = lattice.generate_account_keypair()
+        assert public_key["A"]["dtype"] == "int16"
+        public_key, private_key = json.loads(json.dumps([public_key, private_key]))
+        
+        encrypted = json.loads(json.dumps(lattice.encrypt_message(public_key, b"quantum safe")))
+        assert lattice.decrypt_message(private_key, encrypted) == b"quantum safe"
+    
+    def test_kem_round_trip(self):
+        """Test messages sealed under a liboqs KEM."""
+        pytest.importorskip("oqs")
+        lattice = LatticeCrypto(use_kem=True)
+        public_key, private_key = lattice.generate_account_keypair()
+        
+        encrypted = lattice.encrypt_message(public_key, b"kem message")
+        assert encrypted["algorithm"] == lattice.kem_algorithm
+        assert lattice.decrypt_message(private_key, encrypted) == b"kem message"
+    
+    def test_verify_commitments_batch(self):
+        """Test batched commitment checks against per-commitment checks."""
+        lattice = LatticeCrypto()
+        amounts = [5, 100, 2**40]
+        commitments, openings = zip(*(lattice.create_value_commitment(a) for a in amounts))
+        claimed = [5, 101, 2**40]  # Second claim is wrong
+        
+        expected = [
+            lattice.verify_value_commitment(c, a, o)
+            for c, a, o in zip(commitments, claimed, openings)
+        ]
+        assert expected == [True, False, True]
+        assert lattice.verify_value_commitments_batch(list(commitments), claimed, list(openings)) == expected
+        assert lattice.verify_value_commitments_batch([], [], []) == []
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets required")
+class TestKeyDaemon:
+    """Test the key daemon over its Unix socket."""
+    
+    def test_request_key_round_trip(self):
+        """Test generating keys through a running daemon."""
+        from ncrypt.daemon import KeyDaemon, request_key
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            socket_path = f"{tmpdir}/ncrypt.sock"
+            server = KeyDaemon(socket_path)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                assert os.stat(socket_path).st_mode & 0o777 == 0o600
+                response = request_key(n_bits=2000, noise_level=0.01, socket_path=socket_path)
+                assert response["key_length"] == len(response["key"]) > 0
+                assert request_key(n_bits=0, socket_path=socket_path) is None
+                
+                # A second daemon must not take over the live socket
+                with pytest.raises(RuntimeError):
+                    KeyDaemon(socket_path)
+            finally:
+                server.shutdown()
+                server.server_close()
+            
+            # Not listening any more
+            with pytest.raises(ConnectionError):
+                request_key(socket_path=socket_path)
+    
+    def test_refuses_shared_socket_dir(self):
+        """Test neither side uses a socket in a group- or world-writable directory."""
+        from ncrypt.daemon import KeyDaemon, request_key
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            socket_path = f"{tmpdir}/ncrypt.sock"
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.bind(socket_path)
+                os.chmod(tmpdir, 0o777)
+                
+                with pytest.raises(PermissionError):
+                    KeyDaemon(socket_path)
+                with pytest.raises(PermissionError):
+                    request_key(socket_path=socket_path)
 
 
 if __name__ == "__main__":